@@ -2,23 +2,46 @@ import streamlit as st
 from langchain_groq import ChatGroq
 import os
 from utils import (
-    extract_key_requirements,
-    score_candidate_explainable,
-    generate_interview_questions,
-    extract_pdf_text,
-    create_candidate_rag_retriever,
-    ask_rag_question,
+    LazyRetrieverPool,
+    DEFAULT_RETRIEVER_PREFETCH,
+    stream_rag_answer,
     generate_email_templates,
+    rescore_candidates,
+    leaderboard_sort_key,
+    is_fully_scored,
 )
-import time
+from scheduler import iter_scored_candidates, RateLimiter, PackedScorer, BackgroundScoringRun, QuestionPrefetcher, DEFAULT_QUESTION_PREFETCH, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+from cache import ResultCache, cached_extract_key_requirements
+from ingestion import iter_extracted_texts, file_sha256
+from talent_pool import TalentPool
+from prescreen import prescreen_candidates
+from dedup import DEFAULT_DUPLICATE_THRESHOLD
+from knockout import KnockoutGate, knockout_requirements, DEFAULT_KNOCKOUT_MODEL
+from cascade import ModelCascade, DEFAULT_DRAFT_MODEL, DEFAULT_INVITE_THRESHOLD, DEFAULT_ESCALATION_MARGIN
+from session_store import SessionStore, spill_uploaded_files, compact_candidates
+from leaderboard import CardHtmlCache, filter_candidates, paginate, page_count, KNOCKOUT_FILTERS, PAGE_SIZES, DEFAULT_PAGE_SIZE
+from json_repair import get_json_repair_stats
+from llm_client import configure_llm_client, fallback_configs
+from metrics import registry as metrics_registry, llm_stage_summary, step_duration_summary, DEFAULT_METRICS_FILE
 import json
 
+LIVE_LEADERBOARD_REFRESH_SECONDS = 1.0
+TALENT_POOL_LOAD_BATCH = 32
+
 st.set_page_config(
     page_title="RecruitX | AI-Powered Hiring",
     page_icon="✨",
     layout="wide",
 )
 
+@st.cache_resource
+def get_rate_limiter() -> RateLimiter:
+    """One limiter for the Groq plan, shared by scoring and background work in every session."""
+    return RateLimiter(
+        requests_per_minute=int(st.secrets.get("GROQ_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)),
+        tokens_per_minute=int(st.secrets.get("GROQ_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE))
+    )
+
 if 'llm' not in st.session_state:
     try:
         st.session_state.llm = ChatGroq(
@@ -26,6 +49,18 @@ if 'llm' not in st.session_state:
             temperature=0.1,
             api_key=st.secrets["GROQ_API_KEY"]
         )
+        fallbacks = fallback_configs(st.session_state.llm.model_name, st.secrets["GROQ_API_KEY"],
+                                     st.secrets.get("GROQ_FALLBACK_API_KEYS", ""), st.secrets.get("GROQ_FALLBACK_MODELS", ""))
+        # Retries and failovers inside the client wait for the same limiter as first attempts.
+        configure_llm_client(st.session_state.llm, [ChatGroq(model=model, temperature=0.1, api_key=key) for model, key in fallbacks],
+                             limiter=get_rate_limiter())
+        # A small, fast model settles knock-out requirements that keywords and embeddings leave ambiguous.
+        st.session_state.knockout_llm = ChatGroq(model=st.secrets.get("GROQ_KNOCKOUT_MODEL", DEFAULT_KNOCKOUT_MODEL), temperature=0, api_key=st.secrets["GROQ_API_KEY"])
+        # Draft tiers for the model cascade, smallest first; the scoring model above is the last tier.
+        st.session_state.draft_llms = [ChatGroq(model=model.strip(), temperature=0.1, api_key=st.secrets["GROQ_API_KEY"])
+                                       for model in st.secrets.get("GROQ_CASCADE_MODELS", DEFAULT_DRAFT_MODEL).split(",") if model.strip()]
+        for small_llm in [st.session_state.knockout_llm, *st.session_state.draft_llms]:
+            configure_llm_client(small_llm, limiter=get_rate_limiter())
     except (KeyError, FileNotFoundError):
         st.error("🔴 GROQ_API_KEY not found. Please set it as an environment variable.")
         st.stop()
@@ -124,30 +159,109 @@ st.markdown("""
     .xai-gap { border-color: #dc3545; }
     .chat-bubble { padding: 1rem; border-radius: 10px; margin-bottom: 1rem; max-width: 80%; }
     .chat-bubble.user { background-color: var(--accent-color); color: var(--bg-color); align-self: flex-end; border-bottom-right-radius: 0; }
+    .leaderboard-card { margin-bottom: 1rem; }
+    .card-header { display: flex; justify-content: space-between; align-items: center; gap: 2rem; }
+    .score-bar { flex: 0 0 25%; font-size: 0.875rem; }
+    .score-bar > div { height: 0.5rem; border-radius: 4px; background-color: var(--border-color); margin-top: 0.25rem; }
+    .score-bar > div > div { height: 100%; border-radius: 4px; background-color: var(--accent-color); }
+    .card-note { padding: 0.75rem 1rem; border-radius: 8px; margin-bottom: 0.75rem; }
+    .card-note-error { background-color: rgba(220, 53, 69, 0.15); }
+    .card-note-info { background-color: rgba(0, 123, 255, 0.15); }
+    .card-note-warning { background-color: rgba(255, 193, 7, 0.15); }
+    .card-note-caption { padding: 0; color: var(--subtle-text-color); font-size: 0.875rem; }
+    .leaderboard-card details { border: 1px solid var(--border-color); border-radius: 8px; padding: 0.75rem 1rem; }
+    .leaderboard-card summary { cursor: pointer; margin-bottom: 0.5rem; }
     .chat-bubble.assistant { background-color: #2a2a2a; color: var(--text-color); align-self: flex-start; border-bottom-left-radius: 0; }
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """One SQLite result cache shared by every session in this process."""
+    return ResultCache()
+
+@st.cache_resource
+def get_talent_pool() -> TalentPool:
+    """Every resume screened so far, with its embeddings and per-job analyses, shared across sessions and job postings."""
+    return TalentPool()
+
+def export_metrics():
+    """Writes the Prometheus text file if a metrics path is configured."""
+    metrics_file = st.secrets.get("METRICS_FILE", DEFAULT_METRICS_FILE)
+    if metrics_file:
+        try:
+            metrics_registry.write_textfile(metrics_file)
+        except OSError as e:
+            print(f"Could not write metrics file {metrics_file}: {e}")
+
+def session_memory_bytes():
+    """Approximate memory this session holds: compact candidate records, rendered cards and resident chat indexes."""
+    candidates = st.session_state.candidates
+    resident = sum(c.nbytes() if hasattr(c, "nbytes") else len(json.dumps(c)) for c in candidates) + st.session_state.card_html_cache.nbytes()
+    pool = st.session_state.retriever_pool
+    return resident + (pool.resident_bytes() if pool else 0)
+
+def render_diagnostics():
+    """Sidebar panel showing where time, tokens and LLM calls are going in this process."""
+    st.markdown("<h5>LLM calls by stage</h5>", unsafe_allow_html=True)
+    llm_rows = llm_stage_summary()
+    if llm_rows: st.dataframe(llm_rows, hide_index=True, use_container_width=True)
+    else: st.caption("No LLM calls recorded yet.")
+    st.markdown("<h5>Pipeline steps</h5>", unsafe_allow_html=True)
+    step_rows = step_duration_summary()
+    if step_rows: st.dataframe(step_rows, hide_index=True, use_container_width=True)
+    else: st.caption("No steps timed yet.")
+    cache_stats = get_result_cache().stats()
+    repair_stats = get_json_repair_stats()
+    st.caption(f"Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} stored results.")
+    st.caption(f"JSON repairs: {repair_stats['local_repairs']} fixed locally, {repair_stats['llm_repairs']} needed the LLM, {repair_stats['failures']} failed.")
+    store = st.session_state.session_store
+    st.caption(f"Session memory: {session_memory_bytes() / 2**20:.1f} MB of a {store.budget_bytes / 2**20:.0f} MB budget; "
+               f"{store.spilled_bytes() / 2**20:.1f} MB kept on disk.")
+    cascade = st.session_state.analysis_cascade
+    if cascade is not None and cascade.scored:
+        summary = cascade.summary()
+        saved = f"about {summary['llm_seconds_saved']:.1f}s of LLM time saved" if summary['llm_seconds_saved'] is not None else "no full-model calls to compare with"
+        st.caption(f"Model cascade: {summary['escalated']} of {summary['scored']} candidates escalated ({summary['escalation_rate']:.0%}); {saved}.")
+    st.download_button("Download Prometheus metrics", metrics_registry.to_prometheus(), file_name="recruitx_metrics.prom", use_container_width=True)
+
 if "step" not in st.session_state:
     st.session_state.step = "upload"
     st.session_state.candidates = []
     st.session_state.key_requirements = []
-    st.session_state.chat_histories = {} 
-    st.session_state.rag_retrievers = {}
+    st.session_state.session_store = SessionStore()  # Uploaded files, resume texts, evidence and chats, on disk.
+    st.session_state.retriever_pool = None
     st.session_state.compare_list = []
     st.session_state.saved_job_description = ""
     st.session_state.saved_resume_files = []
+    st.session_state.weighted_reqs = {}
+    st.session_state.analysis_fingerprint = None
+    st.session_state.prescreen_settings = {"enabled": False, "top_k": 50, "threshold": 0}
+    st.session_state.analysis_run = None
+    st.session_state.analysis_resumes = []
+    st.session_state.analysis_notice = None
+    st.session_state.question_prefetcher = None
+    st.session_state.interview_questions = {}
+    st.session_state.use_talent_pool = False
+    st.session_state.skip_duplicates = True
+    st.session_state.knockout_gate_enabled = True
+    st.session_state.cascade_settings = {"enabled": False, "invite_threshold": DEFAULT_INVITE_THRESHOLD, "margin": DEFAULT_ESCALATION_MARGIN}
+    st.session_state.analysis_cascade = None
+    st.session_state.pack_resumes = False
+    st.session_state.card_html_cache = CardHtmlCache()  # Rendered leaderboard cards, so reruns only redraw a page.
 
 
 def proceed_to_weighting():
     """Validates inputs and calls the AI to extract requirements before proceeding."""
-    if not st.session_state.saved_job_description.strip() or not st.session_state.saved_resume_files:
-        st.warning("⚠️ Please provide a Job Description and upload at least one Resume.")
+    if not st.session_state.saved_job_description.strip() or not (st.session_state.saved_resume_files or st.session_state.use_talent_pool):
+        st.warning("⚠️ Please provide a Job Description and upload at least one Resume (or include the talent pool).")
         return
+    # From here on only names and sizes stay in memory; the bytes are read back from disk when scoring starts.
+    st.session_state.saved_resume_files = spill_uploaded_files(st.session_state.saved_resume_files or [], st.session_state.session_store)
 
     with st.spinner("AI is extracting key requirements from your Job Description..."):
         try:
-            requirements = extract_key_requirements(st.session_state.saved_job_description, st.session_state.llm)
+            requirements = cached_extract_key_requirements(st.session_state.saved_job_description, st.session_state.llm, get_result_cache())
             if requirements and isinstance(requirements, list) and len(requirements) > 0:
                 st.session_state.key_requirements = requirements
                 st.session_state.step = "weighting"
@@ -156,56 +270,148 @@ def proceed_to_weighting():
         except Exception as e:
             st.error(f"An error occurred during AI analysis: {e}")
 
-def run_final_analysis(weighted_reqs, resume_files, job_description):
-    with st.spinner("Performing deep analysis on all candidates..."):
-        resumes_to_process = []
-        for file in resume_files:
-            text = extract_pdf_text(file)
-            if text:
-                resumes_to_process.append({"text": text, "filename": file.name})
-        candidate_results = []
-        progress_bar = st.progress(0, "Analyzing candidates...")
-        total_candidates = len(resumes_to_process)
-
-        for i, res in enumerate(resumes_to_process):
-            try:
-                progress_bar.progress((i + 1) / total_candidates, f"Analyzing {res['filename']}...")
-                score_data = score_candidate_explainable(job_description, res["text"], weighted_reqs, st.session_state.llm)
-                result_dict = score_data.model_dump()
-                result_dict['filename'] = res['filename']
-                candidate_results.append(result_dict)
-                
-            except Exception as e:
-                print(f"Error processing {res['filename']}: {e}")
-                error_result = {
-                    "name": f"Error: {res['filename']}",
-                    "overall_score": 0,
-                    "summary": f"The AI failed to process this resume. Please check the file. Error: {e}",
-                    "requirement_analysis": [],
-                    "filename": res['filename']
-                }
-                candidate_results.append(error_result)
-            
-            time.sleep(1)
-        
-        progress_bar.empty()
-        st.session_state.candidates = sorted(candidate_results, key=lambda x: x['overall_score'], reverse=True)
-        
-        st.session_state.rag_retrievers = {}
-        st.session_state.chat_histories = {}
-        for candidate in st.session_state.candidates:
-            if "Error:" not in candidate['name']:
-                candidate_name = candidate['name']
-                full_text_info = next((res for res in resumes_to_process if res['filename'] == candidate.get('filename')), None)
-                if full_text_info:
-                    retriever = create_candidate_rag_retriever(full_text_info['text'], full_text_info['filename'])
-                    st.session_state.rag_retrievers[candidate_name] = retriever
-                    st.session_state.chat_histories[candidate_name] = []
+def run_final_analysis(weighted_reqs, resume_files, job_description, prescreen_settings=None, use_talent_pool=False, skip_duplicates=True,
+                       knockout_gate=True, cascade_settings=None, pack_resumes=False):
+    """Starts scoring on a background thread; the results page fills in as each candidate completes."""
+    cache = get_result_cache()
+    talent_pool = get_talent_pool()
+    llm = st.session_state.llm
+    files = [(file.name, file.getvalue()) for file in resume_files]
+    uploaded_hashes = {file_sha256(data) for _, data in files}
+    # Saved candidates are screened straight from the pool, without re-reading or re-embedding their files.
+    # Only their names are listed up front; texts are loaded in small batches as the scorer reaches them.
+    pool_resumes = [res for res in talent_pool.list_resumes() if res["sha256"] not in uploaded_hashes] if use_talent_pool else []
+    # Filenames key chat, questions and widgets, so a saved resume named like another candidate's is shown with its hash.
+    taken_filenames = {name for name, _ in files}
+    for i, res in enumerate(pool_resumes):
+        if res["filename"] in taken_filenames:
+            pool_resumes[i] = res = {**res, "filename": f"{res['filename']} ({res['sha256'][:8]})"}
+        taken_filenames.add(res["filename"])
+    limiter = get_rate_limiter()
+    # Knock-out requirements are checked cheaply first; candidates who clearly fail one never reach the scoring model.
+    gate = KnockoutGate(weighted_reqs, st.session_state.knockout_llm, limiter, cache, talent_pool) if knockout_gate else None
+    # Fast models score first; only borderline or doubtful verdicts are escalated to the scoring model.
+    cascade = (ModelCascade(st.session_state.draft_llms, cascade_settings["invite_threshold"], cascade_settings["margin"])
+               if cascade_settings and cascade_settings["enabled"] and st.session_state.draft_llms else None)
+    # Short resumes share one request, so the JD and rubric tokens are paid once per pack.
+    packer = PackedScorer(job_description, weighted_reqs) if pack_resumes else None
+    resumes_to_process = []
 
-        st.session_state.step = "results"
+    def readable_resumes(cancel_event):
+        # Extraction runs in a process pool; each resume is handed to the scorer as soon as its text is ready.
+        # On cancel the generator is closed, which stops the pool instead of reading the remaining files.
+        extracted = iter_extracted_texts(files, cache=cache)
+        try:
+            for res in extracted:
+                if cancel_event.is_set():
+                    return
+                if res["text"]:
+                    resumes_to_process.append(res)
+                    yield res
+            for start in range(0, len(pool_resumes), TALENT_POOL_LOAD_BATCH):
+                batch = pool_resumes[start:start + TALENT_POOL_LOAD_BATCH]
+                texts = {res["sha256"]: res["text"] for res in talent_pool.get_resumes([res["sha256"] for res in batch])}
+                for res in batch:
+                    if cancel_event.is_set():
+                        return
+                    # Already in the pool, so only the name is kept; chat reloads the text from the pool if needed.
+                    resumes_to_process.append(res)
+                    yield {**res, "text": texts.get(res["sha256"], "")}
+        finally:
+            extracted.close()
+
+    def produce(cancel_event):
+        resumes_to_score = readable_resumes(cancel_event)
+        if prescreen_settings and prescreen_settings["enabled"]:
+            # Rank every resume by embedding similarity first; only the shortlist costs LLM calls.
+            resumes = list(resumes_to_score)
+            if cancel_event.is_set():
+                talent_pool.add_resumes(resumes_to_process)
+                return
+            resumes_to_score, screened_out = prescreen_candidates(resumes, weighted_reqs, top_k=prescreen_settings["top_k"],
+                                                                  threshold=prescreen_settings["threshold"] or None, talent_pool=talent_pool)
+            yield from screened_out
+        yield from iter_scored_candidates(job_description, resumes_to_score, weighted_reqs, llm, limiter=limiter, cache=cache,
+                                          cancel_event=cancel_event, talent_pool=talent_pool,
+                                          duplicate_threshold=DEFAULT_DUPLICATE_THRESHOLD if skip_duplicates else None, knockout_gate=gate,
+                                          cascade=cascade, packer=packer)
+        talent_pool.add_resumes(resumes_to_process)
+
+    st.session_state.candidates = []
+    st.session_state.card_html_cache.clear()
+    st.session_state.retriever_pool = None
+    st.session_state.session_store.clear("chat")
+    st.session_state.analysis_fingerprint = None
+    st.session_state.analysis_notice = None
+    st.session_state.question_prefetcher = None
+    st.session_state.interview_questions = {}
+    st.session_state.analysis_resumes = resumes_to_process
+    st.session_state.analysis_cascade = cascade
+    st.session_state.analysis_run = BackgroundScoringRun(produce, total=len(files) + len(pool_resumes))
+    st.session_state.step = "results"
+
+def finish_analysis(run, prefetch=True):
+    """Ranks the final results and prepares chat once the background run has stopped.
+
+    With `prefetch`, the top candidates' chat indexes and interview questions are started in the background;
+    a cancelled run only keeps its partial results, and anything else is built on first use.
+    """
+    st.session_state.analysis_run = None
+    store = st.session_state.session_store
+    st.session_state.candidates = compact_candidates(sorted(run.snapshot(), key=leaderboard_sort_key, reverse=True), store)
+    scored = [c for c in st.session_state.candidates if is_fully_scored(c) and not c.get('duplicate_of')]
+    scored_filenames = {c['filename'] for c in scored}
+    # Chat indexes are built on first use; only the top of the leaderboard is indexed ahead of time, in the background.
+    # Near-duplicates share their representative's index.
+    # Resume texts wait on disk, and the least recently used indexes are dropped to stay within the session's memory budget.
+    st.session_state.retriever_pool = LazyRetrieverPool([res for res in st.session_state.analysis_resumes if res['filename'] in scored_filenames], get_talent_pool(),
+                                                        store=store, max_resident_bytes=max(0, store.budget_bytes - session_memory_bytes()))
+    st.session_state.analysis_resumes = []
+    # Questions for the top candidates are generated speculatively, so the button usually answers instantly.
+    st.session_state.question_prefetcher = QuestionPrefetcher(st.session_state.saved_job_description, st.session_state.llm, get_rate_limiter(), get_result_cache())
+    if prefetch:
+        st.session_state.retriever_pool.prefetch([c['filename'] for c in scored[:DEFAULT_RETRIEVER_PREFETCH]])
+        st.session_state.question_prefetcher.prefetch(scored[:DEFAULT_QUESTION_PREFETCH])
+
+    analyzed = len(st.session_state.candidates)
+    if run.error:
+        st.session_state.analysis_notice = f"Analysis stopped by an error after {analyzed} of {run.total} candidates: {run.error}"
+    elif run.cancelled:
+        st.session_state.analysis_notice = f"Analysis cancelled after {analyzed} of {run.total} candidates. Run it again to score the rest."
+    else:
+        # Only a complete run can be re-ranked locally when just the weights change.
+        st.session_state.analysis_fingerprint = get_analysis_fingerprint(st.session_state.saved_resume_files, st.session_state.saved_job_description)
+    export_metrics()
+
+def cancel_analysis():
+    run = st.session_state.analysis_run
+    if run is not None:
+        run.cancel()
+        finish_analysis(run, prefetch=False)
+
+def get_analysis_fingerprint(resume_files, job_description):
+    """Identifies the inputs the LLM verdicts depend on; weights are applied locally and are not part of it.
+
+    Knock-out flags are, while the knock-out gate is on: it decides which candidates are scored at all.
+    So are the cascade settings and, while the cascade is on, the weights: a draft verdict is escalated
+    on its weighted score, so they decide which model judges each candidate. The pre-screen ranks by
+    importance-weighted similarity, so while it is on the weights also decide who is shortlisted.
+    """
+    prescreen = tuple(sorted(st.session_state.prescreen_settings.items()))
+    knockouts = tuple(knockout_requirements(st.session_state.weighted_reqs)) if st.session_state.knockout_gate_enabled else None
+    cascade_on = st.session_state.cascade_settings["enabled"]
+    cascade = tuple(sorted(st.session_state.cascade_settings.items())) if cascade_on else None
+    weights = json.dumps(st.session_state.weighted_reqs, sort_keys=True) if cascade_on or st.session_state.prescreen_settings["enabled"] else None
+    return (job_description, tuple(st.session_state.key_requirements), tuple((f.name, f.size) for f in resume_files), prescreen, st.session_state.use_talent_pool,
+            st.session_state.skip_duplicates, knockouts, cascade, weights)
+
+def go_back_to_weighting():
+    cancel_analysis()
+    st.session_state.step = "weighting"
 
 def go_back_to_upload():
     """Resets the state to go back to the first step."""
+    cancel_analysis()
     st.session_state.step = "upload"
     st.session_state.key_requirements = []
 
@@ -213,9 +419,135 @@ def trigger_analysis():
     weighted_reqs = {}
     for req in st.session_state.key_requirements:
         weighted_reqs[req] = { "importance": st.session_state[f"imp_{req}"], "knockout": st.session_state[f"ko_{req}"] }
-    run_final_analysis(weighted_reqs, st.session_state.saved_resume_files, st.session_state.saved_job_description)
+    st.session_state.weighted_reqs = weighted_reqs
+    st.session_state.prescreen_settings = {
+        "enabled": st.session_state.prescreen_enabled,
+        "top_k": int(st.session_state.prescreen_top_k),
+        "threshold": st.session_state.prescreen_threshold,
+    }
+    st.session_state.skip_duplicates = st.session_state.skip_duplicates_enabled
+    st.session_state.knockout_gate_enabled = st.session_state.knockout_gate_toggle
+    st.session_state.pack_resumes = st.session_state.pack_resumes_enabled
+    st.session_state.cascade_settings = {
+        "enabled": st.session_state.cascade_enabled,
+        "invite_threshold": st.session_state.cascade_invite_threshold,
+        "margin": st.session_state.cascade_margin,
+    }
+    fingerprint = get_analysis_fingerprint(st.session_state.saved_resume_files, st.session_state.saved_job_description)
+    if st.session_state.candidates and st.session_state.analysis_fingerprint == fingerprint:
+        # Only the weights changed: re-rank from the stored verdicts without any LLM calls.
+        st.session_state.candidates = rescore_candidates(st.session_state.candidates, weighted_reqs)
+        st.session_state.step = "results"
+        return
+    run_final_analysis(weighted_reqs, st.session_state.saved_resume_files, st.session_state.saved_job_description, st.session_state.prescreen_settings,
+                       st.session_state.use_talent_pool, st.session_state.skip_duplicates, st.session_state.knockout_gate_enabled,
+                       st.session_state.cascade_settings, st.session_state.pack_resumes)
+
+
+def render_candidate_card(candidate, interactive=True):
+    """Renders one leaderboard entry from its cached HTML; interview questions and chat are only offered when `interactive`."""
+    st.markdown(st.session_state.card_html_cache.get(candidate), unsafe_allow_html=True)
+    if interactive and is_fully_scored(candidate):
+        render_candidate_actions(candidate)
+
+@st.fragment
+def render_candidate_actions(candidate):
+    """Interview questions and chat for one candidate; as a fragment, using them reruns only this card."""
+    if st.button("🤖 Generate Interview Questions", key=f"gen_q_{candidate['filename']}"):
+        with st.spinner("Generating..."):
+            st.session_state.interview_questions[candidate['filename']] = st.session_state.question_prefetcher.get(candidate)
+    questions = st.session_state.interview_questions.get(candidate['filename'])
+    if questions:
+        st.markdown("<h5>Behavioral Questions:</h5>", unsafe_allow_html=True)
+        for q in questions.behavioral: st.markdown(f"- {q}")
+        st.markdown("<h5>Technical Questions:</h5>", unsafe_allow_html=True)
+        for q in questions.technical: st.markdown(f"- {q}")
+
+    st.markdown("<hr style='border-color:var(--border-color); margin: 1.5rem 0;'>", unsafe_allow_html=True)
+    st.markdown("<h5>💬 Chat about this Candidate</h5>", unsafe_allow_html=True)
+    chat_container = st.container(height=200)
+    # Keyed by file: duplicates (and namesakes) get the same LLM-extracted name.
+    store = st.session_state.session_store
+    chat_history = store.get_json("chat", candidate['filename'], [])
+    with chat_container:
+        for msg in chat_history:
+            st.markdown(f"<div class='chat-bubble {msg['role']}'>{msg['content']}</div>", unsafe_allow_html=True)
+
+    if prompt := st.chat_input("Ask about this candidate...", key=f"chat_{candidate['filename']}"):
+        chat_history.append({"role": "user", "content": prompt})
+        store.put_json("chat", candidate['filename'], chat_history)
+        pool = st.session_state.retriever_pool
+        with chat_container:
+            st.markdown(f"<div class='chat-bubble user'>{prompt}</div>", unsafe_allow_html=True)
+            with st.spinner("Indexing this resume for chat..."):
+                chain = pool.get_chain(candidate.get('duplicate_of') or candidate['filename'], st.session_state.llm)
+            if chain:
+                answer_bubble = st.empty()
+                answer = ""
+                answer_bubble.markdown("<div class='chat-bubble assistant'>▌</div>", unsafe_allow_html=True)
+                for token in stream_rag_answer(chain, prompt, st.session_state.llm):
+                    answer += token
+                    answer_bubble.markdown(f"<div class='chat-bubble assistant'>{answer}▌</div>", unsafe_allow_html=True)
+                answer_bubble.markdown(f"<div class='chat-bubble assistant'>{answer}</div>", unsafe_allow_html=True)
+                chat_history.append({"role": "assistant", "content": answer})
+                store.put_json("chat", candidate['filename'], chat_history)
+            else:
+                st.error("❗️ Could not index this resume for chat.")
+                answer = "Chat is unavailable for this candidate: their resume text could not be loaded."
+                st.markdown(f"<div class='chat-bubble assistant'>{answer}</div>", unsafe_allow_html=True)
+                chat_history.append({"role": "assistant", "content": answer})
+                store.put_json("chat", candidate['filename'], chat_history)
+
+@st.fragment(run_every=LIVE_LEADERBOARD_REFRESH_SECONDS)
+def render_live_leaderboard():
+    """Re-sorts and redraws the leaderboard as candidates finish scoring, until the run stops."""
+    run = st.session_state.analysis_run
+    if run is None:
+        st.rerun()  # Stopped from the button; redraw the whole results page.
+    if run.done:
+        finish_analysis(run)
+        st.rerun()
+    results = run.snapshot()
+    st.session_state.candidates = sorted(results, key=leaderboard_sort_key, reverse=True)
+    status_cols = st.columns([4, 1])
+    with status_cols[0]:
+        st.progress(min(1.0, len(results) / max(1, run.total)), f"Analyzed {len(results)}/{run.total} candidates. Results appear below as they are scored...")
+    with status_cols[1]:
+        st.button("⏹️ Stop Analysis", on_click=cancel_analysis, use_container_width=True)
+    for candidate in st.session_state.candidates[:DEFAULT_PAGE_SIZE]:
+        render_candidate_card(candidate, interactive=False)
+    if len(st.session_state.candidates) > DEFAULT_PAGE_SIZE:
+        st.caption(f"Showing the top {DEFAULT_PAGE_SIZE} of {len(st.session_state.candidates)} so far; filter and page through all of them once the analysis finishes.")
+
+@st.fragment
+def render_leaderboard():
+    """Filters and pages the leaderboard; changing a filter or page reruns only this tab and draws one page of cards."""
+    candidates = st.session_state.candidates
+    if not candidates:
+        st.info("No candidates were processed. Please go back and upload resumes.")
+        return
+    requirements = list(st.session_state.weighted_reqs)
+    if "leaderboard_required" in st.session_state:
+        # Re-weighting can rename the requirement list; drop filters on requirements that are gone.
+        st.session_state.leaderboard_required = [req for req in st.session_state.leaderboard_required if req in requirements]
+    filter_cols = st.columns([2, 2, 3])
+    with filter_cols[0]: score_range = st.slider("Score range", 0, 100, (0, 100), key="leaderboard_score_range")
+    with filter_cols[1]: knockout_filter = st.selectbox("Knock-outs", KNOCKOUT_FILTERS, key="leaderboard_knockout_filter")
+    with filter_cols[2]: required = st.multiselect("Must meet", requirements, key="leaderboard_required")
+    matching = filter_candidates(candidates, score_range, knockout_filter, required, requirements)
+    page_cols = st.columns([1, 1, 3])
+    with page_cols[0]: page_size = st.selectbox("Per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key="leaderboard_page_size")
+    with page_cols[1]: page = st.number_input("Page", min_value=1, step=1, key="leaderboard_page")
+    pages = page_count(len(matching), page_size)
+    with page_cols[2]: st.caption(f"{len(matching)} of {len(candidates)} candidates match. Page {min(page, pages)} of {pages}.")
+    for candidate in paginate(matching, page, page_size):
+        render_candidate_card(candidate)
 
 
+with st.sidebar:
+    if st.toggle("🔧 Show diagnostics", key="show_diagnostics"):
+        render_diagnostics()
+
 st.markdown('<div class="main-content-wrapper fade-in">', unsafe_allow_html=True)
 st.markdown('<div class="header"><h1>RecruitX</h1><p>AI-Powered Talent Analysis. From Resumes to Revenue in Minutes.</p></div>', unsafe_allow_html=True)
 
@@ -229,6 +561,10 @@ if st.session_state.step == "upload":
     with col2:
         st.markdown("<h5>👥 Upload Candidate Resumes</h5>", unsafe_allow_html=True)
         st.session_state.saved_resume_files = st.file_uploader("Upload Resumes", type=["pdf"], accept_multiple_files=True, label_visibility="collapsed")
+        pool_size = len(get_talent_pool())
+        if pool_size:
+            st.session_state.use_talent_pool = st.checkbox(f"📚 Also screen the {pool_size} candidates saved in the talent pool", value=st.session_state.use_talent_pool,
+                                                           help="Resumes from earlier analyses are matched against this job without re-uploading them.")
     st.markdown("<br>", unsafe_allow_html=True)
     st.markdown('<div class="primary-action-button">', unsafe_allow_html=True)
     st.button("Analyze Requirements", on_click=proceed_to_weighting, use_container_width=True)
@@ -242,10 +578,33 @@ elif st.session_state.step == "weighting":
         st.markdown(f'<div class="staggered-fade-in-up" style="animation-delay: {i*100}ms">', unsafe_allow_html=True)
         cols = st.columns([4, 2, 1])
         with cols[0]: st.write(f"▸ {req}")
-        with cols[1]: st.selectbox("Importance", ["Normal", "Important", "Critical"], key=f"imp_{req}", index=1, label_visibility="collapsed")
-        with cols[2]: st.checkbox("Knock-Out?", key=f"ko_{req}", help="If unchecked, this requirement is a deal-breaker.")
+        saved_weight = st.session_state.weighted_reqs.get(req, {})
+        importance_options = ["Normal", "Important", "Critical"]
+        with cols[1]: st.selectbox("Importance", importance_options, key=f"imp_{req}", index=importance_options.index(saved_weight.get("importance", "Important")), label_visibility="collapsed")
+        with cols[2]: st.checkbox("Knock-Out?", key=f"ko_{req}", value=saved_weight.get("knockout", False), help="If checked, this requirement is a deal-breaker.")
         st.markdown('</div>', unsafe_allow_html=True)
     st.markdown("<br>", unsafe_allow_html=True)
+    saved_prescreen = st.session_state.prescreen_settings
+    with st.expander("⚡ Pre-screening for large batches", expanded=saved_prescreen["enabled"]):
+        st.checkbox("Shortlist candidates by embedding similarity before AI scoring", key="prescreen_enabled", value=saved_prescreen["enabled"],
+                    help="Resumes outside the shortlist are listed on the leaderboard with their similarity but are not sent to the LLM.")
+        ps_cols = st.columns(2)
+        with ps_cols[0]: st.number_input("Send the top K candidates to AI scoring", min_value=1, step=5, key="prescreen_top_k", value=saved_prescreen["top_k"])
+        with ps_cols[1]: st.slider("Minimum similarity (%)", 0, 100, key="prescreen_threshold", value=saved_prescreen["threshold"], help="0 disables the threshold.")
+    st.checkbox("🔁 Score near-duplicate resumes only once", key="skip_duplicates_enabled", value=st.session_state.skip_duplicates,
+                help="Resubmitted or lightly edited copies of a resume are linked to the first copy and reuse its analysis instead of costing another AI call.")
+    st.checkbox("⛔ Check knock-out requirements before full scoring", key="knockout_gate_toggle", value=st.session_state.knockout_gate_enabled,
+                help="Candidates with clearly no evidence for a knock-out requirement are eliminated by a keyword, embedding and small-model check, without the full AI analysis.")
+    st.checkbox("📦 Score short resumes several to a request", key="pack_resumes_enabled", value=st.session_state.pack_resumes,
+                help="Sends the job description and requirements once for a pack of short resumes, stretching the token quota. Any resume the reply misses is scored on its own.")
+    saved_cascade = st.session_state.cascade_settings
+    with st.expander("🪜 Model cascade", expanded=saved_cascade["enabled"]):
+        st.checkbox("Score with a fast model first and escalate only uncertain candidates", key="cascade_enabled", value=saved_cascade["enabled"],
+                    disabled=not st.session_state.draft_llms,
+                    help="Candidates near the invite threshold, failing a knock-out or with doubtful requirement verdicts are re-scored by the full model.")
+        cascade_cols = st.columns(2)
+        with cascade_cols[0]: st.slider("Invite threshold", 0, 100, key="cascade_invite_threshold", value=saved_cascade["invite_threshold"])
+        with cascade_cols[1]: st.slider("Escalate scores within ± points of it", 0, 50, key="cascade_margin", value=saved_cascade["margin"])
     btn_cols = st.columns(2)
     with btn_cols[0]:
         st.markdown('<div class="secondary-action-button">', unsafe_allow_html=True)
@@ -259,59 +618,23 @@ elif st.session_state.step == "weighting":
 
 # PASTE THIS ENTIRE BLOCK INTO YOUR app.py
 
+elif st.session_state.step == "results" and st.session_state.analysis_run is not None:
+    st.info("⏳ Analysis in progress. Candidates appear and re-rank as they are scored; expand any of them while the rest are processing.")
+    render_live_leaderboard()
+
 elif st.session_state.step == "results":
-    st.success("✅ Analysis Complete! Explore your results below.")
+    if st.session_state.analysis_notice: st.warning(f"⚠️ {st.session_state.analysis_notice}")
+    else: st.success("✅ Analysis Complete! Explore your results below.")
+    st.markdown('<div class="secondary-action-button">', unsafe_allow_html=True)
+    st.button("⬅️ Adjust Weights", on_click=go_back_to_weighting, help="Re-rank instantly with different importance or knock-out settings.")
+    st.markdown('</div>', unsafe_allow_html=True)
     tabs = st.tabs(["🏆 Leaderboard", "🤝 Compare Candidates", "✉️ Email Drafts"])
     
     with tabs[0]:
-        # This part is for the Leaderboard
-        if not st.session_state.candidates:
-            st.info("No candidates were processed. Please go back and upload resumes.")
-        
-        for candidate in st.session_state.candidates:
-            st.markdown('<div class="input-card" style="margin-bottom: 1.5rem;">', unsafe_allow_html=True)
-            candidate_name = candidate['name']
-            col1, col2 = st.columns([3, 1])
-            with col1: st.markdown(f"<h3 class='candidate-name'>{candidate_name}</h3>", unsafe_allow_html=True)
-            with col2: st.progress(candidate['overall_score'], text=f"Overall Score: {candidate['overall_score']}%")
-            st.markdown(f"<p style='color: var(--subtle-text-color);'>{candidate['summary']}</p>", unsafe_allow_html=True)
-            
-            if "Error:" not in candidate_name:
-                with st.expander("View Detailed Requirement Analysis (XAI)"):
-                    for req in candidate['requirement_analysis']:
-                        if req['match_status']: st.markdown(f"<div class='xai-item xai-met'><b>✅ Met:</b> {req['requirement']}<br><small><i><b>Evidence:</b> \"{req['evidence']}\"</i></small></div>", unsafe_allow_html=True)
-                        else: st.markdown(f"<div class='xai-item xai-gap'><b>❌ Gap:</b> {req['requirement']}<br><small><i><b>Reason:</b> {req['evidence']}</i></small></div>", unsafe_allow_html=True)
-                
-                if st.button("🤖 Generate Interview Questions", key=f"gen_q_{candidate_name}"):
-                    with st.spinner("Generating..."):
-                        questions = generate_interview_questions(candidate['name'], candidate['summary'], st.session_state.saved_job_description, st.session_state.llm)
-                        st.markdown("<h5>Behavioral Questions:</h5>", unsafe_allow_html=True)
-                        for q in questions.behavioral: st.markdown(f"- {q}")
-                        st.markdown("<h5>Technical Questions:</h5>", unsafe_allow_html=True)
-                        for q in questions.technical: st.markdown(f"- {q}")
-                
-                st.markdown("<hr style='border-color:var(--border-color); margin: 1.5rem 0;'>", unsafe_allow_html=True)
-                st.markdown("<h5>💬 Chat about this Candidate</h5>", unsafe_allow_html=True)
-                chat_container = st.container(height=200)
-                with chat_container:
-                    if candidate_name in st.session_state.chat_histories:
-                        for msg in st.session_state.chat_histories[candidate_name]:
-                            st.markdown(f"<div class='chat-bubble {msg['role']}'>{msg['content']}</div>", unsafe_allow_html=True)
-                
-                if prompt := st.chat_input("Ask about this candidate...", key=f"chat_{candidate_name}"):
-                    st.session_state.chat_histories[candidate_name].append({"role": "user", "content": prompt})
-                    retriever = st.session_state.rag_retrievers.get(candidate_name)
-                    if retriever:
-                        with chat_container:
-                            st.markdown(f"<div class='chat-bubble user'>{prompt}</div>", unsafe_allow_html=True)
-                            with st.spinner("Thinking..."):
-                                answer = ask_rag_question(retriever, prompt, st.session_state.llm)
-                                st.session_state.chat_histories[candidate_name].append({"role": "assistant", "content": answer})
-                                st.markdown(f"<div class='chat-bubble assistant'>{answer}</div>", unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
+        render_leaderboard()
 
     with tabs[1]:
-        st.multiselect("Select candidates to compare side-by-side:", [c['name'] for c in st.session_state.candidates if "Error:" not in c['name']], key="compare_list")
+        st.multiselect("Select candidates to compare side-by-side:", [c['name'] for c in st.session_state.candidates if is_fully_scored(c) and not c.get('duplicate_of')], key="compare_list")
         if len(st.session_state.compare_list) > 1:
             compare_data = {c['name']: c for c in st.session_state.candidates if c['name'] in st.session_state.compare_list}
             cols = st.columns(len(st.session_state.compare_list))
@@ -340,30 +663,39 @@ elif st.session_state.step == "results":
             email_cols = st.columns(2)
             with email_cols[0]:
                 st.markdown("<h5>Configuration</h5>", unsafe_allow_html=True)
-                num_to_invite = st.slider("Number of top candidates to invite", 1, max_candidates, min(3, max_candidates))
-                min_score = st.slider("Minimum score to invite", 0, 100, 75)
+                num_to_invite = st.slider("Number of top candidates to invite", 1, max(2, max_candidates), min(3, max_candidates))
+                min_score = st.slider("Minimum score to invite", 0, 100, st.session_state.cascade_settings["invite_threshold"])
+                personalized = st.toggle("Fully personalized emails", help="Writes every email with its own AI call instead of filling shared templates. Slower for large pools.")
             with email_cols[1]:
                 st.markdown("<h5>Interview Scheduling</h5>", unsafe_allow_html=True)
                 interview_date = st.date_input("Interview Date")
                 interview_time = st.time_input("Interview Time")
             
             if st.button("Generate All Emails", use_container_width=True, type="primary"):
-                with st.spinner("Crafting personalized emails..."):
+                with st.spinner("Crafting personalized emails..." if personalized else "Writing email templates..."):
                     job_title = "the position"
                     if st.session_state.saved_job_description:
                         job_title = st.session_state.saved_job_description.splitlines()[0]
 
                     interview_datetime_str = f"{interview_date.strftime('%A, %B %d, %Y')} at {interview_time.strftime('%I:%M %p')}"
+                    email_progress = st.progress(0, "Generating emails...")
                     st.session_state.generated_emails = generate_email_templates(
                         valid_candidates, 
                         {"title": job_title}, 
                         num_to_invite, 
                         min_score, 
                         interview_datetime_str, 
-                        st.session_state.llm
+                        st.session_state.llm,
+                        personalized=personalized,
+                        limiter=get_rate_limiter(),
+                        progress_callback=lambda done, total: email_progress.progress(done / total, f"Generated {done}/{total} emails")
                     )
+                    email_progress.empty()
             
             if 'generated_emails' in st.session_state and st.session_state.generated_emails:
+                failed = st.session_state.generated_emails.get('failed', [])
+                if failed:
+                    st.warning(f"⚠️ Could not generate emails for {len(failed)} candidate(s): {', '.join(failed)}. Generate again to retry.")
                 st.markdown("<hr style='border-color:var(--border-color); margin: 2rem 0;'>", unsafe_allow_html=True)
                 invite_col, reject_col = st.columns(2)
                 with invite_col:
@@ -385,4 +717,5 @@ elif st.session_state.step == "results":
         else:
             st.warning("⚠️ No valid candidate profiles were generated. Cannot create emails.")
 
-st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+st.markdown('</div>', unsafe_allow_html=True)
+st.session_state.session_store.report(session_memory_bytes())
\ No newline at end of file
@@ -0,0 +1,240 @@
+import argparse
+import json
+import random
+import re
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from typing import List, Dict, Any, Optional, Tuple
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import knockout
+import utils
+from fake_llm import FakeChatModel
+from ingestion import iter_extracted_texts
+from json_repair import get_json_repair_stats
+from metrics import llm_stage_summary, step_duration_summary
+from scheduler import iter_scored_candidates, RateLimiter, PackedScorer
+from dedup import DEFAULT_DUPLICATE_THRESHOLD
+from cascade import ModelCascade, DEFAULT_INVITE_THRESHOLD, DEFAULT_ESCALATION_MARGIN
+from utils import (
+    build_candidate_index,
+    build_rag_chain,
+    stream_rag_answer,
+    generate_email_templates,
+    is_fully_scored,
+)
+
+SKILL_POOL = [
+    "Python", "Java", "Go", "Rust", "Kubernetes", "Docker", "AWS", "GCP", "Azure", "Terraform",
+    "PostgreSQL", "Kafka", "Spark", "Airflow", "React", "TypeScript", "PyTorch", "TensorFlow",
+    "Machine Learning", "CI/CD", "Linux", "GraphQL", "Redis", "Microservices",
+]
+FIRST_NAMES = ["Ava", "Liam", "Maya", "Noah", "Priya", "Omar", "Lena", "Kenji", "Sofia", "Arjun", "Zara", "Mateo"]
+LAST_NAMES = ["Patel", "Garcia", "Kim", "Okafor", "Novak", "Silva", "Chen", "Haddad", "Larsen", "Rossi"]
+FILLER = ("Delivered projects with cross-functional teams, improved reliability and reduced costs. "
+          "Mentored engineers, wrote design documents and owned services end to end in production. ")
+BENCH_JOB_DESCRIPTION = ("Senior Backend Engineer\n"
+                         "We need 5+ years of Python, production Kubernetes and AWS experience, Kafka streaming, "
+                         "PostgreSQL tuning, Terraform and CI/CD ownership.")
+BENCH_WEIGHTS = {
+    "Python": {"importance": "Critical", "knockout": False},
+    "Kubernetes": {"importance": "Important", "knockout": False},
+    "AWS": {"importance": "Important", "knockout": False},
+    "Kafka": {"importance": "Normal", "knockout": False},
+    "PostgreSQL": {"importance": "Normal", "knockout": False},
+    "Terraform": {"importance": "Normal", "knockout": False},
+}
+BENCH_QUESTIONS = ["Does the candidate know Python?", "Summarize their cloud experience.", "Which databases have they used?"]
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """Builds a minimal valid PDF with one Helvetica text block per page."""
+    page_count = len(pages)
+    font_id = 3 + 2 * page_count
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{3 + 2 * i} 0 R" for i in range(page_count)), page_count),
+    ]
+    for i, lines in enumerate(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>")
+        text = " ".join("(%s) '" % re.sub(r"[()\\]", "", line) for line in lines)
+        stream = f"BT /F1 10 Tf 50 750 Td 12 TL {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    body, offsets = "%PDF-1.4\n", []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n"
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n" + "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return body.encode("latin-1")
+
+def generate_resume_corpus(count: int, seed: int = 0, max_pages: int = 3, duplicate_rate: float = 0.0) -> List[Tuple[str, bytes]]:
+    """A reproducible set of synthetic resumes as (filename, pdf bytes) pairs.
+
+    A `duplicate_rate` share of them are resubmissions of an earlier resume with one line added.
+    """
+    rng = random.Random(seed)
+    corpus, all_pages = [], []
+    for i in range(count):
+        if all_pages and rng.random() < duplicate_rate:
+            original = rng.choice(all_pages)
+            pages = original[:-1] + [original[-1] + ["References available on request."]]
+            corpus.append((f"resume_{i:05d}.pdf", make_pdf(pages)))
+            continue
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        skills = rng.sample(SKILL_POOL, rng.randint(4, 12))
+        pages = [[name, f"candidate{i}@example.com", "Skills: " + ", ".join(skills)]]
+        for _ in range(rng.randint(1, max_pages)):
+            pages.append([f"Worked with {skill}. {FILLER}"[:110] for skill in rng.sample(skills, min(len(skills), 8))])
+        all_pages.append(pages)
+        corpus.append((f"resume_{i:05d}.pdf", make_pdf(pages)))
+    return corpus
+
+class StageTimer:
+    """Collects wall time, throughput and peak Python memory for each pipeline stage."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        record = {"items": 0}
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - started
+            record["wall_seconds"] = round(elapsed, 4)
+            record["throughput_per_second"] = round(record["items"] / elapsed, 2) if elapsed > 0 else None
+            record["peak_python_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            self.stages[name] = record
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.embeddings == "fake":
+        fake_embeddings = DeterministicFakeEmbedding(size=384)
+        utils.get_embeddings = knockout.get_embeddings = lambda: fake_embeddings
+    llm = FakeChatModel(latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                        malformed_rate=args.malformed_rate, seed=args.seed)
+    draft_llm = FakeChatModel(model_name="fake-draft-model", latency=args.draft_latency if args.draft_latency is not None else args.latency / 4,
+                              verdict_noise=args.draft_noise, seed=args.seed + 1)
+    corpus = generate_resume_corpus(args.resumes, seed=args.seed, duplicate_rate=args.duplicate_rate)
+    timer = StageTimer()
+    tracemalloc.start()
+
+    with timer.stage("pdf_extraction") as record:
+        resumes = [res for res in iter_extracted_texts(corpus, max_workers=args.pdf_workers) if res["text"]]
+        record["items"] = len(resumes)
+
+    weights = {req: {**weight, "knockout": weight["knockout"] or req in args.knockout} for req, weight in BENCH_WEIGHTS.items()}
+    with timer.stage("scoring") as record:
+        limiter = RateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm, base_backoff=0.1)
+        knockout_gate = None if args.no_knockout_gate else knockout.KnockoutGate(weights, llm, limiter)
+        cascade = ModelCascade([draft_llm], args.invite_threshold, args.escalation_margin) if args.cascade else None
+        packer = PackedScorer(BENCH_JOB_DESCRIPTION, weights) if args.pack else None
+        candidates = list(iter_scored_candidates(BENCH_JOB_DESCRIPTION, resumes, weights, llm,
+                                                 max_concurrency=args.concurrency, limiter=limiter,
+                                                 duplicate_threshold=None if args.no_dedup else DEFAULT_DUPLICATE_THRESHOLD,
+                                                 knockout_gate=knockout_gate, cascade=cascade, packer=packer))
+        record["items"] = len(candidates)
+        record["errors"] = sum("Error:" in c["name"] for c in candidates)
+        record["duplicates"] = sum(bool(c.get("duplicate_of")) for c in candidates)
+        record["knocked_out_early"] = sum(bool(c.get("knocked_out_early")) for c in candidates)
+        if cascade:
+            record["cascade"] = cascade.summary()
+
+    scored = [c for c in candidates if is_fully_scored(c) and not c.get("duplicate_of")]
+    with timer.stage("retriever_construction") as record:
+        index = build_candidate_index([res for res in resumes if res["filename"] in {c["filename"] for c in scored}])
+        record["items"] = len(scored)
+
+    with timer.stage("email_generation") as record:
+        emails = generate_email_templates(sorted(scored, key=lambda c: c["overall_score"], reverse=True),
+                                          {"title": "Senior Backend Engineer"}, 5, 60, "Monday, January 5, 2026 at 10:00 AM", llm,
+                                          personalized=args.personalized_emails, max_concurrency=args.concurrency, limiter=limiter)
+        record["items"] = len(emails["invitations"]) + len(emails["rejections"])
+        record["errors"] = len(emails["failed"])
+
+    with timer.stage("rag_qa") as record:
+        record["errors"] = 0
+        for candidate in scored[:args.rag_candidates]:
+            # The same streaming chain the chat panel uses, built once per candidate.
+            chain = build_rag_chain(index.as_retriever(candidate["filename"]), llm)
+            for question in BENCH_QUESTIONS:
+                try:
+                    "".join(stream_rag_answer(chain, question, llm))
+                except Exception as e:
+                    print(f"RAG question failed for {candidate['filename']}: {e}")
+                    record["errors"] += 1
+                record["items"] += 1
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    tracemalloc.stop()
+    return {
+        "commit": current_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "stages": timer.stages,
+        "total_wall_seconds": round(sum(s["wall_seconds"] for s in timer.stages.values()), 4),
+        "llm_calls": llm.calls,
+        "draft_llm_calls": draft_llm.calls,
+        "json_repairs": get_json_repair_stats(),
+        "llm_stages": llm_stage_summary(),
+        "pipeline_steps": step_duration_summary(),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the RecruitX pipeline offline with a fake LLM and synthetic resumes.")
+    parser.add_argument("--resumes", type=int, default=50, help="Size of the synthetic resume corpus.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mean fake LLM latency in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls failing with a transient 503.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls failing with a 429.")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of JSON replies with syntax defects.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=int, default=100000, help="Scheduler requests/minute (high by default so the fake LLM is the bottleneck).")
+    parser.add_argument("--tpm", type=int, default=100000000)
+    parser.add_argument("--pdf-workers", type=int, default=None)
+    parser.add_argument("--knockout", action="append", default=[], choices=list(BENCH_WEIGHTS), help="Make this requirement a knock-out (repeatable).")
+    parser.add_argument("--no-knockout-gate", action="store_true", help="Score knocked-out candidates in full instead of eliminating them first.")
+    parser.add_argument("--pack", action="store_true", help="Score several short resumes per request.")
+    parser.add_argument("--cascade", action="store_true", help="Score with a faster, noisier draft model first and escalate uncertain verdicts.")
+    parser.add_argument("--draft-latency", type=float, default=None, help="Mean draft model latency in seconds (default: a quarter of --latency).")
+    parser.add_argument("--draft-noise", type=float, default=0.1, help="Share of wrong requirement verdicts from the draft model.")
+    parser.add_argument("--invite-threshold", type=int, default=DEFAULT_INVITE_THRESHOLD)
+    parser.add_argument("--escalation-margin", type=int, default=DEFAULT_ESCALATION_MARGIN)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="Share of resumes that are resubmissions of an earlier one.")
+    parser.add_argument("--no-dedup", action="store_true", help="Score near-duplicate resumes instead of linking them to the first copy.")
+    parser.add_argument("--personalized-emails", action="store_true", help="Benchmark one email call per candidate instead of shared templates.")
+    parser.add_argument("--rag-candidates", type=int, default=3, help="Candidates to ask the RAG questions about.")
+    parser.add_argument("--embeddings", choices=["fastembed", "fake"], default="fastembed", help="Use 'fake' to skip the embedding model download.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    with redirect_stdout(sys.stderr):
+        # Pipeline diagnostics are printed; keep stdout for the machine-readable report.
+        report = json.dumps(run_benchmark(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
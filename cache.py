@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from utils import (
+    ExplainableCandidateScore,
+    InterviewQuestions,
+    REQUIREMENTS_PROMPT_VERSION,
+    SCORING_PROMPT_VERSION,
+    QUESTIONS_PROMPT_VERSION,
+    extract_key_requirements,
+    get_model_name,
+)
+
+DEFAULT_CACHE_PATH = os.environ.get("RECRUITX_CACHE_PATH", os.path.join(".recruitx", "cache.sqlite3"))
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_MAX_AGE_DAYS = 30
+EVICTION_INTERVAL = 100
+
+def content_hash(*parts: str) -> str:
+    """SHA-256 over the given strings, separated so that ('ab', 'c') and ('a', 'bc') differ."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class ResultCache:
+    """A disk-backed, content-addressed cache of LLM results with size- and age-based eviction."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES, max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)")
+        self.conn.commit()
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, created_at FROM results WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE results SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, namespace: str, key: str, value: str) -> None:
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (namespace, key, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value, now, now)
+            )
+            self.conn.commit()
+            self.writes += 1
+            if self.writes % EVICTION_INTERVAL == 0:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drops expired entries, then the least recently used ones beyond `max_entries`."""
+        self.conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.max_age_seconds,))
+        self.conn.execute(
+            "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.conn.commit()
+
+    def evict(self) -> None:
+        with self.lock:
+            self._evict(time.time())
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def score_key(self, job_description: str, resume_text: str, weighted_requirements: Dict, model_name: str) -> str:
+        """Importance and knock-out flags only affect the locally computed score, so only the requirement list is hashed.
+
+        A cascade's verdicts do depend on them; its `model_name` carries a hash of the weights.
+        """
+        return content_hash(resume_text, job_description, json.dumps(list(weighted_requirements)), SCORING_PROMPT_VERSION, model_name)
+
+    def get_score(self, key: str) -> Optional[ExplainableCandidateScore]:
+        value = self.get("score", key)
+        return ExplainableCandidateScore.model_validate_json(value) if value is not None else None
+
+    def set_score(self, key: str, score: ExplainableCandidateScore) -> None:
+        self.set("score", key, score.model_dump_json())
+
+    def questions_key(self, job_description: str, candidate_name: str, candidate_summary: str, model_name: str) -> str:
+        return content_hash(candidate_name, candidate_summary, job_description, QUESTIONS_PROMPT_VERSION, model_name)
+
+    def get_questions(self, key: str) -> Optional[InterviewQuestions]:
+        value = self.get("questions", key)
+        return InterviewQuestions.model_validate_json(value) if value is not None else None
+
+    def set_questions(self, key: str, questions: InterviewQuestions) -> None:
+        self.set("questions", key, questions.model_dump_json())
+
+def cached_extract_key_requirements(job_description: str, llm: BaseChatModel, cache: Optional[ResultCache]) -> List[str]:
+    """`extract_key_requirements`, served from the cache when the JD and model are unchanged."""
+    if cache is None:
+        return extract_key_requirements(job_description, llm)
+    key = content_hash(job_description, REQUIREMENTS_PROMPT_VERSION, get_model_name(llm))
+    cached = cache.get("requirements", key)
+    if cached is not None:
+        return json.loads(cached)
+    requirements = extract_key_requirements(job_description, llm)
+    if requirements:
+        cache.set("requirements", key, json.dumps(requirements))
+    return requirements
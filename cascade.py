@@ -0,0 +1,143 @@
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from cache import content_hash
+from knockout import keyword_coverage
+from metrics import record_cascade_escalation, record_cascade_settled
+from utils import ExplainableCandidateScore, align_requirement_analysis, get_model_name
+
+DEFAULT_DRAFT_MODEL = "llama-3.1-8b-instant"
+DEFAULT_INVITE_THRESHOLD = 75
+DEFAULT_ESCALATION_MARGIN = 15
+MIN_EVIDENCE_OVERLAP = 0.6
+NO_EVIDENCE_PHRASE = "no direct evidence"
+
+_WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+def evidence_is_grounded(evidence: str, resume_words: set) -> bool:
+    """Whether most words of a quoted piece of evidence actually occur in the resume."""
+    words = _WORD_PATTERN.findall(evidence.lower())
+    if not words or NO_EVIDENCE_PHRASE in evidence.lower():
+        return False
+    return sum(1 for word in words if word in resume_words) / len(words) >= MIN_EVIDENCE_OVERLAP
+
+def uncertain_requirements(score: ExplainableCandidateScore, resume_text: str, requirements: List[str]) -> List[str]:
+    """Requirements whose verdict looks unreliable: skipped, met without evidence from the resume, or missed although every key term is in it."""
+    resume_words = set(_WORD_PATTERN.findall(resume_text.lower()))
+    uncertain = []
+    for req, match in zip(requirements, align_requirement_analysis([m.model_dump() for m in score.requirement_analysis], requirements)):
+        if match is None:
+            uncertain.append(req)
+        elif match["match_status"] and not evidence_is_grounded(match["evidence"], resume_words):
+            uncertain.append(req)
+        elif not match["match_status"] and keyword_coverage(resume_text, req) == 1.0:
+            uncertain.append(req)
+    return uncertain
+
+class ModelCascade:
+    """Scores each resume with the cheapest model tier that gives a confident verdict.
+
+    The draft models run smallest first and the full scoring model comes last. A draft verdict is kept
+    unless its score is within `margin` points of the invite threshold, it fails a knock-out, or one of
+    its requirement verdicts looks unreliable; then the next tier scores the resume again. Counts and
+    call times are kept per instance, so one cascade per batch reports that batch.
+    """
+
+    def __init__(self, draft_models: List[BaseChatModel], invite_threshold: int = DEFAULT_INVITE_THRESHOLD,
+                 margin: int = DEFAULT_ESCALATION_MARGIN):
+        self.draft_models = list(draft_models)
+        self.invite_threshold = invite_threshold
+        self.margin = margin
+        self.lock = threading.Lock()
+        self.final_model_name: Optional[str] = None
+        self.scored = 0
+        self.escalated = 0
+        self.settled: Dict[str, int] = defaultdict(int)
+        self.escalations: Dict[str, int] = defaultdict(int)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    def model_name(self, llm: BaseChatModel, weighted_requirements: Optional[Dict] = None) -> str:
+        """Identifies the tiers and escalation band, e.g. for cache keys: verdicts depend on all of them.
+
+        They also depend on the weights, since a draft verdict is kept or escalated on its weighted score.
+        """
+        tiers = ">".join([get_model_name(model) for model in self.draft_models] + [get_model_name(llm)])
+        name = f"{tiers}@{self.invite_threshold}+-{self.margin}"
+        if weighted_requirements is not None:
+            name += f"#{content_hash(json.dumps(weighted_requirements, sort_keys=True))[:12]}"
+        return name
+
+    def escalation_reason(self, score: ExplainableCandidateScore, resume_text: str, requirements: List[str]) -> Optional[str]:
+        if abs(score.overall_score - self.invite_threshold) <= self.margin:
+            return "borderline"
+        if score.knockout_requirement:
+            return "knockout"
+        if uncertain_requirements(score, resume_text, requirements):
+            return "uncertain"
+        return None
+
+    def score(self, score_with: Callable[[BaseChatModel], ExplainableCandidateScore], resume_text: str, requirements: List[str],
+              llm: BaseChatModel) -> Tuple[ExplainableCandidateScore, str]:
+        """(verdict, name of the model that gave it). `score_with(model)` scores the resume on one tier; the final tier's errors are raised."""
+        tiers = self.draft_models + [llm]
+        escalated = False
+        for level, model in enumerate(tiers):
+            name = get_model_name(model)
+            final = level == len(tiers) - 1
+            started = time.perf_counter()
+            try:
+                score = score_with(model)
+                reason = None if final else self.escalation_reason(score, resume_text, requirements)
+            except Exception as e:
+                if final:
+                    raise
+                print(f"Draft scoring with {name} failed, escalating. Error: {e}")
+                reason = "error"
+            finally:
+                self._record_call(name, time.perf_counter() - started, final)
+            if reason is None:
+                self._record_settled(name, escalated)
+                return score, name
+            escalated = True
+            with self.lock:
+                self.escalations[reason] += 1
+            record_cascade_escalation(name, reason)
+
+    def _record_call(self, name: str, seconds: float, final: bool) -> None:
+        with self.lock:
+            self.calls[name] += 1
+            self.seconds[name] += seconds
+            if final:
+                self.final_model_name = name
+
+    def _record_settled(self, name: str, escalated: bool) -> None:
+        with self.lock:
+            self.scored += 1
+            self.escalated += escalated
+            self.settled[name] += 1
+        record_cascade_settled(name)
+
+    def summary(self) -> Dict[str, Any]:
+        """Escalation rate and LLM time saved in this batch.
+
+        The saving compares the time spent on every tier with scoring each resume on the final model
+        alone, at its mean call time in this batch; it is None until the final model has been called.
+        """
+        with self.lock:
+            mean_seconds = {name: self.seconds[name] / count for name, count in self.calls.items() if count}
+            final_seconds = mean_seconds.get(self.final_model_name)
+            return {
+                "scored": self.scored,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / self.scored, 3) if self.scored else None,
+                "escalations_by_reason": dict(self.escalations),
+                "settled_by_model": dict(self.settled),
+                "mean_seconds_by_model": {name: round(seconds, 3) for name, seconds in mean_seconds.items()},
+                "llm_seconds_saved": round(self.scored * final_seconds - sum(self.seconds.values()), 2) if final_seconds is not None else None,
+            }
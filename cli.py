@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Dict, Any, Optional, Iterator, Set, Tuple
+
+from dotenv import load_dotenv
+from langchain_groq import ChatGroq
+
+from cache import ResultCache, cached_extract_key_requirements, content_hash
+from ingestion import ExtractionPool, iter_extracted_texts, DEFAULT_MAX_PAGES, DEFAULT_PDF_TIMEOUT_SECONDS
+from json_repair import get_json_repair_stats
+from llm_client import configure_llm_client, fallback_configs
+from metrics import registry as metrics_registry, DEFAULT_METRICS_FILE
+from prescreen import prescreen_candidates
+from talent_pool import TalentPool
+from dedup import DEFAULT_DUPLICATE_THRESHOLD
+from knockout import KnockoutGate, DEFAULT_KNOCKOUT_MODEL
+from cascade import ModelCascade, DEFAULT_DRAFT_MODEL, DEFAULT_INVITE_THRESHOLD, DEFAULT_ESCALATION_MARGIN
+from scheduler import iter_scored_candidates, RateLimiter, PackedScorer, DEFAULT_PACK_TOKEN_BUDGET, DEFAULT_MAX_CONCURRENCY, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+from utils import DEFAULT_IMPORTANCE
+
+DEFAULT_MODEL = "llama3-70b-8192"
+INGEST_BATCH_SIZE = 64
+METRICS_EXPORT_INTERVAL = 25
+
+def load_weights(path: str) -> Dict[str, Dict[str, Any]]:
+    """Reads weights as {"requirement": {"importance": ..., "knockout": ...}} or a plain list of requirements."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return {req: {"importance": DEFAULT_IMPORTANCE, "knockout": False} for req in data}
+    return {req: {"importance": w.get("importance", DEFAULT_IMPORTANCE), "knockout": bool(w.get("knockout", False))} for req, w in data.items()}
+
+def find_resumes(directory: str) -> List[str]:
+    """All PDFs under `directory`, as sorted paths relative to it."""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                paths.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(paths)
+
+def load_checkpoint(output_path: str, run_id: str) -> Set[str]:
+    """Filenames already scored successfully for this run. Error entries are retried."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by a crash.
+            if record.get("run_id") != run_id:
+                continue
+            if "Error:" in record.get("name", ""):
+                done.discard(record.get("filename"))
+            else:
+                done.add(record.get("filename"))
+    return done
+
+def iter_resumes(directory: str, paths: List[str], cache: ResultCache, max_pages: int, timeout: float) -> Iterator[Dict[str, Any]]:
+    """Streams extracted resumes, reading files from disk in bounded batches that share one worker pool."""
+    with ExtractionPool() as pool:
+        for start in range(0, len(paths), INGEST_BATCH_SIZE):
+            batch: List[Tuple[str, bytes]] = []
+            for path in paths[start:start + INGEST_BATCH_SIZE]:
+                with open(os.path.join(directory, path), "rb") as f:
+                    batch.append((path, f.read()))
+            for res in iter_extracted_texts(batch, cache=cache, max_pages=max_pages, timeout=timeout, pool=pool):
+                if res["text"]:
+                    yield res
+                else:
+                    print(f"Skipping {res['filename']}: no text could be extracted.", file=sys.stderr)
+
+def collect_resumes(resumes: Iterator[Dict[str, Any]], read: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Passes `resumes` through unchanged, appending each one to `read` as it streams by."""
+    for res in resumes:
+        read.append(res)
+        yield res
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Screen a directory of resumes against a job description without the UI.")
+    parser.add_argument("--jd", required=True, help="Text file containing the job description.")
+    parser.add_argument("--weights", help="JSON file of weighted requirements. If omitted, requirements are extracted from the JD with default weights.")
+    parser.add_argument("--resumes", required=True, help="Directory of PDF resumes (searched recursively).")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to; re-running resumes from it.")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--fallback-model", action="append", default=[], help="Model to fail over to when --model keeps failing (repeatable). Backup API keys are read from GROQ_FALLBACK_API_KEYS.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE, help="Requests per minute allowed by your Groq plan.")
+    parser.add_argument("--tpm", type=int, default=DEFAULT_TOKENS_PER_MINUTE, help="Tokens per minute allowed by your Groq plan.")
+    parser.add_argument("--max-pages", type=int, default=DEFAULT_MAX_PAGES)
+    parser.add_argument("--pdf-timeout", type=float, default=DEFAULT_PDF_TIMEOUT_SECONDS)
+    parser.add_argument("--prescreen-top-k", type=int, help="Only send the K resumes most similar to the requirements to LLM scoring.")
+    parser.add_argument("--prescreen-threshold", type=float, help="Only send resumes with at least this embedding similarity (0-100) to LLM scoring.")
+    parser.add_argument("--knockout-model", default=DEFAULT_KNOCKOUT_MODEL, help="Small model that settles ambiguous knock-out checks before full scoring.")
+    parser.add_argument("--no-knockout-gate", action="store_true", help="Send every resume to full scoring, even if it clearly fails a knock-out requirement.")
+    parser.add_argument("--pack", action="store_true", help="Score several short resumes per request, sending the JD and requirements once.")
+    parser.add_argument("--pack-budget", type=int, default=DEFAULT_PACK_TOKEN_BUDGET, help="Estimated prompt plus completion tokens per packed request.")
+    parser.add_argument("--cascade", action="store_true", help="Score with the draft models first and escalate only uncertain verdicts to --model.")
+    parser.add_argument("--draft-model", action="append", default=[], help=f"Draft model tier for --cascade, smallest first; repeat for more tiers (default: {DEFAULT_DRAFT_MODEL}).")
+    parser.add_argument("--invite-threshold", type=int, default=DEFAULT_INVITE_THRESHOLD, help="Score that earns an invite; drafts near it are escalated.")
+    parser.add_argument("--escalation-margin", type=int, default=DEFAULT_ESCALATION_MARGIN, help="Escalate draft scores within this many points of the invite threshold.")
+    parser.add_argument("--no-dedup", action="store_true", help="Score every resume, even near-duplicates of one already seen in this run.")
+    parser.add_argument("--talent-pool", metavar="DIR", help="Persistent talent pool directory: reuses stored embeddings and analyses, and saves every resume read.")
+    parser.add_argument("--metrics-file", default=DEFAULT_METRICS_FILE, help="Write Prometheus text-format metrics here as the run progresses.")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    load_dotenv()
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if not os.environ.get("GROQ_API_KEY"):
+        print("GROQ_API_KEY not found. Please set it as an environment variable or in a .env file.", file=sys.stderr)
+        return 2
+
+    llm = ChatGroq(model=args.model, temperature=0.1, api_key=os.environ["GROQ_API_KEY"])
+    fallbacks = fallback_configs(args.model, os.environ["GROQ_API_KEY"], os.environ.get("GROQ_FALLBACK_API_KEYS", ""), ",".join(args.fallback_model))
+    limiter = RateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    configure_llm_client(llm, [ChatGroq(model=model, temperature=0.1, api_key=key) for model, key in fallbacks], limiter=limiter)
+    cache = ResultCache()
+    with open(args.jd, encoding="utf-8") as f:
+        job_description = f.read()
+    if args.weights:
+        weighted_reqs = load_weights(args.weights)
+    else:
+        requirements = cached_extract_key_requirements(job_description, llm, cache)
+        weighted_reqs = {req: {"importance": DEFAULT_IMPORTANCE, "knockout": False} for req in requirements}
+        print(f"Extracted {len(weighted_reqs)} requirements: {json.dumps(list(weighted_reqs))}", file=sys.stderr)
+
+    prescreen = args.prescreen_top_k is not None or args.prescreen_threshold is not None
+    run_parts = [job_description, json.dumps(weighted_reqs, sort_keys=True), args.model]
+    if prescreen:
+        run_parts.append(json.dumps([args.prescreen_top_k, args.prescreen_threshold]))
+    draft_llms = [ChatGroq(model=model, temperature=0.1, api_key=os.environ["GROQ_API_KEY"]) for model in args.draft_model or [DEFAULT_DRAFT_MODEL]]
+    for draft_llm in draft_llms:
+        configure_llm_client(draft_llm, limiter=limiter)
+    cascade = ModelCascade(draft_llms, args.invite_threshold, args.escalation_margin) if args.cascade else None
+    if cascade:
+        run_parts.append(cascade.model_name(llm))
+    run_id = content_hash(*run_parts)[:16]
+    done = load_checkpoint(args.output, run_id)
+    paths = [p for p in find_resumes(args.resumes) if p not in done]
+    print(f"{len(done)} resumes already scored, {len(paths)} to go.", file=sys.stderr)
+
+    talent_pool = TalentPool(args.talent_pool) if args.talent_pool else None
+    knockout_llm = ChatGroq(model=args.knockout_model, temperature=0, api_key=os.environ["GROQ_API_KEY"])
+    configure_llm_client(knockout_llm, limiter=limiter)
+    knockout_gate = None if args.no_knockout_gate else KnockoutGate(weighted_reqs, knockout_llm, limiter, cache, talent_pool)
+    packer = PackedScorer(job_description, weighted_reqs, token_budget=args.pack_budget) if args.pack else None
+    read_resumes: List[Dict[str, Any]] = []
+    resumes = collect_resumes(iter_resumes(args.resumes, paths, cache, args.max_pages, args.pdf_timeout), read_resumes)
+    screened_out: List[Dict[str, Any]] = []
+    if prescreen:
+        # Ranking needs every resume up front; the top-K applies to the resumes not yet in the output.
+        resumes, screened_out = prescreen_candidates(list(resumes), weighted_reqs, top_k=args.prescreen_top_k, threshold=args.prescreen_threshold,
+                                                     talent_pool=talent_pool)
+        print(f"Pre-screen shortlisted {len(resumes)} resumes; {len(screened_out)} not sent to LLM scoring.", file=sys.stderr)
+    started, scored, errors = time.monotonic(), 0, 0
+    try:
+        with open(args.output, "a", encoding="utf-8") as out:
+            for result_dict in screened_out:
+                result_dict["run_id"] = run_id
+                out.write(json.dumps(result_dict) + "\n")
+            out.flush()
+            for result_dict in iter_scored_candidates(job_description, resumes, weighted_reqs, llm,
+                                                      max_concurrency=args.concurrency, limiter=limiter, cache=cache, talent_pool=talent_pool,
+                                                      duplicate_threshold=None if args.no_dedup else DEFAULT_DUPLICATE_THRESHOLD, knockout_gate=knockout_gate,
+                                                      cascade=cascade, packer=packer):
+                result_dict["run_id"] = run_id
+                out.write(json.dumps(result_dict) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+                scored += 1
+                errors += "Error:" in result_dict["name"]
+                print(f"[{scored}/{len(paths)}] {result_dict['filename']}: {result_dict['overall_score']}", file=sys.stderr)
+                if args.metrics_file and scored % METRICS_EXPORT_INTERVAL == 0:
+                    metrics_registry.write_textfile(args.metrics_file)
+    except KeyboardInterrupt:
+        print(f"Interrupted after {scored} resumes; re-run the same command to resume.", file=sys.stderr)
+        return 130
+    finally:
+        if talent_pool is not None:
+            talent_pool.add_resumes(read_resumes)
+        if args.metrics_file:
+            metrics_registry.write_textfile(args.metrics_file)
+
+    print(f"Done: {scored} scored ({errors} errors) in {time.monotonic() - started:.1f}s. "
+          f"Cache: {cache.stats()}. JSON repairs: {get_json_repair_stats()}", file=sys.stderr)
+    if cascade:
+        print(f"Cascade: {json.dumps(cascade.summary())}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
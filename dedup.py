@@ -0,0 +1,64 @@
+import re
+import zlib
+from typing import Dict, Hashable, List, Optional
+import numpy as np
+
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+NUM_BANDS = 32
+ROWS_PER_BAND = 4
+NUM_PERMUTATIONS = NUM_BANDS * ROWS_PER_BAND
+MERSENNE_PRIME = (1 << 31) - 1
+
+_rng = np.random.default_rng(0)
+_PERM_A = _rng.integers(1, MERSENNE_PRIME, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64)
+_PERM_B = _rng.integers(0, MERSENNE_PRIME, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64)
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hashes of the distinct word `size`-grams of the lower-cased text, so formatting and case changes don't matter."""
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    grams = {" ".join(tokens[i:i + size]) for i in range(max(1, len(tokens) - size + 1))} if tokens else set()
+    return np.array([zlib.crc32(gram.encode("utf-8")) for gram in grams], dtype=np.uint64)
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """A MinHash signature of the text's shingles; the share of equal slots estimates Jaccard similarity."""
+    hashes = shingle_hashes(text)
+    if not hashes.size:
+        return None
+    # a*x stays below 2^62 because both are reduced modulo a 31-bit prime first.
+    return ((_PERM_A * (hashes % MERSENNE_PRIME) + _PERM_B) % MERSENNE_PRIME).min(axis=1)
+
+class NearDuplicateIndex:
+    """Groups near-duplicate resumes with MinHash and locality-sensitive hashing, one document at a time.
+
+    The first resume of each group becomes its representative. Later resumes are only compared with the
+    representatives they share an LSH band with, so checking a stream of N resumes stays close to O(N).
+    """
+
+    def __init__(self, threshold: float = DEFAULT_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(NUM_BANDS)]
+
+    def _bands(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes() for band in range(NUM_BANDS)]
+
+    def add(self, key: Hashable, text: str) -> Optional[Hashable]:
+        """Returns the representative `key` is a near-duplicate of, or None after making it a representative."""
+        signature = minhash_signature(text)
+        if signature is None:
+            return None
+        bands = self._bands(signature)
+        candidates = dict.fromkeys(other for band, bucket in zip(bands, self.buckets) for other in bucket.get(band, ()))
+        best, best_similarity = None, self.threshold
+        for other in candidates:
+            similarity = float(np.mean(signature == self.signatures[other]))
+            if similarity >= best_similarity:
+                best, best_similarity = other, similarity
+        if best is not None:
+            return best
+        self.signatures[key] = signature
+        for band, bucket in zip(bands, self.buckets):
+            bucket.setdefault(band, []).append(key)
+        return None
@@ -0,0 +1,130 @@
+import json
+import random
+import re
+import threading
+import time
+from typing import List, Dict, Any, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+import knockout
+from json_repair import repair_json_locally
+from utils import estimate_tokens
+
+class FakeChatModel(BaseChatModel):
+    """A local stand-in for ChatGroq that answers every RecruitX prompt with plausible output.
+
+    Latency, transient error rate (HTTP 503), rate-limit rate (HTTP 429), the share of
+    malformed JSON replies and of wrong requirement verdicts (`verdict_noise`, to stand in for a
+    weaker model) are configurable, so the pipeline can be exercised without quota. Requirement
+    extraction answers with `key_requirements`.
+    """
+    latency: float = 0.2
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    malformed_rate: float = 0.0
+    verdict_noise: float = 0.0
+    seed: int = 0
+    model_name: str = "fake-chat-model"
+    key_requirements: List[str] = []
+    calls: int = 0
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "recruitx-fake"
+
+    def _roll(self) -> Tuple[float, float, float]:
+        with self._lock:
+            self.calls += 1
+            return self._rng.random(), self._rng.random(), max(0.0, self._rng.gauss(self.latency, self.latency / 4))
+
+    def _simulate_call(self) -> float:
+        failure_roll, malformed_roll, delay = self._roll()
+        time.sleep(delay)
+        if failure_roll < self.rate_limit_rate:
+            raise RuntimeError("Error code: 429 - rate limit reached for requests")
+        if failure_roll < self.rate_limit_rate + self.error_rate:
+            raise RuntimeError("Error code: 503 - service unavailable")
+        return malformed_roll
+
+    def _verdict(self, requirement: str, resume: str) -> Dict[str, Any]:
+        """A requirement verdict quoting the resume line that mentions it, wrong `verdict_noise` of the time."""
+        quote = next((line.strip() for line in resume.splitlines() if requirement.lower() in line.lower()), None)
+        with self._lock:
+            wrong = self._rng.random() < self.verdict_noise
+        if (quote is not None) != wrong:
+            return {"requirement": requirement, "match_status": True, "evidence": quote or f"Probably has {requirement} experience."}
+        return {"requirement": requirement, "match_status": False, "evidence": "No direct evidence found in the resume."}
+
+    def _malform(self, payload: str) -> str:
+        """Produces the kind of defects real models emit: prose, trailing commas, raw newlines."""
+        broken = payload.replace("}]", "},]").replace(". ", ".\n", 1)
+        return f"Sure! Here is the JSON you asked for:\n{broken}\nLet me know if you need anything else."
+
+    def _respond(self, prompt: str, malformed_roll: float) -> str:
+        if "non-generic requirements" in prompt:
+            payload = json.dumps({"key_requirements": self.key_requirements})
+        elif "broken JSON object" in prompt:
+            repaired = repair_json_locally(prompt[prompt.find("```") + 3:prompt.rfind("```")])
+            return json.dumps(repaired if repaired is not None else {})
+        elif "KNOCK-OUT REQUIREMENT:" in prompt:
+            requirement = prompt.split("KNOCK-OUT REQUIREMENT:", 1)[1].split("\n", 1)[0].strip()
+            excerpts = prompt.split("RESUME EXCERPTS:", 1)[1].lower()
+            met = any(pattern.search(excerpts) for _, pattern in knockout.requirement_terms(requirement))
+            payload = json.dumps({"met": met, "evidence": f"Mentions {requirement}." if met else "No mention in the excerpts."})
+        elif "=== RESUME " in prompt:
+            match = re.search(r"REQUIREMENTS:\s*(\[.*?\])\s*\n\s*2\.", prompt, re.DOTALL)
+            requirements = json.loads(match.group(1)) if match else []
+            entries = []
+            for resume_id, resume in re.findall(r"=== RESUME (\S+) ===\n(.*?)\n=== END OF RESUME \1 ===", prompt, re.DOTALL):
+                name_match = re.search(r"([A-Z][a-z]+ [A-Z][a-z]+)", resume)
+                entries.append({"resume_id": resume_id, "name": name_match.group(1) if name_match else "Unknown Candidate",
+                                "summary": "Solid backend engineer. Gaps in some of the weighted areas.",
+                                "requirement_analysis": [self._verdict(req, resume) for req in requirements]})
+            payload = json.dumps({"candidates": entries})
+        elif "RESUME TEXT:" in prompt:
+            match = re.search(r"REQUIREMENTS:\s*(\[.*?\])\s*\n\s*2\.", prompt, re.DOTALL)
+            requirements = json.loads(match.group(1)) if match else []
+            resume = prompt.split("RESUME TEXT:", 1)[1]
+            name_match = re.search(r"([A-Z][a-z]+ [A-Z][a-z]+)", resume)
+            payload = json.dumps({
+                "name": name_match.group(1) if name_match else "Unknown Candidate",
+                "summary": "Solid backend engineer. Gaps in some of the weighted areas.",
+                "requirement_analysis": [self._verdict(req, resume) for req in requirements],
+            })
+        elif "interview questions" in prompt:
+            payload = json.dumps({"behavioral": ["Tell me about a difficult launch.", "Describe a conflict you resolved.", "How do you mentor?"],
+                                  "technical": ["Design a rate limiter.", "How would you tune a slow PostgreSQL query?"]})
+        elif "reusable email templates" in prompt:
+            payload = json.dumps({"invitation": "Dear [CANDIDATE_NAME],\n\nWe would love to interview you for [JOB_TITLE] on [INTERVIEW_DATETIME]. Please confirm.\n\nBest regards,\nHR",
+                                  "rejection": "Dear [CANDIDATE_NAME],\n\nThank you for applying to [JOB_TITLE]. We will not be moving forward.\n\nBest regards,\nHR"})
+        elif "Answer the question based ONLY" in prompt:
+            return "Based on the resume, the candidate has relevant experience."
+        elif "email" in prompt.lower():
+            return "Dear Candidate,\n\nThank you for applying. We will be in touch.\n\nBest regards,\nHR"
+        else:
+            return "OK"
+        return self._malform(payload) if malformed_roll < self.malformed_rate else payload
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        malformed_roll = self._simulate_call()
+        prompt = "\n".join(str(m.content) for m in messages)
+        content = self._respond(prompt, malformed_roll)
+        usage = {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(content)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=usage))])
+
+    def with_structured_output(self, schema, **kwargs):
+        """Answers like a tool-calling model: the reply is always well-formed and parsed straight into `schema`."""
+        def invoke(prompt_value):
+            self._simulate_call()
+            prompt = "\n".join(str(m.content) for m in prompt_value.to_messages())
+            return schema.model_validate_json(self._respond(prompt, malformed_roll=1.0))
+        return RunnableLambda(invoke)
@@ -0,0 +1,133 @@
+import hashlib
+import io
+import multiprocessing
+import multiprocessing.pool
+import os
+import time
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from utils import extract_pdf_text
+from cache import ResultCache
+from metrics import record_duration
+
+DEFAULT_PDF_TIMEOUT_SECONDS = 30.0
+DEFAULT_MAX_PAGES = 30
+POLL_INTERVAL_SECONDS = 0.05
+# Extraction is started from background scoring threads, and forking a multi-threaded process can deadlock the
+# child on a lock another thread held. Fresh workers come from a fork server (or spawn where that is unavailable).
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def file_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _extract_from_bytes(data: bytes, max_pages: int) -> Tuple[str, float]:
+    """Worker entry point; runs in a child process, so the timing is returned to be recorded by the parent."""
+    started = time.perf_counter()
+    text = extract_pdf_text(io.BytesIO(data), max_pages=max_pages)
+    return text, time.perf_counter() - started
+
+class ExtractionPool:
+    """A process pool for PDF extraction that several iter_extracted_texts calls can share.
+
+    Workers start on first use and are replaced when a stuck file has to be killed. Call close() when done.
+    """
+    def __init__(self, max_workers: Optional[int] = None):
+        self.workers = max(1, max_workers or os.cpu_count() or 1)
+        self._pool = None
+
+    def get(self) -> multiprocessing.pool.Pool:
+        if self._pool is None:
+            context = multiprocessing.get_context(START_METHOD)
+            if START_METHOD == "forkserver":
+                # Workers fork from a server that already imported the extractor, so a replacement pool starts quickly.
+                context.set_forkserver_preload([__name__])
+            self._pool = context.Pool(processes=self.workers)
+        return self._pool
+
+    def restart(self) -> None:
+        """Kills every worker, including any still busy; the next get() starts a fresh pool."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "ExtractionPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def iter_extracted_texts(files: List[Tuple[str, bytes]], cache: Optional[ResultCache] = None, max_workers: Optional[int] = None,
+                         timeout: float = DEFAULT_PDF_TIMEOUT_SECONDS, max_pages: int = DEFAULT_MAX_PAGES,
+                         pool: Optional[ExtractionPool] = None) -> Iterator[Dict[str, Any]]:
+    """Extracts PDF text across a process pool, yielding {"text", "filename", "sha256"} as each file finishes.
+
+    Cached texts (keyed by the SHA-256 of the file bytes) are yielded first without touching the pool.
+    A file that takes longer than `timeout` seconds yields an empty text and its worker is killed,
+    so a single pathological PDF cannot stall the batch.
+    Pass a shared `pool` to reuse its workers across batches; otherwise one is started and closed for this call.
+    """
+    pending = []
+    for filename, data in files:
+        digest = file_sha256(data)
+        cache_key = f"{digest}:{max_pages}"
+        cached = cache.get("pdf_text", cache_key) if cache else None
+        if cached is not None:
+            yield {"text": cached, "filename": filename, "sha256": digest}
+        else:
+            pending.append((filename, data, digest, cache_key))
+    if not pending:
+        return
+
+    owns_pool = pool is None
+    if owns_pool:
+        pool = ExtractionPool(min(max_workers or os.cpu_count() or 1, len(pending)))
+    workers = min(pool.workers, len(pending))
+    queue = list(reversed(pending))
+    running = []
+    try:
+        while queue or running:
+            while queue and len(running) < workers:
+                item = queue.pop()
+                running.append((pool.get().apply_async(_extract_from_bytes, (item[1], max_pages)), time.monotonic() + timeout, item))
+            still_running, timed_out = [], []
+            for async_result, deadline, item in running:
+                filename, _, digest, cache_key = item
+                if async_result.ready():
+                    try:
+                        text, seconds = async_result.get()
+                        record_duration("extract_pdf_text", seconds)
+                    except Exception as e:
+                        print(f"Error reading PDF {filename}: {e}")
+                        text = ""
+                    if cache and text:
+                        cache.set("pdf_text", cache_key, text)
+                    yield {"text": text, "filename": filename, "sha256": digest}
+                elif time.monotonic() > deadline:
+                    timed_out.append(item)
+                else:
+                    still_running.append((async_result, deadline, item))
+            running = still_running
+            if timed_out:
+                # A stuck worker cannot be cancelled individually: replace the pool and requeue the healthy in-flight files.
+                pool.restart()
+                queue.extend(item for _, _, item in running)
+                running = []
+                for filename, _, digest, _ in timed_out:
+                    record_duration("extract_pdf_text_timeout", timeout)
+                    print(f"Timed out reading PDF {filename} after {timeout:.0f}s, skipping it.")
+                    yield {"text": "", "filename": filename, "sha256": digest}
+            elif running:
+                time.sleep(POLL_INTERVAL_SECONDS)
+    finally:
+        if running:
+            # Closed early (e.g. a cancelled run): stop the in-flight files rather than waiting for them.
+            pool.restart()
+        elif owns_pool:
+            pool.close()
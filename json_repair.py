@@ -0,0 +1,146 @@
+import json
+import re
+import threading
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+
+MAX_TRUNCATION_CUTS = 20
+SMART_OPEN_QUOTES = "“„"
+SMART_CLOSE_QUOTES = "”"
+INT_FIELDS = {"overall_score"}
+BOOL_FIELDS = {"match_status"}
+TRUE_STRINGS = {"true", "yes", "y", "met", "1"}
+FALSE_STRINGS = {"false", "no", "n", "not met", "unmet", "0"}
+
+_stats_lock = threading.Lock()
+JSON_REPAIR_STATS = {"parsed": 0, "local_repairs": 0, "llm_repairs": 0, "failures": 0}
+
+def record_json_outcome(outcome: str) -> None:
+    with _stats_lock:
+        JSON_REPAIR_STATS[outcome] += 1
+
+def get_json_repair_stats() -> Dict[str, int]:
+    """Counts of LLM outputs that parsed cleanly, were fixed locally, needed an LLM repair, or could not be parsed."""
+    with _stats_lock:
+        return dict(JSON_REPAIR_STATS)
+
+def _scan(text: str) -> Tuple[str, List[str], bool, List[int]]:
+    """Normalizes JSON-ish text in one pass.
+
+    Escapes raw control characters inside strings, turns smart-quote delimiters into plain quotes and
+    drops trailing commas. Returns the normalized text, the stack of unclosed brackets, whether it ends
+    inside a string, and the output positions of commas outside strings (used to cut truncated input).
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    commas: List[int] = []
+    in_string, escape, smart_string = False, False, False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == '"' or (smart_string and ch in SMART_CLOSE_QUOTES):
+                in_string = False
+                out.append('"')
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\r":
+                out.append("\\r")
+            elif ch == "\t":
+                out.append("\\t")
+            else:
+                out.append(ch)
+            continue
+        if ch == '"' or ch in SMART_OPEN_QUOTES or ch in SMART_CLOSE_QUOTES:
+            in_string, smart_string = True, ch != '"'
+            out.append('"')
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                if commas and commas[-1] == len(out):
+                    commas.pop()
+            if stack:
+                stack.pop()
+            out.append(ch)
+        elif ch == ",":
+            commas.append(len(out))
+            out.append(ch)
+        else:
+            out.append(ch)
+    return "".join(out), stack, in_string, commas
+
+def _close(text: str) -> str:
+    """Terminates an open string and closes any unclosed brackets."""
+    normalized, stack, in_string, _ = _scan(text)
+    if in_string:
+        normalized += '"'
+    normalized = normalized.rstrip().rstrip(",").rstrip()
+    if normalized.endswith(":"):
+        normalized += " null"
+    return normalized + "".join(reversed(stack))
+
+def _decode(text: str) -> Optional[Any]:
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text)
+        return value
+    except json.JSONDecodeError:
+        return None
+
+def coerce_field_types(data: Any) -> Any:
+    """Coerces string-typed scalars the schemas expect as numbers or booleans, e.g. "overall_score": "85"."""
+    if isinstance(data, list):
+        return [coerce_field_types(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    coerced = {}
+    for key, value in data.items():
+        if key in INT_FIELDS and isinstance(value, str):
+            match = re.search(r"-?\d+(\.\d+)?", value)
+            value = int(float(match.group())) if match else value
+        elif key in BOOL_FIELDS and isinstance(value, str):
+            lowered = value.strip().lower()
+            value = True if lowered in TRUE_STRINGS else False if lowered in FALSE_STRINGS else value
+        coerced[key] = coerce_field_types(value)
+    return coerced
+
+def _repair_candidates(text: str) -> Iterator[str]:
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return
+    normalized, stack, in_string, commas = _scan(text[min(starts):])
+    yield normalized
+    if not stack and not in_string:
+        return  # Complete JSON that failed validation; cutting elements off would silently lose data.
+    yield _close(normalized)
+    for position in reversed(commas[-MAX_TRUNCATION_CUTS:]):
+        yield _close(normalized[:position])
+
+def repair_json_locally(text: str, validate: Optional[Callable[[Any], Any]] = None) -> Optional[Any]:
+    """Deterministically repairs common LLM JSON defects. Returns None if the text cannot be salvaged.
+
+    Handles prose around the object, unescaped newlines, smart quotes, trailing commas, string-typed
+    scores and output truncated mid-array (by cutting back to the last complete element and closing
+    the brackets). Only truncated input is cut back. If `validate` is given, the most complete repair
+    it accepts without raising wins.
+    """
+    for candidate in _repair_candidates(text):
+        value = _decode(candidate)
+        if value is None:
+            continue
+        value = coerce_field_types(value)
+        if validate is None:
+            return value
+        try:
+            validate(value)
+            return value
+        except Exception:
+            continue
+    return None
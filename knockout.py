@@ -0,0 +1,170 @@
+import re
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from cache import ResultCache, content_hash
+from metrics import record_knockout_decision
+from prescreen import guess_candidate_name
+from utils import (
+    call_llm,
+    parse_llm_json,
+    get_embeddings,
+    normalize_rows,
+    split_resume,
+    estimate_tokens,
+    get_model_name,
+)
+
+DEFAULT_KNOCKOUT_MODEL = "llama-3.1-8b-instant"
+KNOCKOUT_PROMPT_VERSION = "1"
+DEFAULT_PASS_SIMILARITY = 0.8
+DEFAULT_FAIL_SIMILARITY = 0.55
+KNOCKOUT_EXCERPTS = 2
+DEFAULT_KNOCKOUT_COMPLETION_TOKENS = 80
+
+KNOCKOUT_PROMPT = """
+Decide whether the resume excerpts below show direct evidence that the candidate meets one mandatory requirement.
+Answer with a single JSON object and nothing else: {{"met": true or false, "evidence": "short quote from the excerpts, or why it is missing"}}
+
+KNOCK-OUT REQUIREMENT: {requirement}
+RESUME EXCERPTS:
+{excerpts}
+"""
+
+_TERM_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#./-]*[a-z0-9+#]|[a-z0-9]")
+GENERIC_TERMS = frozenset("""
+a an and or of in on at to for with the as by from is be are must have has should least minimum plus more than
+year years experience experienced strong solid proven deep good excellent knowledge understanding working hands-on
+skill skills ability able proficiency proficient familiarity familiar expertise expert background degree using use
+including such etc related relevant professional
+""".split())
+
+class KnockoutVerdict(BaseModel):
+    met: bool
+    evidence: str = ""
+
+def knockout_requirements(weighted_requirements: Dict) -> List[str]:
+    return [req for req, weight in weighted_requirements.items() if weight.get("knockout")]
+
+@lru_cache(maxsize=256)
+def requirement_terms(requirement: str) -> Tuple[Tuple[str, "re.Pattern"], ...]:
+    """The distinctive terms of a requirement (e.g. "python", "ci/cd"), each with a whole-word pattern."""
+    terms = [t for t in _TERM_PATTERN.findall(requirement.lower()) if t not in GENERIC_TERMS and not re.fullmatch(r"\d+\+?", t)]
+    return tuple((term, re.compile(r"(?<![a-z0-9])" + re.escape(term) + r"(?![a-z0-9+#])")) for term in dict.fromkeys(terms))
+
+def keyword_coverage(resume_text: str, requirement: str) -> Optional[float]:
+    """Share of the requirement's terms found in the resume, or None if it has no distinctive terms."""
+    terms = requirement_terms(requirement)
+    if not terms:
+        return None
+    text = resume_text.lower()
+    return sum(1 for _, pattern in terms if pattern.search(text)) / len(terms)
+
+def build_knocked_out_result(resume: Dict[str, str], requirement: str, evidence: str) -> Dict[str, Any]:
+    """The leaderboard entry for a resume eliminated by the knock-out gate, without full scoring."""
+    return {
+        "name": guess_candidate_name(resume["text"], resume["filename"]),
+        "overall_score": 0,
+        "summary": f"Eliminated before full AI scoring: no evidence for the knock-out requirement \"{requirement}\".",
+        "requirement_analysis": [{"requirement": requirement, "match_status": False, "evidence": evidence}],
+        "knockout_requirement": requirement,
+        "filename": resume["filename"],
+        "knocked_out_early": True,
+    }
+
+class KnockoutGate:
+    """Checks a resume against only the knock-out requirements, cheapest evidence first.
+
+    A requirement whose terms all appear in the resume, or whose best chunk is very similar to it, is
+    met. One with none of its terms and no similar chunk is clearly failed. Anything in between is put
+    to a small model with the most similar excerpts; without one (or if it errors) the resume goes on
+    to full scoring, so the gate only ever eliminates on clear evidence.
+    """
+
+    def __init__(self, weighted_requirements: Dict, llm: Optional[BaseChatModel] = None, limiter=None,
+                 cache: Optional[ResultCache] = None, talent_pool=None,
+                 pass_similarity: float = DEFAULT_PASS_SIMILARITY, fail_similarity: float = DEFAULT_FAIL_SIMILARITY):
+        self.requirements = knockout_requirements(weighted_requirements)
+        self.llm = llm
+        self.limiter = limiter
+        self.cache = cache
+        self.talent_pool = talent_pool
+        self.pass_similarity = pass_similarity
+        self.fail_similarity = fail_similarity
+        self._requirement_vectors: Optional[np.ndarray] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.requirements)
+
+    def _chunks(self, resume: Dict[str, str]) -> Tuple[List[str], np.ndarray]:
+        """The resume's chunks and unit-length embeddings, from the talent pool when it has them."""
+        if self.talent_pool is not None and resume.get("sha256") and self.talent_pool.contains(resume["sha256"]):
+            chunks, vectors = self.talent_pool.get_chunks([resume["sha256"]])
+            if vectors is not None:
+                return [content for _, content in chunks], vectors
+        texts = [doc.page_content for doc in split_resume(resume["text"], resume["filename"])]
+        if not texts:
+            return [], np.zeros((0, 1), dtype=np.float32)
+        return texts, normalize_rows(np.array(get_embeddings().embed_documents(texts), dtype=np.float32))
+
+    def _similarity(self, resume: Dict[str, str]) -> Tuple[List[str], Optional[np.ndarray]]:
+        """(chunks, chunks x knock-out requirements similarity), or no similarity if embedding failed."""
+        try:
+            chunks, vectors = self._chunks(resume)
+            if self._requirement_vectors is None:
+                self._requirement_vectors = normalize_rows(np.array(get_embeddings().embed_documents(self.requirements), dtype=np.float32))
+            return chunks, (vectors @ self._requirement_vectors.T if chunks else None)
+        except Exception as e:
+            print(f"Could not embed {resume['filename']} for the knock-out gate, using keywords only. Error: {e}")
+            return [], None
+
+    def _ask(self, requirement: str, excerpts: List[str]) -> Optional[KnockoutVerdict]:
+        """The small model's verdict on one requirement, or None if it could not give one."""
+        excerpt_text = "\n...\n".join(excerpts)
+        key = content_hash(requirement, excerpt_text, KNOCKOUT_PROMPT_VERSION, get_model_name(self.llm))
+        cached = self.cache.get("knockout", key) if self.cache else None
+        if cached is not None:
+            return KnockoutVerdict.model_validate_json(cached)
+        estimated = estimate_tokens(KNOCKOUT_PROMPT) + estimate_tokens(excerpt_text) + DEFAULT_KNOCKOUT_COMPLETION_TOKENS
+
+        def ask() -> KnockoutVerdict:
+            raw_response = call_llm(self.llm, KNOCKOUT_PROMPT, {"requirement": requirement, "excerpts": excerpt_text}, response_model=None, stage="knockout")
+            return parse_llm_json(raw_response.content if hasattr(raw_response, 'content') else str(raw_response), KnockoutVerdict, self.llm)
+
+        try:
+            verdict = self.limiter.call(ask, estimated, "knockout") if self.limiter else ask()
+        except Exception as e:
+            print(f"Knock-out check failed for \"{requirement}\", leaving it to full scoring. Error: {e}")
+            return None
+        if self.cache:
+            self.cache.set("knockout", key, verdict.model_dump_json())
+        return verdict
+
+    def check(self, resume: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """The knocked-out leaderboard entry if the resume fails a knock-out requirement, otherwise None."""
+        if not self.requirements:
+            return None
+        chunks, similarity = self._similarity(resume)
+        for column, requirement in enumerate(self.requirements):
+            coverage = keyword_coverage(resume["text"], requirement)
+            best = float(similarity[:, column].max()) if similarity is not None else None
+            if coverage == 1.0 or (best is not None and best >= self.pass_similarity):
+                record_knockout_decision("keyword" if coverage == 1.0 else "embedding", "pass")
+                continue
+            if coverage == 0.0 and best is not None and best < self.fail_similarity:
+                record_knockout_decision("embedding", "fail")
+                return build_knocked_out_result(resume, requirement, f"None of the key terms appear, and no passage is similar (best match {best:.0%}).")
+            if self.llm is None or not chunks:
+                record_knockout_decision("undecided", "pass")
+                continue
+            top = np.argsort(-similarity[:, column])[:KNOCKOUT_EXCERPTS]
+            verdict = self._ask(requirement, [chunks[i] for i in top])
+            if verdict is None or verdict.met:
+                record_knockout_decision("llm" if verdict else "undecided", "pass")
+                continue
+            record_knockout_decision("llm", "fail")
+            return build_knocked_out_result(resume, requirement, verdict.evidence or "No direct evidence found in the resume.")
+        return None
@@ -0,0 +1,118 @@
+import html
+import math
+import sys
+from collections import OrderedDict
+from typing import List, Any, Optional, Tuple
+
+from session_store import CompactCandidate
+from utils import requirement_match_flags
+
+DEFAULT_PAGE_SIZE = 20
+PAGE_SIZES = (10, 20, 50)
+CARD_HTML_CACHE_SIZE = 256
+KNOCKOUT_FILTERS = ("All candidates", "No knock-out failures", "Knocked out")
+
+def _requirement_flags(candidate: Any, requirements: List[str]) -> List[bool]:
+    """Whether the candidate meets each of `requirements`; compact records answer without loading their evidence."""
+    if isinstance(candidate, CompactCandidate):
+        analysis = [{"requirement": req, "match_status": flag} for req, flag in zip(candidate.requirements, candidate.match_flags)]
+    else:
+        analysis = candidate.get("requirement_analysis") or []
+    return requirement_match_flags(analysis, requirements)
+
+def filter_candidates(candidates: List[Any], score_range: Tuple[int, int] = (0, 100), knockout_filter: str = KNOCKOUT_FILTERS[0],
+                      required: Optional[List[str]] = None, requirements: Optional[List[str]] = None) -> List[Any]:
+    """The candidates, in leaderboard order, matching a score range, knock-out status and requirements that must be met.
+
+    `required` names entries of `requirements` (the weighted requirement list, which the stored verdicts are aligned to).
+    """
+    low, high = score_range
+    columns = [requirements.index(req) for req in required or [] if req in (requirements or [])]
+    matching = []
+    for candidate in candidates:
+        if not low <= candidate["overall_score"] <= high:
+            continue
+        knocked_out = bool(candidate.get("knockout_requirement"))
+        if (knockout_filter == KNOCKOUT_FILTERS[1] and knocked_out) or (knockout_filter == KNOCKOUT_FILTERS[2] and not knocked_out):
+            continue
+        if columns:
+            flags = _requirement_flags(candidate, requirements)
+            if not all(flags[column] for column in columns):
+                continue
+        matching.append(candidate)
+    return matching
+
+def page_count(total: int, page_size: int) -> int:
+    return max(1, math.ceil(total / page_size))
+
+def paginate(items: List[Any], page: int, page_size: int) -> List[Any]:
+    """Page `page` (1-based, clamped to the last page) of `items`."""
+    page = min(max(1, page), page_count(len(items), page_size))
+    return items[(page - 1) * page_size:page * page_size]
+
+def _note(kind: str, text: str) -> str:
+    return f"<div class='card-note card-note-{kind}'>{text}</div>"
+
+def card_html(candidate: Any) -> str:
+    """The static part of a leaderboard card as one HTML block: header, score, summary, notices and requirement analysis."""
+    esc = html.escape
+    screened_out = candidate.get("screened_out")
+    value = candidate["similarity_score"] if screened_out else candidate["overall_score"]
+    label = f"Pre-screen similarity: {value}%" if screened_out else f"Overall Score: {value}%"
+    parts = [
+        "<div class='input-card leaderboard-card'>",
+        f"<div class='card-header'><h3 class='candidate-name'>{esc(candidate['name'])}</h3>"
+        f"<div class='score-bar' title='{label}'><span>{label}</span><div><div style='width: {min(100, max(0, value))}%'></div></div></div></div>",
+        f"<p style='color: var(--subtle-text-color);'>{esc(candidate['summary'])}</p>",
+    ]
+    if candidate.get("knockout_requirement"):
+        parts.append(_note("error", f"⛔ Knocked out: no evidence for \"{esc(candidate['knockout_requirement'])}\""))
+    if candidate.get("duplicate_of"):
+        parts.append(_note("info", f"🔁 {esc(candidate['filename'])} is a near-duplicate of {esc(candidate['duplicate_of'])}, so it was scored once and shares that analysis."))
+    if screened_out:
+        parts.append(_note("warning", "⚡ Not shortlisted by the pre-screen, so this resume was not sent to full AI scoring."))
+        items = "".join(f"<div class='xai-item'>{esc(req)}<br><small><i><b>Best matching passage:</b> {similarity}% similar</i></small></div>"
+                        for req, similarity in candidate["requirement_similarity"].items())
+        parts.append(f"<details><summary>View Pre-Screen Similarity per Requirement</summary>{items}</details>")
+    elif "Error:" not in candidate["name"]:
+        if candidate.get("knocked_out_early"):
+            parts.append(_note("caption", "⚡ Eliminated by the knock-out check, so this resume was not sent to full AI scoring."))
+        if candidate.get("similarity_score") is not None:
+            parts.append(_note("caption", f"Pre-screen similarity: {candidate['similarity_score']}%"))
+        if candidate.get("scored_by"):
+            parts.append(_note("caption", f"Scored by {esc(candidate['scored_by'])}"))
+        items = "".join(
+            f"<div class='xai-item xai-met'><b>✅ Met:</b> {esc(req['requirement'])}<br><small><i><b>Evidence:</b> \"{esc(req['evidence'])}\"</i></small></div>"
+            if req["match_status"] else
+            f"<div class='xai-item xai-gap'><b>❌ Gap:</b> {esc(req['requirement'])}<br><small><i><b>Reason:</b> {esc(req['evidence'])}</i></small></div>"
+            for req in candidate["requirement_analysis"])
+        parts.append(f"<details><summary>View Detailed Requirement Analysis (XAI)</summary>{items}</details>")
+    parts.append("</div>")
+    return "".join(parts)
+
+class CardHtmlCache:
+    """Least-recently-used cache of rendered card HTML, so a rerun redraws a page without reloading or re-formatting it.
+
+    Entries are keyed by the fields a re-rank can change, so re-weighted candidates are rendered afresh.
+    """
+
+    def __init__(self, max_entries: int = CARD_HTML_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[tuple, str]" = OrderedDict()
+
+    def get(self, candidate: Any) -> str:
+        key = (candidate["filename"], candidate["name"], candidate["overall_score"], candidate.get("knockout_requirement"), candidate.get("duplicate_of"))
+        rendered = self.entries.get(key)
+        if rendered is None:
+            rendered = self.entries[key] = card_html(candidate)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return rendered
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(rendered) for rendered in self.entries.values())
@@ -0,0 +1,202 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from pydantic import BaseModel
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+
+from metrics import TokenUsageCallback, record_llm_call, record_retry, record_coalesced
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_BACKOFF_SECONDS = 0.5
+DEFAULT_MAX_BACKOFF_SECONDS = 8.0
+DEFAULT_DEADLINE_SECONDS = 120.0
+CHAIN_CACHE_SIZE = 128
+
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "InternalServerError", "ServiceUnavailableError",
+    "ConnectTimeout", "ReadTimeout", "RemoteProtocolError", "Timeout",
+}
+TRANSIENT_MESSAGE_PATTERN = re.compile(r"error code: (408|409|5\d\d)\b|service unavailable|timed out|connection (reset|aborted|error)", re.IGNORECASE)
+
+class LLMCallError(Exception):
+    """An LLM call that failed on every model it was allowed to try. The last underlying error is its cause."""
+
+    def __init__(self, message: str, transient: bool = False):
+        super().__init__(message)
+        self.transient = transient
+
+def get_model_name(llm: BaseChatModel) -> str:
+    """Returns the model identifier of a chat model, used to key cached results."""
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+def _iter_causes(error: BaseException) -> Iterator[BaseException]:
+    while error is not None:
+        yield error
+        error = error.__cause__ or error.__context__
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True if the error (or anything it wraps) is an HTTP 429 / rate-limit response."""
+    for e in _iter_causes(error):
+        if getattr(e, "status_code", None) == 429 or type(e).__name__ == "RateLimitError":
+            return True
+        message = str(e).lower()
+        if "429" in message or "rate limit" in message or "rate_limit" in message:
+            return True
+    return False
+
+def get_retry_after(error: BaseException) -> Optional[float]:
+    """Reads the Retry-After header from a rate-limit error, if the client exposed it."""
+    for e in _iter_causes(error):
+        response = getattr(e, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers and headers.get("retry-after"):
+            try:
+                return float(headers.get("retry-after"))
+            except ValueError:
+                return None
+    return None
+
+def is_transient_error(error: BaseException) -> bool:
+    """True for failures worth retrying: rate limits, 5xx responses, timeouts and dropped connections."""
+    if is_rate_limit_error(error):
+        return True
+    for e in _iter_causes(error):
+        if isinstance(e, (TimeoutError, ConnectionError)):
+            return True
+        if getattr(e, "status_code", None) in TRANSIENT_STATUS_CODES or type(e).__name__ in TRANSIENT_ERROR_NAMES:
+            return True
+        if TRANSIENT_MESSAGE_PATTERN.search(str(e)):
+            return True
+    return False
+
+class LLMClient:
+    """Invokes prompts against a primary chat model and its fallbacks (other API keys or models).
+
+    Compiled prompt chains are cached, transient errors are retried with jittered exponential backoff
+    within a per-call deadline, and identical requests already in flight share a single call. When
+    every model is rate limited the error is raised at once, so the caller's rate limiter can back off.
+
+    The caller admits the first attempt through its rate limiter; with a `limiter` (anything with an
+    `acquire(estimated_tokens)` method, e.g. scheduler.RateLimiter) each retry and failover waits for it too.
+    """
+
+    def __init__(self, llms: List[BaseChatModel], max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 base_backoff: float = DEFAULT_BASE_BACKOFF_SECONDS, max_backoff: float = DEFAULT_MAX_BACKOFF_SECONDS,
+                 deadline: float = DEFAULT_DEADLINE_SECONDS, limiter: Any = None):
+        self.llms = list(llms)
+        self.limiter = limiter
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.lock = threading.Lock()
+        self.chains: "OrderedDict[Tuple[int, str, Any], Any]" = OrderedDict()
+        self.in_flight: Dict[Tuple[str, str, str], Future] = {}
+
+    def _chain(self, index: int, prompt_template: str, response_model: Optional[BaseModel]):
+        key = (index, prompt_template, response_model)
+        with self.lock:
+            chain = self.chains.get(key)
+            if chain is not None:
+                self.chains.move_to_end(key)
+                return chain
+        llm = self.llms[index]
+        chain = ChatPromptTemplate.from_template(prompt_template) | (llm.with_structured_output(response_model) if response_model else llm)
+        with self.lock:
+            self.chains[key] = chain
+            if len(self.chains) > CHAIN_CACHE_SIZE:
+                self.chains.popitem(last=False)
+        return chain
+
+    def invoke(self, prompt_template: str, input_data: Dict[str, Any], response_model: Optional[BaseModel] = None, stage: str = "other") -> Any:
+        """Runs the prompt, sharing the call with any identical request that is already in flight."""
+        key = (prompt_template, json.dumps(input_data, sort_keys=True, default=str), getattr(response_model, "__qualname__", ""))
+        with self.lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.in_flight[key] = future
+        if not owner:
+            record_coalesced(stage)
+            return future.result()
+        try:
+            result = self._invoke_with_retries(prompt_template, input_data, response_model, stage)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def _invoke_with_retries(self, prompt_template: str, input_data: Dict[str, Any], response_model: Optional[BaseModel], stage: str) -> Any:
+        deadline = time.monotonic() + self.deadline
+        estimated_tokens = max(1, (len(prompt_template) + len(json.dumps(input_data, default=str))) // 4)
+        for attempt in range(1, self.max_attempts + 1):
+            last_error, any_transient, all_rate_limited = None, False, True
+            for index, llm in enumerate(self.llms):
+                if index > 0:
+                    record_retry(stage, "failover")
+                if self.limiter is not None and (attempt > 1 or index > 0):
+                    self.limiter.acquire(estimated_tokens)
+                usage = TokenUsageCallback()
+                started = time.perf_counter()
+                try:
+                    response = self._chain(index, prompt_template, response_model).invoke(input_data, config={"callbacks": [usage]})
+                except Exception as e:
+                    rate_limited = is_rate_limit_error(e)
+                    record_llm_call(stage, get_model_name(llm), time.perf_counter() - started, "rate_limited" if rate_limited else "error", usage, error_type=type(e).__name__)
+                    last_error = e
+                    any_transient = any_transient or is_transient_error(e)
+                    all_rate_limited = all_rate_limited and rate_limited
+                    continue
+                record_llm_call(stage, get_model_name(llm), time.perf_counter() - started, "ok", usage)
+                return response
+
+            if not any_transient:
+                raise LLMCallError(f"LLM invocation failed: {last_error}") from last_error
+            if all_rate_limited:
+                raise LLMCallError(f"LLM invocation failed: {last_error}", transient=True) from last_error
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            if attempt == self.max_attempts or time.monotonic() + delay > deadline:
+                break
+            record_retry(stage, "transient")
+            time.sleep(delay)
+        raise LLMCallError(f"LLM invocation failed after {attempt} attempts: {last_error}", transient=True) from last_error
+
+def fallback_configs(model: str, api_key: str, fallback_api_keys: str = "", fallback_models: str = "") -> List[Tuple[str, str]]:
+    """(model, api_key) pairs to fail over to, from comma-separated backup keys (same model) and backup models (same key)."""
+    keys = [k.strip() for k in fallback_api_keys.split(",") if k.strip() and k.strip() != api_key]
+    models = [m.strip() for m in fallback_models.split(",") if m.strip() and m.strip() != model]
+    return [(model, k) for k in keys] + [(m, api_key) for m in models]
+
+# Each model carries its own client, so both are freed together; a module-level registry would keep every model alive.
+_CLIENT_ATTRIBUTE = "_recruitx_llm_client"
+_clients_lock = threading.Lock()
+
+def configure_llm_client(llm: BaseChatModel, fallbacks: Optional[List[BaseChatModel]] = None, **options: Any) -> LLMClient:
+    """Registers the client `call_llm` uses for `llm`, e.g. with backup API keys or models to fail over to."""
+    client = LLMClient([llm] + list(fallbacks or []), **options)
+    with _clients_lock:
+        object.__setattr__(llm, _CLIENT_ATTRIBUTE, client)
+    return client
+
+def get_llm_client(llm: BaseChatModel) -> LLMClient:
+    """The client registered for `llm`, or a default one without fallbacks."""
+    with _clients_lock:
+        client = getattr(llm, _CLIENT_ATTRIBUTE, None)
+        # A copy of a configured model inherits the attribute, but the client would still call the original.
+        if client is None or client.llms[0] is not llm:
+            client = LLMClient([llm])
+            object.__setattr__(llm, _CLIENT_ATTRIBUTE, client)
+        return client
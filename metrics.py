@@ -0,0 +1,283 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from json_repair import get_json_repair_stats
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+DEFAULT_METRICS_FILE = os.environ.get("RECRUITX_METRICS_FILE")
+
+LLM_LATENCY = "recruitx_llm_call_seconds"
+LLM_CALLS = "recruitx_llm_calls_total"
+LLM_TOKENS = "recruitx_llm_tokens_total"
+LLM_RETRIES = "recruitx_llm_retries_total"
+LLM_COALESCED = "recruitx_llm_coalesced_total"
+KNOCKOUT_DECISIONS = "recruitx_knockout_decisions_total"
+CASCADE_ESCALATIONS = "recruitx_cascade_escalations_total"
+CASCADE_SETTLED = "recruitx_cascade_settled_total"
+PACKED_CANDIDATES = "recruitx_packed_candidates_total"
+STAGE_LATENCY = "recruitx_stage_seconds"
+SESSION_MEMORY = "recruitx_session_memory_bytes"
+SESSION_MEMORY_BUDGET = "recruitx_session_memory_budget_bytes"
+SESSION_SPILLED = "recruitx_session_spilled_bytes"
+
+METRIC_HELP = {
+    LLM_LATENCY: ("histogram", "Latency of LLM calls by calling stage, model and outcome."),
+    LLM_CALLS: ("counter", "LLM calls by calling stage, model, outcome and error type."),
+    LLM_TOKENS: ("counter", "Prompt and completion tokens reported by the model."),
+    LLM_RETRIES: ("counter", "LLM calls retried by the pipeline, by reason."),
+    LLM_COALESCED: ("counter", "LLM requests served by an identical call already in flight."),
+    KNOCKOUT_DECISIONS: ("counter", "Knock-out requirement checks by the method that decided them and the outcome."),
+    CASCADE_ESCALATIONS: ("counter", "Cascade verdicts passed on to a larger model, by the model that escalated and the reason."),
+    CASCADE_SETTLED: ("counter", "Candidates whose cascade verdict was kept, by the model that gave it."),
+    PACKED_CANDIDATES: ("counter", "Resumes sent in a packed scoring request, by whether their entry parsed or they were retried alone."),
+    STAGE_LATENCY: ("histogram", "Wall time of non-LLM pipeline steps."),
+    SESSION_MEMORY: ("gauge", "Estimated in-memory size of each live UI session's candidates and chat indexes."),
+    SESSION_MEMORY_BUDGET: ("gauge", "Memory budget of each live UI session."),
+    SESSION_SPILLED: ("gauge", "Bytes each live UI session has spilled to its disk store."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value: float) -> str:
+    """Integers exactly and floats at full precision; `:g` would round large counters and sums to six digits."""
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 53):
+        return str(int(value))
+    return repr(float(value))
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and fixed-bucket histograms with pluggable observers."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        self.histograms: Dict[Tuple[str, Labels], List[Any]] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.observers: List[Callable[[Dict[str, Any]], None]] = []
+
+    def add_observer(self, observer: Callable[[Dict[str, Any]], None]) -> None:
+        """Registers a callback that receives every recorded event, e.g. to forward to another backend."""
+        self.observers.append(observer)
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        for observer in list(self.observers):
+            try:
+                observer(event)
+            except Exception as e:
+                print(f"Metrics observer failed: {e}")
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        with self.lock:
+            self.counters[(name, _labels(labels))] += value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        with self.lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def remove_gauge(self, name: str, **labels: Any) -> None:
+        with self.lock:
+            self.gauges.pop((name, _labels(labels)), None)
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self.lock:
+            histogram = self.histograms.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def quantile(self, name: str, q: float, **labels: Any) -> Optional[float]:
+        """Approximate quantile (bucket upper bound) over every series of `name` matching `labels`."""
+        wanted = set(_labels(labels))
+        counts, total = [0] * len(self.buckets), 0
+        with self.lock:
+            for (metric, series_labels), (bucket_counts, _, count) in self.histograms.items():
+                if metric == name and wanted <= set(series_labels):
+                    counts = [a + b for a, b in zip(counts, bucket_counts)]
+                    total += count
+        if total == 0:
+            return None
+        for bound, cumulative in zip(self.buckets, counts):
+            if cumulative >= q * total:
+                return bound
+        return float("inf")
+
+    def counter_total(self, name: str, **labels: Any) -> float:
+        wanted = set(_labels(labels))
+        with self.lock:
+            return sum(v for (metric, series_labels), v in self.counters.items() if metric == name and wanted <= set(series_labels))
+
+    def label_values(self, name: str, label: str) -> List[str]:
+        with self.lock:
+            keys = list(self.counters) + list(self.histograms)
+        return sorted({dict(series_labels).get(label) for metric, series_labels in keys if metric == name} - {None})
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.gauges.clear()
+
+    def to_prometheus(self) -> str:
+        """Renders every series in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items()) + sorted(self.gauges.items())
+            histograms = sorted(self.histograms.items())
+        names = sorted({name for (name, _), _ in counters} | {name for (name, _), _ in histograms})
+        for name in names:
+            kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in counters:
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for (metric, labels), (bucket_counts, total, count) in histograms:
+                if metric != name:
+                    continue
+                for bound, cumulative in zip(self.buckets, bucket_counts):
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        lines.append("# HELP recruitx_json_parse_outcomes_total LLM JSON outputs by parse outcome.")
+        lines.append("# TYPE recruitx_json_parse_outcomes_total counter")
+        for outcome, value in get_json_repair_stats().items():
+            lines.append(f'recruitx_json_parse_outcomes_total{{outcome="{outcome}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Atomically writes the Prometheus text file, e.g. for the node_exporter textfile collector."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+registry = MetricsRegistry()
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Collects token usage reported by the chat model during one chain invocation."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            self.prompt_tokens += usage.get("prompt_tokens", 0) or 0
+            self.completion_tokens += usage.get("completion_tokens", 0) or 0
+            return
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.prompt_tokens += metadata.get("input_tokens", 0)
+                self.completion_tokens += metadata.get("output_tokens", 0)
+
+def record_llm_call(stage: str, model: str, seconds: float, outcome: str, usage: Optional[TokenUsageCallback] = None, error_type: str = "") -> None:
+    registry.observe(LLM_LATENCY, seconds, stage=stage, model=model, outcome=outcome)
+    registry.inc(LLM_CALLS, stage=stage, model=model, outcome=outcome, error_type=error_type)
+    prompt_tokens = usage.prompt_tokens if usage else 0
+    completion_tokens = usage.completion_tokens if usage else 0
+    if prompt_tokens:
+        registry.inc(LLM_TOKENS, prompt_tokens, stage=stage, model=model, kind="prompt")
+    if completion_tokens:
+        registry.inc(LLM_TOKENS, completion_tokens, stage=stage, model=model, kind="completion")
+    registry.emit({"type": "llm_call", "stage": stage, "model": model, "seconds": seconds, "outcome": outcome,
+                   "error_type": error_type, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+
+def record_retry(stage: str, reason: str) -> None:
+    registry.inc(LLM_RETRIES, stage=stage, reason=reason)
+    registry.emit({"type": "retry", "stage": stage, "reason": reason})
+
+def record_coalesced(stage: str) -> None:
+    registry.inc(LLM_COALESCED, stage=stage)
+    registry.emit({"type": "coalesced", "stage": stage})
+
+def record_knockout_decision(method: str, outcome: str) -> None:
+    registry.inc(KNOCKOUT_DECISIONS, method=method, outcome=outcome)
+    registry.emit({"type": "knockout", "method": method, "outcome": outcome})
+
+def record_cascade_escalation(model: str, reason: str) -> None:
+    registry.inc(CASCADE_ESCALATIONS, model=model, reason=reason)
+    registry.emit({"type": "cascade_escalation", "model": model, "reason": reason})
+
+def record_cascade_settled(model: str) -> None:
+    registry.inc(CASCADE_SETTLED, model=model)
+    registry.emit({"type": "cascade_settled", "model": model})
+
+def record_packed_outcome(outcome: str) -> None:
+    registry.inc(PACKED_CANDIDATES, outcome=outcome)
+    registry.emit({"type": "packed", "outcome": outcome})
+
+def record_session_memory(session: str, resident_bytes: int, spilled_bytes: int, budget_bytes: int) -> None:
+    registry.set_gauge(SESSION_MEMORY, resident_bytes, session=session)
+    registry.set_gauge(SESSION_SPILLED, spilled_bytes, session=session)
+    registry.set_gauge(SESSION_MEMORY_BUDGET, budget_bytes, session=session)
+
+def clear_session_memory(session: str) -> None:
+    """Drops a session's gauges once it has ended, so only live sessions are exported."""
+    for name in (SESSION_MEMORY, SESSION_SPILLED, SESSION_MEMORY_BUDGET):
+        registry.remove_gauge(name, session=session)
+
+def record_duration(stage: str, seconds: float) -> None:
+    registry.observe(STAGE_LATENCY, seconds, stage=stage)
+    registry.emit({"type": "duration", "stage": stage, "seconds": seconds})
+
+@contextmanager
+def timed(stage: str):
+    """Records the wall time of the enclosed block under `stage`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_duration(stage, time.perf_counter() - started)
+
+def llm_stage_summary() -> List[Dict[str, Any]]:
+    """One row per LLM calling stage, for the diagnostics panel."""
+    rows = []
+    for stage in registry.label_values(LLM_CALLS, "stage"):
+        calls = registry.counter_total(LLM_CALLS, stage=stage)
+        rows.append({
+            "stage": stage,
+            "calls": int(calls),
+            "errors": int(calls - registry.counter_total(LLM_CALLS, stage=stage, outcome="ok")),
+            "retries": int(registry.counter_total(LLM_RETRIES, stage=stage)),
+            "coalesced": int(registry.counter_total(LLM_COALESCED, stage=stage)),
+            "p50_seconds": registry.quantile(LLM_LATENCY, 0.5, stage=stage),
+            "p95_seconds": registry.quantile(LLM_LATENCY, 0.95, stage=stage),
+            "prompt_tokens": int(registry.counter_total(LLM_TOKENS, stage=stage, kind="prompt")),
+            "completion_tokens": int(registry.counter_total(LLM_TOKENS, stage=stage, kind="completion")),
+        })
+    return rows
+
+def step_duration_summary() -> List[Dict[str, Any]]:
+    """One row per timed non-LLM step, for the diagnostics panel."""
+    rows = []
+    with registry.lock:
+        series = [(dict(labels).get("stage"), h[1], h[2]) for (name, labels), h in registry.histograms.items() if name == STAGE_LATENCY]
+    for stage, total, count in sorted(series):
+        rows.append({"step": stage, "count": count, "total_seconds": round(total, 3),
+                     "p95_seconds": registry.quantile(STAGE_LATENCY, 0.95, stage=stage)})
+    return rows
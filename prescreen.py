@@ -0,0 +1,94 @@
+import os
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+
+from metrics import timed
+from utils import (
+    get_embeddings,
+    normalize_rows,
+    split_resume,
+    IMPORTANCE_PENALTIES,
+    DEFAULT_IMPORTANCE,
+)
+
+MAX_NAME_GUESS_LENGTH = 60
+
+def compute_requirement_similarity(resumes: List[Dict[str, str]], requirements: List[str], talent_pool=None) -> np.ndarray:
+    """(resumes x requirements) cosine similarity of each requirement to the best-matching chunk of each resume.
+
+    Resumes already in the talent pool reuse their stored chunk embeddings. All chunks of the other
+    resumes are embedded in one batch; the per-resume maximum is a single reduceat.
+    """
+    if talent_pool is not None:
+        stored = [i for i, res in enumerate(resumes) if res.get("sha256") and talent_pool.contains(res["sha256"])]
+        if stored:
+            similarity = np.empty((len(resumes), len(requirements)), dtype=np.float32)
+            similarity[stored] = talent_pool.requirement_similarity([resumes[i]["sha256"] for i in stored], requirements)
+            fresh = sorted(set(range(len(resumes))) - set(stored))
+            if fresh:
+                similarity[fresh] = compute_requirement_similarity([resumes[i] for i in fresh], requirements)
+            return similarity
+    chunks_per_resume = [[doc.page_content for doc in split_resume(res["text"], res["filename"])] or [""] for res in resumes]
+    offsets = np.cumsum([0] + [len(chunks) for chunks in chunks_per_resume[:-1]])
+    with timed("prescreen_embedding"):
+        embeddings = get_embeddings()
+        chunk_vectors = normalize_rows(np.array(embeddings.embed_documents([c for chunks in chunks_per_resume for c in chunks]), dtype=np.float32))
+        requirement_vectors = normalize_rows(np.array(embeddings.embed_documents(requirements), dtype=np.float32))
+    similarity = chunk_vectors @ requirement_vectors.T
+    return np.maximum.reduceat(similarity, offsets, axis=0)
+
+def aggregate_similarity(similarity: np.ndarray, weighted_requirements: Dict) -> np.ndarray:
+    """Importance-weighted mean similarity per resume, on a 0-100 scale."""
+    weights = np.array([IMPORTANCE_PENALTIES.get(w.get("importance", DEFAULT_IMPORTANCE), IMPORTANCE_PENALTIES[DEFAULT_IMPORTANCE])
+                        for w in weighted_requirements.values()], dtype=np.float32)
+    return np.clip(similarity @ weights / weights.sum(), 0, 1) * 100
+
+def guess_candidate_name(resume_text: str, filename: str) -> str:
+    """Without an LLM call, the first short line of a resume is usually the candidate's name."""
+    for line in resume_text.splitlines():
+        line = line.strip()
+        if line:
+            return line if len(line) <= MAX_NAME_GUESS_LENGTH else os.path.splitext(filename)[0]
+    return os.path.splitext(filename)[0]
+
+def build_screened_out_result(resume: Dict[str, str], similarity_score: float, requirement_similarity: Dict[str, float]) -> Dict[str, Any]:
+    """The leaderboard entry for a resume that was not sent to LLM scoring."""
+    return {
+        "name": guess_candidate_name(resume["text"], resume["filename"]),
+        "overall_score": 0,
+        "summary": f"Not shortlisted for full AI scoring: pre-screen similarity to the requirements was {similarity_score:.0f}%.",
+        "requirement_analysis": [],
+        "knockout_requirement": None,
+        "filename": resume["filename"],
+        "screened_out": True,
+        "similarity_score": round(similarity_score, 1),
+        "requirement_similarity": requirement_similarity,
+    }
+
+def prescreen_candidates(resumes: List[Dict[str, str]], weighted_requirements: Dict, top_k: Optional[int] = None,
+                         threshold: Optional[float] = None, talent_pool=None) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]]]:
+    """Splits resumes into those worth LLM scoring and leaderboard entries for the rest.
+
+    A resume is shortlisted if it ranks in the `top_k` by similarity (when set) and scores at least
+    `threshold` on the 0-100 similarity scale (when set). Shortlisted resumes carry their similarity.
+    """
+    requirements = list(weighted_requirements)
+    if not resumes or not requirements or (top_k is None and threshold is None):
+        return list(resumes), []
+    similarity = compute_requirement_similarity(resumes, requirements, talent_pool)
+    scores = aggregate_similarity(similarity, weighted_requirements)
+    order = np.argsort(-scores, kind="stable")
+    keep = np.zeros(len(resumes), dtype=bool)
+    keep[order[:top_k] if top_k is not None else order] = True
+    if threshold is not None:
+        keep &= scores >= threshold
+
+    shortlisted, screened_out = [], []
+    for i in order.tolist():
+        resume = resumes[i]
+        if keep[i]:
+            shortlisted.append({**resume, "similarity_score": round(float(scores[i]), 1)})
+        else:
+            per_requirement = {req: round(float(similarity[i, j]) * 100, 1) for j, req in enumerate(requirements)}
+            screened_out.append(build_screened_out_result(resume, float(scores[i]), per_requirement))
+    return shortlisted, screened_out
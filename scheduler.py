@@ -0,0 +1,458 @@
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Iterable, Iterator
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from utils import (
+    score_candidate_explainable,
+    score_candidates_packed,
+    PACKED_SCORING_PROMPT,
+    generate_interview_questions,
+    fallback_interview_questions,
+    InterviewQuestions,
+    ExplainableCandidateScore,
+    apply_local_score,
+    estimate_tokens,
+    get_model_name,
+    get_retry_after,
+    is_rate_limit_error,
+    DEFAULT_RESUME_TOKEN_BUDGET,
+)
+from metrics import record_retry, record_packed_outcome
+from cache import ResultCache
+from talent_pool import TalentPool
+from dedup import NearDuplicateIndex
+from knockout import KnockoutGate
+from cascade import ModelCascade
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_TOKENS_PER_MINUTE = 30000
+DEFAULT_COMPLETION_TOKENS = 800
+DEFAULT_QUESTIONS_COMPLETION_TOKENS = 400
+DEFAULT_PREFETCH_CONCURRENCY = 2
+DEFAULT_QUESTION_PREFETCH = 3
+DEFAULT_PACK_TOKEN_BUDGET = 6000
+DEFAULT_MAX_PACK_SIZE = 5
+DEFAULT_PACK_LINGER_SECONDS = 0.2
+PACKED_RESUME_MAX_TOKENS = DEFAULT_RESUME_TOKEN_BUDGET // 2
+MAX_RATE_LIMIT_RETRIES = 5
+CANCEL_POLL_SECONDS = 0.25
+
+_FEED_DONE = object()
+
+class TokenBucket:
+    """A thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Takes `amount` tokens (going into debt if needed) and returns the seconds to wait before using them."""
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class RateLimiter:
+    """Throttles LLM calls on requests/minute and tokens/minute, pausing all workers after a 429."""
+
+    def __init__(self, requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+                 base_backoff: float = 2.0, max_backoff: float = 60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.backoff = base_backoff
+        self.cooldown_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, estimated_tokens: int = 1) -> None:
+        """Blocks until a request of `estimated_tokens` may be sent."""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+        with self.lock:
+            wait = max(wait, self.cooldown_until - time.monotonic())
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.backoff = max(self.base_backoff, self.backoff / 2)
+
+    def record_rate_limit(self, retry_after: Optional[float] = None) -> None:
+        """Doubles the shared backoff and holds every worker until it has elapsed."""
+        with self.lock:
+            delay = retry_after if retry_after else self.backoff * random.uniform(1.0, 1.5)
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+            self.backoff = min(self.max_backoff, self.backoff * 2)
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: int = 1, stage: str = "other", max_retries: int = MAX_RATE_LIMIT_RETRIES) -> Any:
+        """Returns `fn()` once the limiter lets a request of `estimated_tokens` through, backing off and retrying on 429s.
+
+        Other errors, and a 429 on the last attempt, are raised.
+        """
+        for attempt in range(max_retries + 1):
+            self.acquire(estimated_tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                if is_rate_limit_error(e) and attempt < max_retries:
+                    self.record_rate_limit(get_retry_after(e))
+                    record_retry(stage, "rate_limit")
+                    continue
+                raise
+            self.record_success()
+            return result
+
+def build_error_result(filename: str, error: Exception) -> Dict[str, Any]:
+    """The leaderboard entry shown for a resume the AI failed to score."""
+    return {
+        "name": f"Error: {filename}",
+        "overall_score": 0,
+        "summary": f"The AI failed to process this resume. Please check the file. Error: {error}",
+        "requirement_analysis": [],
+        "filename": filename
+    }
+
+def _with_resume_fields(result_dict: Dict[str, Any], resume: Dict[str, Any]) -> Dict[str, Any]:
+    result_dict['filename'] = resume['filename']
+    if "similarity_score" in resume:
+        result_dict['similarity_score'] = resume['similarity_score']
+    if "sha256" in resume:
+        result_dict['sha256'] = resume['sha256']
+    return result_dict
+
+class _Pack:
+    """Resumes waiting to be scored together in one request."""
+
+    def __init__(self, overhead_tokens: int):
+        self.resumes: List[Dict[str, Any]] = []
+        self.futures: List[Future] = []
+        self.tokens = overhead_tokens
+        self.full = threading.Event()
+
+class PackedScorer:
+    """Scores several short resumes per request, so the job description and rubric are sent once per pack.
+
+    Scoring threads join the open pack for their model; the first one to join waits until the pack is
+    full (by `token_budget` or `max_resumes`) or `linger` seconds have passed, then sends it for all of
+    them. A resume whose entry in the reply is missing or invalid, or whose pack failed, gets None back
+    and is scored alone by its own thread.
+    """
+
+    def __init__(self, job_description: str, weighted_requirements: Dict, token_budget: int = DEFAULT_PACK_TOKEN_BUDGET, max_resumes: int = DEFAULT_MAX_PACK_SIZE,
+                 linger: float = DEFAULT_PACK_LINGER_SECONDS):
+        self.job_description = job_description
+        self.weighted_requirements = weighted_requirements
+        self.token_budget = token_budget
+        self.max_resumes = max_resumes
+        self.linger = linger
+        self.overhead_tokens = estimate_tokens(PACKED_SCORING_PROMPT) + estimate_tokens(job_description) + estimate_tokens(str(list(weighted_requirements)))
+        self.lock = threading.Lock()
+        self.open_packs: Dict[str, _Pack] = {}
+
+    def accepts(self, resume: Dict[str, str]) -> bool:
+        """Only resumes short enough to be sent whole are packed; longer ones gain little and are scored alone."""
+        return estimate_tokens(resume["text"]) <= PACKED_RESUME_MAX_TOKENS
+
+    def score(self, resume: Dict[str, str], llm: BaseChatModel, limiter: RateLimiter) -> Optional[ExplainableCandidateScore]:
+        cost = estimate_tokens(resume["text"]) + DEFAULT_COMPLETION_TOKENS
+        future = Future()
+        model = get_model_name(llm)
+        with self.lock:
+            pack = self.open_packs.get(model)
+            leader = pack is None or pack.tokens + cost > self.token_budget
+            if leader:
+                if pack is not None:
+                    pack.full.set()
+                pack = self.open_packs[model] = _Pack(self.overhead_tokens)
+            pack.resumes.append(resume)
+            pack.futures.append(future)
+            pack.tokens += cost
+            if len(pack.resumes) >= self.max_resumes:
+                pack.full.set()
+                del self.open_packs[model]
+        if leader:
+            pack.full.wait(self.linger)
+            with self.lock:
+                if self.open_packs.get(model) is pack:
+                    del self.open_packs[model]
+            self._send(pack, llm, limiter)
+        return future.result()
+
+    def _send(self, pack: _Pack, llm: BaseChatModel, limiter: RateLimiter) -> None:
+        results: Dict[str, ExplainableCandidateScore] = {}
+        if len(pack.resumes) > 1:
+            ids = [f"R{i + 1}" for i in range(len(pack.resumes))]
+            try:
+                results = limiter.call(lambda: score_candidates_packed(self.job_description, [(resume_id, res["text"]) for resume_id, res in zip(ids, pack.resumes)],
+                                                                       self.weighted_requirements, llm), pack.tokens, "scoring_packed")
+            except Exception as e:
+                print(f"Packed scoring of {len(pack.resumes)} resumes failed, scoring them one by one. Error: {e}")
+            for resume_id, future in zip(ids, pack.futures):
+                record_packed_outcome("parsed" if resume_id in results else "retried_alone")
+                future.set_result(results.get(resume_id))
+        else:
+            pack.futures[0].set_result(None)
+
+def score_with_rate_limit(job_description: str, resume: Dict[str, str], weighted_requirements: Dict, llm: BaseChatModel,
+                          limiter: RateLimiter, cache: Optional[ResultCache] = None, talent_pool: Optional[TalentPool] = None,
+                          knockout_gate: Optional[KnockoutGate] = None, cascade: Optional[ModelCascade] = None,
+                          packer: Optional[PackedScorer] = None) -> Dict[str, Any]:
+    """Scores one resume, waiting on the limiter and retrying on 429s. Failures become an error result.
+
+    Analyses are looked up in (and saved to) the talent pool first, then the result cache. A resume
+    that fails the `knockout_gate` is returned knocked out without calling the scoring model. With a
+    `cascade`, smaller models score first and `llm` only sees the resumes they escalate. With a `packer`,
+    short resumes share a scoring request with others and fall back to a request of their own.
+    """
+    model_name = cascade.model_name(llm, weighted_requirements) if cascade else get_model_name(llm)
+    pool_key = TalentPool.job_key(job_description, list(weighted_requirements), model_name) if talent_pool and resume.get("sha256") else None
+    if pool_key:
+        stored = talent_pool.get_analysis(resume["sha256"], pool_key)
+        if stored is not None:
+            return _with_resume_fields(apply_local_score(stored, weighted_requirements).model_dump(), resume)
+    cache_key = cache.score_key(job_description, resume["text"], weighted_requirements, model_name) if cache else None
+    if cache:
+        cached = cache.get_score(cache_key)
+        if cached is not None:
+            if pool_key:
+                talent_pool.set_analysis(resume["sha256"], pool_key, cached)
+            return _with_resume_fields(apply_local_score(cached, weighted_requirements).model_dump(), resume)
+    if knockout_gate:
+        knocked_out = knockout_gate.check(resume)
+        if knocked_out is not None:
+            return _with_resume_fields(knocked_out, resume)
+    estimated = (estimate_tokens(job_description) + min(estimate_tokens(resume["text"]), DEFAULT_RESUME_TOKEN_BUDGET)
+                 + estimate_tokens(str(list(weighted_requirements))) + DEFAULT_COMPLETION_TOKENS)
+
+    def score_with(model: BaseChatModel) -> ExplainableCandidateScore:
+        if packer and packer.accepts(resume):
+            packed = packer.score(resume, model, limiter)
+            if packed is not None:
+                return packed
+        return limiter.call(lambda: score_candidate_explainable(job_description, resume["text"], weighted_requirements, model), estimated, "scoring")
+
+    try:
+        if cascade:
+            score_data, scored_by = cascade.score(score_with, resume["text"], list(weighted_requirements), llm)
+        else:
+            score_data, scored_by = score_with(llm), None
+    except Exception as e:
+        print(f"Error processing {resume['filename']}: {e}")
+        return _with_resume_fields(build_error_result(resume['filename'], e), resume)
+    if cache:
+        cache.set_score(cache_key, score_data)
+    if pool_key:
+        talent_pool.set_analysis(resume["sha256"], pool_key, score_data)
+    result_dict = score_data.model_dump()
+    if scored_by:
+        result_dict["scored_by"] = scored_by
+    return _with_resume_fields(result_dict, resume)
+
+def questions_with_rate_limit(job_description: str, candidate: Dict[str, Any], llm: BaseChatModel, limiter: RateLimiter,
+                              cache: Optional[ResultCache] = None) -> InterviewQuestions:
+    """Generates interview questions for one scored candidate, waiting on the limiter and retrying on 429s. Failures are raised."""
+    cache_key = cache.questions_key(job_description, candidate["name"], candidate["summary"], get_model_name(llm)) if cache else None
+    if cache:
+        cached = cache.get_questions(cache_key)
+        if cached is not None:
+            return cached
+    estimated = estimate_tokens(job_description) + estimate_tokens(candidate["summary"]) + DEFAULT_QUESTIONS_COMPLETION_TOKENS
+    questions = limiter.call(lambda: generate_interview_questions(candidate["name"], candidate["summary"], job_description, llm, fallback_on_error=False),
+                             estimated, "questions")
+    if cache:
+        cache.set_questions(cache_key, questions)
+    return questions
+
+class QuestionPrefetcher:
+    """Interview questions per candidate, generated ahead of time on a small pool that shares the scoring rate limiter."""
+
+    def __init__(self, job_description: str, llm: BaseChatModel, limiter: RateLimiter, cache: Optional[ResultCache] = None,
+                 max_concurrency: int = DEFAULT_PREFETCH_CONCURRENCY):
+        self.job_description = job_description
+        self.llm = llm
+        self.limiter = limiter
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="question-prefetch")
+        self.lock = threading.Lock()
+        self.futures: Dict[str, Future] = {}
+
+    def _submit(self, candidate: Dict[str, Any]) -> Future:
+        with self.lock:
+            future = self.futures.get(candidate["filename"])
+            if future is None:
+                future = self.executor.submit(questions_with_rate_limit, self.job_description, candidate, self.llm, self.limiter, self.cache)
+                self.futures[candidate["filename"]] = future
+            return future
+
+    def prefetch(self, candidates: List[Dict[str, Any]]) -> None:
+        """Starts generating questions for `candidates` in the background without waiting for them."""
+        for candidate in candidates:
+            self._submit(candidate)
+
+    def is_ready(self, candidate: Dict[str, Any]) -> bool:
+        future = self.futures.get(candidate["filename"])
+        return future is not None and future.done()
+
+    def get(self, candidate: Dict[str, Any]) -> InterviewQuestions:
+        """The candidate's questions, waiting for (or starting) their generation if needed."""
+        future = self._submit(candidate)
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Could not generate interview questions for {candidate['name']}. Error: {e}")
+            with self.lock:
+                if self.futures.get(candidate["filename"]) is future:
+                    del self.futures[candidate["filename"]]  # Let the next click retry.
+            return fallback_interview_questions()
+
+def _link_duplicate(result_dict: Dict[str, Any], resume: Dict[str, Any]) -> Dict[str, Any]:
+    """The result for a near-duplicate resume: its representative's verdict, under its own file."""
+    return _with_resume_fields({**result_dict, "duplicate_of": result_dict["filename"]}, resume)
+
+def iter_scored_candidates(job_description: str, resumes: Iterable[Dict[str, str]], weighted_requirements: Dict, llm: BaseChatModel,
+                           max_concurrency: int = DEFAULT_MAX_CONCURRENCY, limiter: Optional[RateLimiter] = None,
+                           cache: Optional[ResultCache] = None, cancel_event: Optional[threading.Event] = None,
+                           talent_pool: Optional[TalentPool] = None, duplicate_threshold: Optional[float] = None,
+                           knockout_gate: Optional[KnockoutGate] = None, cascade: Optional[ModelCascade] = None,
+                           packer: Optional[PackedScorer] = None) -> Iterator[Dict[str, Any]]:
+    """Scores resumes on a bounded thread pool and yields each result dict as soon as it completes.
+
+    `resumes` may be a lazy stream (e.g. from ingestion); each resume is submitted as soon as it arrives.
+    Setting `cancel_event` (or closing the iterator) stops feeding new resumes and drops queued ones;
+    calls already in flight finish in the background and are discarded.
+
+    With a `knockout_gate`, resumes that clearly fail a knock-out requirement are never sent to the scorer.
+    With a `cascade`, each resume is scored by the smallest model tier whose verdict is confident.
+    With a `packer`, short resumes are scored several to a request.
+    With a `duplicate_threshold`, a resume whose estimated Jaccard similarity to an earlier one reaches it
+    is not scored again: it is yielded with the earlier resume's verdict and `duplicate_of` its filename.
+    """
+    limiter = limiter or RateLimiter()
+    stop = threading.Event()
+
+    def stopping() -> bool:
+        return stop.is_set() or (cancel_event is not None and cancel_event.is_set())
+    completed = queue.Queue()
+    submitted = []
+    feed_errors = []
+    duplicates = NearDuplicateIndex(duplicate_threshold) if duplicate_threshold else None
+
+    def score(executor: ThreadPoolExecutor, res: Dict[str, Any]) -> Future:
+        return executor.submit(score_with_rate_limit, job_description, res, weighted_requirements, llm, limiter, cache, talent_pool, knockout_gate, cascade, packer)
+
+    def follow(executor: ThreadPoolExecutor, representative: Future, res: Dict[str, Any]) -> Future:
+        linked = Future()
+
+        def link(done: Future) -> None:
+            if done.cancelled():
+                linked.cancel()
+            elif "Error:" not in done.result()["name"]:
+                linked.set_result(_link_duplicate(done.result(), res))
+            else:
+                # The representative failed, so this copy is scored on its own instead.
+                try:
+                    retry = score(executor, res)
+                except RuntimeError:  # The run has already shut down.
+                    linked.cancel()
+                    return
+                retry.add_done_callback(lambda f: linked.cancel() if f.cancelled() else linked.set_result(f.result()))
+        representative.add_done_callback(link)
+        return linked
+
+    def feed(executor: ThreadPoolExecutor) -> None:
+        representatives: Dict[int, Future] = {}
+        try:
+            for position, res in enumerate(resumes):
+                if stopping():
+                    break
+                original = duplicates.add(position, res["text"]) if duplicates else None
+                if original is None:
+                    future = representatives[position] = score(executor, res)
+                else:
+                    future = follow(executor, representatives[original], res)
+                future.add_done_callback(completed.put)
+                submitted.append(future)
+        except Exception as e:
+            if not stopping():
+                feed_errors.append(e)
+        finally:
+            completed.put(_FEED_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+    feeder = threading.Thread(target=feed, args=(executor,), daemon=True)
+    feeder.start()
+    try:
+        received, feed_done = 0, False
+        while (not feed_done or received < len(submitted)) and not stopping():
+            try:
+                item = completed.get(timeout=CANCEL_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _FEED_DONE:
+                feed_done = True
+                continue
+            if item.cancelled():
+                continue
+            received += 1
+            yield item.result()
+    finally:
+        cancelled = stopping() or not feed_done or received < len(submitted)
+        stop.set()
+        executor.shutdown(wait=not cancelled, cancel_futures=cancelled)
+    if feed_errors:
+        raise feed_errors[0]
+
+class BackgroundScoringRun:
+    """Collects a stream of results on a background thread, so a UI can show partial results and cancel the run.
+
+    `produce` is called with the run's cancel event and returns the result stream, e.g. `iter_scored_candidates`.
+    """
+
+    def __init__(self, produce: Callable[[threading.Event], Iterable[Dict[str, Any]]], total: int):
+        self.total = total
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.results: List[Dict[str, Any]] = []
+        self.error: Optional[Exception] = None
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(produce,), daemon=True)
+        self.thread.start()
+
+    def _run(self, produce: Callable[[threading.Event], Iterable[Dict[str, Any]]]) -> None:
+        try:
+            for result in produce(self.cancel_event):
+                with self.lock:
+                    self.results.append(result)
+        except Exception as e:
+            print(f"Error during background scoring: {e}")
+            self.error = e
+        finally:
+            self.finished.set()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.finished.is_set()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """The results received so far, in completion order."""
+        with self.lock:
+            return list(self.results)
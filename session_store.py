@@ -0,0 +1,182 @@
+import itertools
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import uuid
+import weakref
+from typing import List, Dict, Any, Iterator, Optional
+
+from metrics import record_session_memory, clear_session_memory
+
+DEFAULT_SESSION_DIR = os.environ.get("RECRUITX_SESSION_DIR") or None
+DEFAULT_SESSION_MEMORY_BUDGET_MB = float(os.environ.get("RECRUITX_SESSION_MEMORY_MB", "64"))
+
+_MISSING = object()
+
+def _close_store(conn: sqlite3.Connection, directory: str, session_id: str) -> None:
+    conn.close()
+    shutil.rmtree(directory, ignore_errors=True)
+    clear_session_memory(session_id)
+
+class SessionStore:
+    """Disk-backed storage for one UI session's bulky data, removed when the session is garbage collected.
+
+    Uploaded files, resume texts, requirement evidence and chat histories live here instead of in
+    `st.session_state`; the session keeps small handles and loads the data when a page needs it.
+    """
+
+    def __init__(self, budget_mb: float = DEFAULT_SESSION_MEMORY_BUDGET_MB, directory: Optional[str] = DEFAULT_SESSION_DIR):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.session_id = uuid.uuid4().hex[:12]
+        self.budget_bytes = int(budget_mb * 2**20)
+        self.directory = tempfile.mkdtemp(prefix="recruitx-session-", dir=directory)
+        self.lock = threading.Lock()
+        self.keys = itertools.count()
+        self.requirement_names: Dict[tuple, tuple] = {}
+        self.conn = sqlite3.connect(os.path.join(self.directory, "session.sqlite3"), check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS blobs (kind TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, PRIMARY KEY (kind, key))")
+        self.conn.commit()
+        weakref.finalize(self, _close_store, self.conn, self.directory, self.session_id)
+
+    def new_key(self) -> str:
+        return str(next(self.keys))
+
+    def put(self, kind: str, key: str, value: bytes) -> None:
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO blobs (kind, key, value) VALUES (?, ?, ?)", (kind, key, value))
+            self.conn.commit()
+
+    def get(self, kind: str, key: str) -> Optional[bytes]:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM blobs WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        return row[0] if row else None
+
+    def put_json(self, kind: str, key: str, value: Any) -> None:
+        self.put(kind, key, json.dumps(value).encode("utf-8"))
+
+    def get_json(self, kind: str, key: str, default: Any = None) -> Any:
+        value = self.get(kind, key)
+        return json.loads(value) if value is not None else default
+
+    def clear(self, kind: str) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM blobs WHERE kind = ?", (kind,))
+            self.conn.commit()
+
+    def spilled_bytes(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM blobs").fetchone()[0]
+
+    def shared_requirements(self, requirements: tuple) -> tuple:
+        """One shared tuple per distinct requirement list, instead of a copy in every candidate."""
+        return self.requirement_names.setdefault(requirements, requirements)
+
+    def report(self, resident_bytes: int) -> None:
+        """Publishes this session's memory use against its budget as gauges."""
+        record_session_memory(self.session_id, resident_bytes, self.spilled_bytes(), self.budget_bytes)
+
+class StoredFile:
+    """Stands in for an uploaded file once its bytes have been moved to the session store."""
+    __slots__ = ("name", "size", "key", "store")
+
+    def __init__(self, name: str, size: int, key: str, store: SessionStore):
+        self.name = name
+        self.size = size
+        self.key = key
+        self.store = store
+
+    def getvalue(self) -> bytes:
+        return self.store.get("upload", self.key) or b""
+
+def spill_uploaded_files(files: List[Any], store: SessionStore) -> List[StoredFile]:
+    """Moves uploaded file contents to disk, keeping only their names and sizes in memory."""
+    store.clear("upload")
+    stored = []
+    for file in files:
+        key = store.new_key()
+        store.put("upload", key, file.getvalue())
+        stored.append(StoredFile(file.name, file.size, key, store))
+    return stored
+
+class CompactCandidate:
+    """A leaderboard entry that keeps only what is needed to rank and filter candidates in memory.
+
+    Scores and requirement match flags live in slots; the summary, evidence and similarity breakdown
+    are in the session store and loaded on access. Reads and writes like the result dict it replaces.
+    """
+    SLOTS = ("name", "overall_score", "filename", "sha256", "knockout_requirement", "similarity_score", "screened_out", "knocked_out_early", "duplicate_of", "scored_by")
+    SPILLED = ("summary", "requirement_analysis", "requirement_similarity")
+    __slots__ = SLOTS + ("requirements", "match_flags", "key", "store")
+
+    def __init__(self, result: Dict[str, Any], store: SessionStore):
+        for field in self.SLOTS:
+            setattr(self, field, result.get(field, _MISSING))
+        analysis = result.get("requirement_analysis") or []
+        self.requirements = store.shared_requirements(tuple(sys.intern(req["requirement"]) for req in analysis))
+        self.match_flags = bytes(bool(req["match_status"]) for req in analysis)
+        self.key = store.new_key()
+        self.store = store
+        store.put_json("candidate", self.key, {"summary": result.get("summary", ""), "evidence": [req["evidence"] for req in analysis],
+                                               "requirement_similarity": result.get("requirement_similarity")})
+
+    def _spilled(self) -> Dict[str, Any]:
+        return self.store.get_json("candidate", self.key, {"summary": "", "evidence": [], "requirement_similarity": None})
+
+    def __getitem__(self, field: str) -> Any:
+        if field in self.SLOTS:
+            value = getattr(self, field)
+            if value is _MISSING:
+                raise KeyError(field)
+            return value
+        if field == "requirement_analysis":
+            evidence = self._spilled()["evidence"]
+            return [{"requirement": req, "match_status": bool(flag), "evidence": text}
+                    for req, flag, text in zip(self.requirements, self.match_flags, evidence)]
+        if field in self.SPILLED:
+            value = self._spilled()[field]
+            if value is None:
+                raise KeyError(field)
+            return value
+        raise KeyError(field)
+
+    def __setitem__(self, field: str, value: Any) -> None:
+        if field not in self.SLOTS:
+            raise KeyError(f"{field} cannot be changed on a compact candidate")
+        setattr(self, field, value)
+
+    def __contains__(self, field: str) -> bool:
+        try:
+            self[field]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, field: str, default: Any = None) -> Any:
+        if field in self.SLOTS:
+            value = getattr(self, field)
+            return default if value is _MISSING else value
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def keys(self) -> Iterator[str]:
+        return (field for field in self.SLOTS + self.SPILLED if field in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: self[field] for field in self.keys()}
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this record (the shared requirement names are not counted)."""
+        return sys.getsizeof(self) + sys.getsizeof(self.match_flags) + sum(
+            sys.getsizeof(getattr(self, field)) for field in self.SLOTS if getattr(self, field) is not _MISSING)
+
+def compact_candidates(results: List[Dict[str, Any]], store: SessionStore) -> List[CompactCandidate]:
+    """Replaces finished result dicts with compact records, spilling their text to the session store."""
+    store.clear("candidate")
+    return [CompactCandidate(result, store) for result in results]
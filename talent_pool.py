@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+from cache import content_hash
+from metrics import timed
+from utils import get_embeddings, normalize_rows, split_resume, ExplainableCandidateScore, SCORING_PROMPT_VERSION
+
+DEFAULT_TALENT_POOL_DIR = os.environ.get("RECRUITX_TALENT_POOL_DIR", os.path.join(".recruitx", "talent_pool"))
+QUERY_BATCH_SIZE = 500
+
+class TalentPool:
+    """A persistent repository of every resume screened so far, reusable across job postings.
+
+    Extracted text, chunks with their embeddings and per-job requirement analyses live in SQLite, keyed
+    by the SHA-256 of the resume file. Each add is one transaction, so several instances (app sessions,
+    CLI runs) can share a directory without losing or duplicating each other's resumes.
+    """
+
+    def __init__(self, directory: str = DEFAULT_TALENT_POOL_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, "pool.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS resumes ("
+            "sha256 TEXT PRIMARY KEY, filename TEXT NOT NULL, text TEXT NOT NULL, added_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, sha256 TEXT NOT NULL, position INTEGER NOT NULL, content TEXT NOT NULL, "
+            "embedding BLOB)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_sha256 ON chunks (sha256)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "sha256 TEXT NOT NULL, job_key TEXT NOT NULL, analysis TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (sha256, job_key))"
+        )
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+
+    def contains(self, sha256: str) -> bool:
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM resumes WHERE sha256 = ?", (sha256,)).fetchone() is not None
+
+    def add_resumes(self, resumes: List[Dict[str, str]]) -> int:
+        """Stores new resumes ({"text", "filename", "sha256"}) and embeds their chunks in one batch. Returns how many were new.
+
+        Resumes already stored are skipped before embedding; whether a resume is new is settled again inside the
+        write transaction, so a concurrent add of the same resume (from this or another instance) stores it once.
+        """
+        new = [res for res in {res["sha256"]: res for res in resumes if res.get("text")}.values() if not self.contains(res["sha256"])]
+        if not new:
+            return 0
+        chunks = [(res["sha256"], position, doc.page_content)
+                  for res in new for position, doc in enumerate(split_resume(res["text"], res["filename"]))]
+        with timed("talent_pool_embedding"):
+            vectors = normalize_rows(np.array(get_embeddings().embed_documents([c[2] for c in chunks]), dtype=np.float32)) if chunks else []
+        now = time.time()
+        with self.lock:
+            inserted = set()
+            for res in new:
+                cursor = self.conn.execute("INSERT OR IGNORE INTO resumes (sha256, filename, text, added_at) VALUES (?, ?, ?, ?)",
+                                           (res["sha256"], res["filename"], res["text"], now))
+                if cursor.rowcount:
+                    inserted.add(res["sha256"])
+            self.conn.executemany(
+                "INSERT INTO chunks (sha256, position, content, embedding) VALUES (?, ?, ?, ?)",
+                [(sha256, position, content, vector.tobytes()) for (sha256, position, content), vector in zip(chunks, vectors) if sha256 in inserted]
+            )
+            self.conn.commit()
+        return len(inserted)
+
+    def _select_in(self, query: str, values: List[str]) -> List[Tuple]:
+        """Runs `query` with its IN clause filled in batches, staying under SQLite's bound-parameter limit."""
+        rows = []
+        for start in range(0, len(values), QUERY_BATCH_SIZE):
+            batch = values[start:start + QUERY_BATCH_SIZE]
+            rows.extend(self.conn.execute(query.format(",".join("?" * len(batch))), batch).fetchall())
+        return rows
+
+    def list_resumes(self) -> List[Dict[str, str]]:
+        """Every stored resume as {"filename", "sha256"}, oldest first; texts are loaded with `get_resumes` when needed."""
+        with self.lock:
+            rows = self.conn.execute("SELECT sha256, filename FROM resumes ORDER BY added_at, sha256").fetchall()
+        return [{"sha256": sha256, "filename": filename} for sha256, filename in rows]
+
+    def get_resumes(self, sha256s: List[str]) -> List[Dict[str, str]]:
+        """The given stored resumes as {"text", "filename", "sha256"}."""
+        with self.lock:
+            rows = self._select_in("SELECT sha256, filename, text FROM resumes WHERE sha256 IN ({})", sha256s)
+        return [{"sha256": sha256, "filename": filename, "text": text} for sha256, filename, text in rows]
+
+    def get_chunks(self, sha256s: List[str]) -> Tuple[List[Tuple[str, str]], Optional[np.ndarray]]:
+        """[(sha256, content)] for every embedded chunk of the given resumes, and their unit-length embeddings."""
+        with self.lock:
+            rows = self._select_in(
+                "SELECT sha256, content, embedding FROM chunks WHERE sha256 IN ({}) AND embedding IS NOT NULL ORDER BY sha256, position", sha256s)
+        if not rows:
+            return [], None
+        return [(sha256, content) for sha256, content, _ in rows], np.vstack([np.frombuffer(blob, dtype=np.float32) for _, _, blob in rows])
+
+    def get_documents(self, resumes: List[Dict[str, str]]) -> Tuple[List[Document], Optional[np.ndarray]]:
+        """Chunk documents (with the resume's current filename as their source) and embeddings, e.g. to build a chat index."""
+        filenames = {res["sha256"]: res["filename"] for res in resumes}
+        chunks, vectors = self.get_chunks(list(filenames))
+        return [Document(page_content=content, metadata={"source": filenames[sha256]}) for sha256, content in chunks], vectors
+
+    def requirement_similarity(self, sha256s: List[str], requirements: List[str]) -> np.ndarray:
+        """(resumes x requirements) cosine similarity of each requirement to each resume's best chunk, from stored embeddings."""
+        chunks, vectors = self.get_chunks(sha256s)
+        requirement_vectors = normalize_rows(np.array(get_embeddings().embed_documents(requirements), dtype=np.float32))
+        similarity = np.full((len(sha256s), len(requirements)), -1.0, dtype=np.float32)
+        if vectors is None:
+            return similarity
+        rows = {sha256: i for i, sha256 in enumerate(sha256s)}
+        chunk_rows = np.array([rows[sha256] for sha256, _ in chunks])
+        np.maximum.at(similarity, chunk_rows, vectors @ requirement_vectors.T)
+        return similarity
+
+    @staticmethod
+    def job_key(job_description: str, requirements: List[str], model_name: str) -> str:
+        return content_hash(job_description, json.dumps(list(requirements)), SCORING_PROMPT_VERSION, model_name)
+
+    def get_analysis(self, sha256: str, job_key: str) -> Optional[ExplainableCandidateScore]:
+        with self.lock:
+            row = self.conn.execute("SELECT analysis FROM analyses WHERE sha256 = ? AND job_key = ?", (sha256, job_key)).fetchone()
+        return ExplainableCandidateScore.model_validate_json(row[0]) if row else None
+
+    def set_analysis(self, sha256: str, job_key: str, analysis: ExplainableCandidateScore) -> None:
+        """Keeps a candidate's requirement analysis for one job, so re-screening for it needs no LLM call."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO analyses (sha256, job_key, analysis, created_at) VALUES (?, ?, ?, ?)",
+                (sha256, job_key, analysis.model_dump_json(), time.time())
+            )
+            self.conn.commit()
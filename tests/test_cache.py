@@ -0,0 +1,49 @@
+import cache as cache_module
+from cache import ResultCache, content_hash
+from utils import ExplainableCandidateScore
+
+WEIGHTS = {"Python": {"importance": "Critical", "knockout": False}}
+
+def test_content_hash_separates_parts():
+    assert content_hash("ab", "c") != content_hash("a", "bc")
+
+def test_values_round_trip_and_are_counted(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get("score", "k") is None
+    cache.set("score", "k", "v")
+    assert cache.get("score", "k") == "v"
+    assert cache.get("pdf_text", "k") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 1}
+
+def test_entries_expire_after_max_age(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), max_age_days=1)
+    now = 1_000_000.0
+    monkeypatch.setattr(cache_module.time, "time", lambda: now)
+    cache.set("score", "k", "v")
+    now += 86400 + 1
+    assert cache.get("score", "k") is None
+    cache.evict()
+    assert cache.stats()["entries"] == 0
+
+def test_eviction_keeps_the_most_recently_used_entries(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    clock = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr(cache_module.time, "time", lambda: float(next(clock)))
+    for key in ("a", "b", "c"):
+        cache.set("score", key, key)
+    cache.get("score", "a")
+    cache.evict()
+    assert [key for key in "abc" if cache.get("score", key)] == ["a", "c"]
+
+def test_score_keys_ignore_weights_but_not_the_requirement_list(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    key = cache.score_key("jd", "resume", WEIGHTS, "model")
+    assert key == cache.score_key("jd", "resume", {"Python": {"importance": "Normal", "knockout": True}}, "model")
+    assert key != cache.score_key("jd", "resume", {**WEIGHTS, "SQL": {"importance": "Normal", "knockout": False}}, "model")
+    assert key != cache.score_key("jd", "resume", WEIGHTS, "other-model")
+
+def test_scores_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    score = ExplainableCandidateScore(name="Ada", overall_score=80, summary="Fits.", requirement_analysis=[])
+    cache.set_score("k", score)
+    assert cache.get_score("k") == score
@@ -0,0 +1,53 @@
+from fake_llm import FakeChatModel
+from cascade import ModelCascade
+from utils import ExplainableCandidateScore, RequirementMatch
+
+RESUME = "Ada Lovelace\nBuilt data pipelines in Python and ran them on Kubernetes.\nWrote SQL reports."
+REQUIREMENTS = ["Python", "Kubernetes"]
+
+def draft_score(overall_score=30, knockout_requirement=None, **verdicts):
+    """A draft verdict; each requirement maps to (match_status, evidence)."""
+    verdicts = {"Python": (True, "Built data pipelines in Python"), "Kubernetes": (False, "No direct evidence found in the resume."), **verdicts}
+    return ExplainableCandidateScore(name="Ada Lovelace", overall_score=overall_score, summary="Fits.", knockout_requirement=knockout_requirement,
+                                     requirement_analysis=[RequirementMatch(requirement=req, match_status=met, evidence=evidence)
+                                                           for req, (met, evidence) in verdicts.items()])
+
+def test_cascade_keys_change_with_the_weights():
+    cascade = ModelCascade([FakeChatModel(latency=0.0)])
+    llm = FakeChatModel(latency=0.0)
+    critical = {"Python": {"importance": "Critical", "knockout": False}}
+    normal = {"Python": {"importance": "Normal", "knockout": False}}
+    assert cascade.model_name(llm, critical) != cascade.model_name(llm, normal)
+    assert cascade.model_name(llm, critical) == cascade.model_name(llm, dict(critical))
+
+def test_confident_draft_verdicts_are_kept():
+    cascade = ModelCascade([], invite_threshold=75, margin=15)
+    assert cascade.escalation_reason(draft_score(Kubernetes=(True, "ran them on Kubernetes")), RESUME, ["Python"]) is None
+
+def test_borderline_scores_escalate():
+    cascade = ModelCascade([], invite_threshold=75, margin=15)
+    assert cascade.escalation_reason(draft_score(overall_score=60), RESUME, ["Python"]) == "borderline"
+    assert cascade.escalation_reason(draft_score(overall_score=59), RESUME, ["Python"]) is None
+
+def test_failed_knockouts_escalate():
+    cascade = ModelCascade([])
+    assert cascade.escalation_reason(draft_score(knockout_requirement="Python"), RESUME, ["Python"]) == "knockout"
+
+def test_evidence_missing_from_the_resume_escalates():
+    cascade = ModelCascade([])
+    invented = draft_score(Python=(True, "Led a Python guild of forty engineers at Google"))
+    assert cascade.escalation_reason(invented, RESUME, ["Python"]) == "uncertain"
+
+def test_missed_requirements_whose_key_terms_are_all_present_escalate():
+    cascade = ModelCascade([])
+    # Kubernetes is marked unmet although the resume names it.
+    assert cascade.escalation_reason(draft_score(), RESUME, REQUIREMENTS) == "uncertain"
+    assert cascade.escalation_reason(draft_score(), RESUME.replace("Kubernetes", "bare metal"), REQUIREMENTS) is None
+
+def test_escalated_resumes_are_scored_by_the_next_tier():
+    draft, final = FakeChatModel(latency=0.0, model_name="draft"), FakeChatModel(latency=0.0, model_name="final")
+    cascade = ModelCascade([draft])
+    verdicts = {"draft": draft_score(knockout_requirement="Python"), "final": draft_score(overall_score=10)}
+    score, name = cascade.score(lambda model: verdicts[model.model_name], RESUME, ["Python"], final)
+    assert (score.overall_score, name) == (10, "final")
+    assert cascade.summary()["escalations_by_reason"] == {"knockout": 1}
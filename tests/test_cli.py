@@ -0,0 +1,44 @@
+import json
+
+import cli
+from cache import ResultCache
+from fake_llm import FakeChatModel
+
+def run_cli(tmp_path, monkeypatch, failing=(), jd="Backend engineer: Python."):
+    """Runs the CLI over a.pdf, b.pdf and c.pdf; returns the paths it read. Resumes named in `failing` score as errors."""
+    read_paths = []
+
+    def fake_iter_resumes(directory, paths, cache, max_pages, timeout):
+        read_paths.extend(paths)
+        for path in paths:
+            yield {"text": f"Resume {path}", "filename": path, "sha256": path}
+
+    def fake_iter_scored_candidates(job_description, resumes, weighted_requirements, llm, **kwargs):
+        for res in resumes:
+            name = "Error: scoring failed" if res["filename"] in failing else "Ada Lovelace"
+            yield {"filename": res["filename"], "name": name, "overall_score": 0 if name.startswith("Error") else 80}
+
+    (tmp_path / "jd.txt").write_text(jd)
+    (tmp_path / "weights.json").write_text(json.dumps(["Python"]))
+    (tmp_path / "resumes").mkdir(exist_ok=True)
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        (tmp_path / "resumes" / name).write_bytes(b"")
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr(cli, "ChatGroq", lambda **kwargs: FakeChatModel(latency=0.0, model_name=kwargs["model"]))
+    monkeypatch.setattr(cli, "ResultCache", lambda: ResultCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(cli, "iter_resumes", fake_iter_resumes)
+    monkeypatch.setattr(cli, "iter_scored_candidates", fake_iter_scored_candidates)
+    assert cli.main(["--jd", str(tmp_path / "jd.txt"), "--weights", str(tmp_path / "weights.json"), "--resumes", str(tmp_path / "resumes"),
+                     "--output", str(tmp_path / "out.jsonl"), "--no-knockout-gate", "--metrics-file", ""]) == 0
+    return read_paths
+
+def test_restart_skips_scored_resumes_and_retries_errors(tmp_path, monkeypatch):
+    assert run_cli(tmp_path, monkeypatch, failing={"b.pdf"}) == ["a.pdf", "b.pdf", "c.pdf"]
+    assert run_cli(tmp_path, monkeypatch) == ["b.pdf"]
+    assert run_cli(tmp_path, monkeypatch) == []
+    records = [json.loads(line) for line in (tmp_path / "out.jsonl").read_text().splitlines()]
+    assert [(r["filename"], r["name"].startswith("Error")) for r in records] == [("a.pdf", False), ("b.pdf", True), ("c.pdf", False), ("b.pdf", False)]
+
+def test_a_different_run_scores_every_resume_again(tmp_path, monkeypatch):
+    run_cli(tmp_path, monkeypatch)
+    assert run_cli(tmp_path, monkeypatch, jd="Data engineer: Spark.") == ["a.pdf", "b.pdf", "c.pdf"]
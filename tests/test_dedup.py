@@ -0,0 +1,46 @@
+import numpy as np
+
+from dedup import NUM_BANDS, NUM_PERMUTATIONS, NearDuplicateIndex, minhash_signature
+
+def _resume(i):
+    return "\n".join(f"Candidate {i} line {n}: built service {i * 100 + n} with Python, Kafka and PostgreSQL." for n in range(40))
+
+def _estimate(a, b):
+    return float(np.mean(minhash_signature(a) == minhash_signature(b)))
+
+def test_reformatted_copy_is_a_duplicate_of_the_first_upload():
+    index = NearDuplicateIndex()
+    assert index.add("a.pdf", _resume(1)) is None
+    assert index.add("b.pdf", _resume(1).upper().replace("\n", "  \n ")) == "a.pdf"
+    assert list(index.signatures) == ["a.pdf"]
+
+def test_unrelated_resumes_are_kept_apart():
+    index = NearDuplicateIndex()
+    assert [index.add(f"{i}.pdf", _resume(i)) for i in range(5)] == [None] * 5
+
+def test_threshold_decides_borderline_pairs():
+    original = _resume(1)
+    edited = "\n".join(original.splitlines()[:30] + _resume(2).splitlines()[30:])
+    similarity = _estimate(original, edited)
+    assert 0.6 < similarity < 0.8
+    strict, loose = NearDuplicateIndex(threshold=0.8), NearDuplicateIndex(threshold=similarity - 0.05)
+    for index in (strict, loose):
+        index.add("original.pdf", original)
+    assert strict.add("edited.pdf", edited) is None
+    assert loose.add("edited.pdf", edited) == "original.pdf"
+
+def test_only_representatives_sharing_an_lsh_band_are_compared():
+    index = NearDuplicateIndex(threshold=0.0)
+    index.add("a.pdf", _resume(1))
+    signature = minhash_signature(_resume(1))
+    assert signature.shape == (NUM_PERMUTATIONS,)
+    assert all(bucket == {band: ["a.pdf"]} for band, bucket in zip(index._bands(signature), index.buckets))
+    assert len(index.buckets) == NUM_BANDS
+    # With a zero threshold any compared pair would match, so no match means no shared band.
+    assert index.add("b.pdf", "Completely different words about gardening, pottery and sailing on weekends.") is None
+
+def test_empty_text_is_never_a_duplicate():
+    index = NearDuplicateIndex()
+    assert index.add("a.pdf", "") is None
+    assert index.add("b.pdf", "") is None
+    assert index.signatures == {}
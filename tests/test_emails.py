@@ -0,0 +1,26 @@
+from langchain_core.messages import AIMessage
+
+import utils
+from scheduler import RateLimiter
+
+CANDIDATES = [{"name": "Ada", "overall_score": 90}, {"name": "Bob", "overall_score": 40}]
+
+def test_personalized_emails_wait_on_the_limiter_and_retry_rate_limits(monkeypatch):
+    calls = []
+
+    def fake_call_llm(llm, prompt, input_data, response_model=None, stage="other"):
+        calls.append(input_data["name"])
+        if len(calls) == 1:
+            raise RuntimeError("Error code: 429 - rate limit exceeded")
+        return AIMessage(content=f"Dear {input_data['name']}")
+
+    monkeypatch.setattr(utils, "call_llm", fake_call_llm)
+    limiter = RateLimiter(base_backoff=0.01)
+    acquired = []
+    monkeypatch.setattr(limiter, "acquire", lambda tokens=1: acquired.append(tokens))
+    result = utils.generate_email_templates(CANDIDATES, {"title": "Engineer"}, 1, 50, "Monday", llm=None, personalized=True,
+                                            max_concurrency=1, limiter=limiter)
+    assert [e["email_body"] for e in result["invitations"] + result["rejections"]] == ["Dear Ada", "Dear Bob"]
+    assert result["failed"] == []
+    assert len(acquired) == len(calls) == 3
+    assert limiter.cooldown_until > 0
@@ -0,0 +1,44 @@
+import os
+import time
+
+import ingestion
+from cache import ResultCache
+from ingestion import ExtractionPool, iter_extracted_texts
+
+def _fake_extract(data: bytes, max_pages: int):
+    """Stands in for PDF parsing in the worker: b"hang" never finishes, b"once:<path>" hangs only on its first attempt."""
+    command, _, arg = data.decode().partition(":")
+    if command == "hang":
+        time.sleep(60)
+    elif command == "once":
+        if not os.path.exists(arg):
+            open(arg, "w").close()
+            time.sleep(60)
+    elif command == "slow":
+        time.sleep(float(arg))
+    return f"text of {data.decode()}", 0.0
+
+def test_timed_out_file_is_skipped_and_in_flight_files_are_requeued(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "_extract_from_bytes", _fake_extract)
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    once = f"once:{tmp_path / 'started'}".encode()
+    files = [("hang.pdf", b"hang"), ("slow.pdf", b"slow:0.5"), ("once.pdf", once)]
+    with ExtractionPool(max_workers=2) as pool:
+        # Warm the workers up so start-up time does not count against the deadlines below.
+        assert [res["text"] for res in iter_extracted_texts([("warm.pdf", b"warm")], pool=pool)] == ["text of warm"]
+        # once.pdf starts after slow.pdf, so it is still running when hang.pdf times out and the pool is replaced.
+        results = {res["filename"]: res["text"] for res in iter_extracted_texts(files, cache=cache, timeout=2.0, pool=pool)}
+    assert results == {"hang.pdf": "", "slow.pdf": "text of slow:0.5", "once.pdf": f"text of {once.decode()}"}
+    assert cache.stats()["entries"] == 2
+
+def test_cached_texts_skip_the_pool_and_a_shared_pool_outlives_each_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "_extract_from_bytes", _fake_extract)
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"))
+    with ExtractionPool(max_workers=1) as pool:
+        first = list(iter_extracted_texts([("a.pdf", b"a")], cache=cache, pool=pool))
+        workers = pool.get()
+        second = list(iter_extracted_texts([("copy.pdf", b"a"), ("b.pdf", b"b")], cache=cache, pool=pool))
+        assert pool.get() is workers
+    assert first == [{"text": "text of a", "filename": "a.pdf", "sha256": ingestion.file_sha256(b"a")}]
+    assert [(res["filename"], res["text"]) for res in second] == [("copy.pdf", "text of a"), ("b.pdf", "text of b")]
+    assert cache.stats()["hits"] == 1
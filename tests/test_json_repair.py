@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+
+import utils
+from json_repair import repair_json_locally
+from utils import ExplainableCandidateScore, check_requirement_coverage, parse_llm_json
+
+def _validate(data):
+    return ExplainableCandidateScore(**data)
+
+def _reply(analysis):
+    return json.dumps({"name": "Ada Lovelace", "summary": "Strong fit.", "requirement_analysis": analysis})
+
+def test_complete_json_that_fails_validation_is_not_cut_back():
+    reply = _reply([
+        {"requirement": "Python", "match_status": True, "evidence": "Python for 5 years"},
+        {"requirement": "Kafka", "match_status": "partially", "evidence": "Some streaming"},
+        {"requirement": "SQL", "match_status": True, "evidence": "PostgreSQL tuning"},
+    ])
+    assert repair_json_locally(reply, validate=_validate) is None
+
+def test_truncated_json_is_cut_back_to_last_complete_element():
+    complete = _reply([
+        {"requirement": "Python", "match_status": True, "evidence": "Python for 5 years"},
+        {"requirement": "SQL", "match_status": True, "evidence": "PostgreSQL tuning"},
+    ])
+    truncated = complete[:complete.index('"match_status"', complete.index("SQL")) + 6]
+    repaired = repair_json_locally(truncated, validate=_validate)
+    assert [m["requirement"] for m in repaired["requirement_analysis"]] == ["Python"]
+
+def test_prose_newlines_and_trailing_commas_are_repaired():
+    reply = 'Sure! Here it is:\n{"name": "Ada", "summary": "Line one\nline two", "requirement_analysis": [],}\nThanks'
+    repaired = repair_json_locally(reply, validate=_validate)
+    assert repaired["summary"] == "Line one\nline two"
+
+def test_string_booleans_and_scores_are_coerced():
+    repaired = repair_json_locally('{"overall_score": "85", "match_status": "yes"}')
+    assert repaired == {"overall_score": 85, "match_status": True}
+
+KNOCKOUT_WEIGHTS = {
+    "Python": {"importance": "Critical", "knockout": False},
+    "SQL": {"importance": "Important", "knockout": False},
+    "AWS": {"importance": "Critical", "knockout": True},
+}
+
+def _scoring_reply():
+    return _reply([
+        {"requirement": "Python", "match_status": True, "evidence": "Python for 5 years"},
+        {"requirement": "SQL", "match_status": True, "evidence": "PostgreSQL tuning"},
+        {"requirement": "AWS", "match_status": True, "evidence": "Ran services on AWS"},
+    ])
+
+def _truncated_in_knockout_verdict():
+    reply = _scoring_reply()
+    return reply[:reply.index('"match_status"', reply.index('"AWS"')) + 6]
+
+def test_repaired_parse_rejects_a_reply_cut_back_past_a_requirement():
+    with pytest.raises(ValueError):
+        parse_llm_json(_truncated_in_knockout_verdict(), ExplainableCandidateScore,
+                       validate_repair=lambda score: check_requirement_coverage(score, list(KNOCKOUT_WEIGHTS)))
+
+def test_truncated_knockout_verdict_is_repaired_by_the_llm_not_scored_as_a_gap(monkeypatch):
+    replies = {"scoring": _truncated_in_knockout_verdict(), "json_repair": _scoring_reply()}
+    monkeypatch.setattr(utils, "call_llm", lambda llm, prompt, data, response_model=None, stage="other": AIMessage(content=replies[stage]))
+    score = utils.score_candidate_explainable("jd", "Ada Lovelace\nPython, PostgreSQL and AWS.", KNOCKOUT_WEIGHTS, llm=object())
+    assert (score.overall_score, score.knockout_requirement) == (100, None)
@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import pytest
+from langchain_core.messages import AIMessage
+
+import knockout
+from knockout import KnockoutGate
+
+WEIGHTS = {
+    "Python": {"importance": "Critical", "knockout": False},
+    "AWS": {"importance": "Critical", "knockout": True},
+}
+
+class CloudEmbeddings:
+    """Puts "AWS" texts on one axis; texts about "cloud" sit at 0.7 similarity to it, anything else at 0."""
+
+    def embed_documents(self, texts):
+        vectors = []
+        for text in texts:
+            lowered = text.lower()
+            similarity = 1.0 if "aws" in lowered else 0.7 if "cloud" in lowered else 0.0
+            vectors.append([similarity, float(np.sqrt(1 - similarity ** 2))])
+        return vectors
+
+class RecordingLLM:
+    def __init__(self, reply=None, error=None):
+        self.reply, self.error, self.prompts = reply, error, []
+
+@pytest.fixture
+def llm(monkeypatch):
+    model = RecordingLLM(reply={"met": False, "evidence": "Only on-premise hosting."})
+
+    def fake_call_llm(llm, prompt, input_data, response_model=None, stage="other"):
+        llm.prompts.append(input_data)
+        if llm.error:
+            raise llm.error
+        return AIMessage(content=json.dumps(llm.reply))
+
+    monkeypatch.setattr(knockout, "get_embeddings", lambda: CloudEmbeddings())
+    monkeypatch.setattr(knockout, "call_llm", fake_call_llm)
+    return model
+
+def _resume(text):
+    return {"text": f"Ada Lovelace\n{text}", "filename": "ada.pdf"}
+
+def test_a_resume_with_every_key_term_passes_without_the_model(llm):
+    assert KnockoutGate(WEIGHTS, llm).check(_resume("Ran Python services on AWS.")) is None
+    assert llm.prompts == []
+
+def test_no_key_terms_and_no_similar_passage_is_a_clear_fail(llm):
+    result = KnockoutGate(WEIGHTS, llm).check(_resume("Java developer, on-premise datacentres."))
+    assert (result["knockout_requirement"], result["knocked_out_early"], result["overall_score"]) == ("AWS", True, 0)
+    assert llm.prompts == []
+
+def test_an_ambiguous_resume_is_put_to_the_small_model(llm):
+    gate = KnockoutGate(WEIGHTS, llm)
+    result = gate.check(_resume("Deployed services to the cloud."))
+    assert len(llm.prompts) == 1 and "cloud" in llm.prompts[0]["excerpts"]
+    assert result["requirement_analysis"] == [{"requirement": "AWS", "match_status": False, "evidence": "Only on-premise hosting."}]
+    llm.reply = {"met": True, "evidence": "Deployed services to the cloud."}
+    assert gate.check(_resume("Moved services to the cloud.")) is None
+
+def test_ambiguous_resumes_go_on_to_full_scoring_without_a_model(llm):
+    assert KnockoutGate(WEIGHTS).check(_resume("Deployed services to the cloud.")) is None
+
+def test_a_model_failure_sends_the_resume_on_to_full_scoring(llm):
+    llm.error = RuntimeError("503 Service Unavailable")
+    assert KnockoutGate(WEIGHTS, llm).check(_resume("Deployed services to the cloud.")) is None
+
+def test_an_embedding_failure_never_eliminates_on_keywords_alone(llm, monkeypatch):
+    def broken():
+        raise RuntimeError("model download failed")
+
+    monkeypatch.setattr(knockout, "get_embeddings", broken)
+    assert KnockoutGate(WEIGHTS, llm).check(_resume("Java developer, on-premise datacentres.")) is None
+    assert llm.prompts == []
+
+def test_without_knockout_requirements_the_gate_is_off():
+    gate = KnockoutGate({"Python": {"importance": "Critical", "knockout": False}})
+    assert not gate and gate.check(_resume("Anything.")) is None
@@ -0,0 +1,55 @@
+from leaderboard import KNOCKOUT_FILTERS, filter_candidates, page_count, paginate
+from session_store import SessionStore, compact_candidates
+
+REQUIREMENTS = ["Python", "AWS", "Kafka"]
+
+def candidate(name, score, met, knockout_requirement=None):
+    return {"name": name, "overall_score": score, "filename": f"{name.lower()}.pdf", "summary": f"{name} summary.",
+            "knockout_requirement": knockout_requirement,
+            "requirement_analysis": [{"requirement": req, "match_status": req in met, "evidence": "..."} for req in REQUIREMENTS]}
+
+CANDIDATES = [
+    candidate("Ada", 90, {"Python", "AWS", "Kafka"}),
+    candidate("Grace", 70, {"Python", "Kafka"}),
+    candidate("Linus", 40, {"AWS"}),
+    candidate("Alan", 0, {"Python"}, knockout_requirement="AWS"),
+]
+
+def names(candidates):
+    return [c["name"] for c in candidates]
+
+def test_score_range_is_inclusive():
+    assert names(filter_candidates(CANDIDATES, score_range=(40, 70))) == ["Grace", "Linus"]
+    assert names(filter_candidates(CANDIDATES)) == ["Ada", "Grace", "Linus", "Alan"]
+
+def test_knockout_filters():
+    assert names(filter_candidates(CANDIDATES, knockout_filter=KNOCKOUT_FILTERS[1])) == ["Ada", "Grace", "Linus"]
+    assert names(filter_candidates(CANDIDATES, knockout_filter=KNOCKOUT_FILTERS[2])) == ["Alan"]
+
+def test_required_requirements_must_all_be_met():
+    assert names(filter_candidates(CANDIDATES, required=["Python"], requirements=REQUIREMENTS)) == ["Ada", "Grace", "Alan"]
+    assert names(filter_candidates(CANDIDATES, required=["Python", "Kafka"], requirements=REQUIREMENTS)) == ["Ada", "Grace"]
+    # A requirement that is no longer weighted does not filter anyone out.
+    assert names(filter_candidates(CANDIDATES, required=["Go"], requirements=REQUIREMENTS)) == names(CANDIDATES)
+
+def test_filters_combine():
+    assert names(filter_candidates(CANDIDATES, score_range=(50, 100), knockout_filter=KNOCKOUT_FILTERS[1],
+                                   required=["AWS"], requirements=REQUIREMENTS)) == ["Ada"]
+
+def test_compact_candidates_filter_without_loading_spilled_fields(tmp_path, monkeypatch):
+    store = SessionStore(directory=str(tmp_path))
+    compact = compact_candidates(CANDIDATES, store)
+    reads = []
+    original_get = store.get
+    monkeypatch.setattr(store, "get", lambda kind, key: reads.append(kind) or original_get(kind, key))
+    assert names(filter_candidates(compact, score_range=(1, 100), knockout_filter=KNOCKOUT_FILTERS[1],
+                                   required=["Python", "Kafka"], requirements=REQUIREMENTS)) == ["Ada", "Grace"]
+    assert reads == []
+
+def test_pages_are_sliced_and_clamped():
+    items = list(range(7))
+    assert [paginate(items, page, 3) for page in (1, 2, 3)] == [[0, 1, 2], [3, 4, 5], [6]]
+    assert paginate(items, 9, 3) == [6] and paginate(items, 0, 3) == [0, 1, 2]
+
+def test_page_count_is_at_least_one():
+    assert (page_count(0, 10), page_count(10, 10), page_count(11, 10)) == (1, 1, 2)
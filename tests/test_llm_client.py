@@ -0,0 +1,122 @@
+import gc
+import threading
+import time
+import weakref
+from typing import Any, List
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import llm_client
+from fake_llm import FakeChatModel
+from llm_client import LLMCallError, LLMClient, configure_llm_client, get_llm_client
+from utils import extract_key_requirements
+
+PROMPT = "Say hi to {name}."
+
+class ScriptedChatModel(BaseChatModel):
+    """Raises the queued errors one call at a time, then answers "ok"."""
+    errors: List[Any] = []
+    delay: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = []
+
+    def acquire(self, estimated_tokens: int = 1) -> None:
+        self.acquired.append(estimated_tokens)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(llm_client.time, "sleep", delays.append)
+    return delays
+
+def unavailable():
+    return RuntimeError("Error code: 503 - service unavailable")
+
+def rate_limited():
+    return RuntimeError("Error code: 429 - rate limit reached for requests")
+
+def test_transient_errors_are_retried_with_growing_backoff_through_the_limiter(sleeps):
+    llm = ScriptedChatModel(errors=[unavailable(), unavailable()])
+    limiter = CountingLimiter()
+    client = LLMClient([llm], base_backoff=1.0, limiter=limiter)
+    assert client.invoke(PROMPT, {"name": "Ada"}).content == "ok"
+    assert llm.calls == 3
+    assert 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0
+    # The caller admitted the first attempt; each retry waits for the limiter.
+    assert len(limiter.acquired) == 2
+
+def test_gives_up_after_max_attempts(sleeps):
+    llm = ScriptedChatModel(errors=[unavailable() for _ in range(3)])
+    with pytest.raises(LLMCallError) as raised:
+        LLMClient([llm], max_attempts=3).invoke(PROMPT, {"name": "Ada"})
+    assert raised.value.transient and llm.calls == 3 and len(sleeps) == 2
+
+def test_non_transient_errors_are_not_retried(sleeps):
+    llm = ScriptedChatModel(errors=[ValueError("bad request")])
+    with pytest.raises(LLMCallError) as raised:
+        LLMClient([llm]).invoke(PROMPT, {"name": "Ada"})
+    assert not raised.value.transient and llm.calls == 1 and sleeps == []
+
+def test_fails_over_to_the_backup_model_through_the_limiter(sleeps):
+    primary, backup = ScriptedChatModel(errors=[rate_limited()]), ScriptedChatModel()
+    limiter = CountingLimiter()
+    assert LLMClient([primary, backup], limiter=limiter).invoke(PROMPT, {"name": "Ada"}).content == "ok"
+    assert (primary.calls, backup.calls, len(limiter.acquired), sleeps) == (1, 1, 1, [])
+
+def test_rate_limits_on_every_model_are_raised_at_once(sleeps):
+    primary, backup = ScriptedChatModel(errors=[rate_limited()]), ScriptedChatModel(errors=[rate_limited()])
+    with pytest.raises(LLMCallError) as raised:
+        LLMClient([primary, backup]).invoke(PROMPT, {"name": "Ada"})
+    assert raised.value.transient and sleeps == []
+
+def test_identical_calls_in_flight_share_one_request():
+    llm = ScriptedChatModel(delay=0.3)
+    client = LLMClient([llm])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.invoke(PROMPT, {"name": "Ada"}).content)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["ok"] * 3
+    assert llm.calls == 1
+    assert client.invoke(PROMPT, {"name": "Grace"}).content == "ok" and llm.calls == 2
+
+def test_clients_do_not_keep_models_alive():
+    llm = FakeChatModel(latency=0.0)
+    configure_llm_client(llm, max_attempts=2)
+    assert get_llm_client(llm).max_attempts == 2
+    ref = weakref.ref(llm)
+    del llm
+    gc.collect()
+    assert ref() is None
+
+def test_a_copied_model_gets_its_own_client():
+    llm = FakeChatModel(latency=0.0)
+    configure_llm_client(llm, max_attempts=2)
+    copy = llm.model_copy()
+    assert get_llm_client(copy).llms == [copy]
+    assert get_llm_client(llm).max_attempts == 2
+
+def test_structured_output_is_parsed_into_the_schema():
+    # Structured output is schema-enforced, so even a model that garbles plain JSON replies answers cleanly.
+    llm = FakeChatModel(latency=0.0, malformed_rate=1.0, key_requirements=["Python", "Kafka"])
+    assert extract_key_requirements("Backend engineer: Python and Kafka.", llm) == ["Python", "Kafka"]
@@ -0,0 +1,11 @@
+from metrics import MetricsRegistry
+
+def test_prometheus_values_keep_full_precision():
+    registry = MetricsRegistry()
+    registry.inc("recruitx_llm_tokens_total", 1234567, model="m")
+    registry.set_gauge("recruitx_session_bytes", 0.1 + 0.2)
+    registry.observe("recruitx_stage_seconds", 1234.5678901, stage="scoring")
+    lines = registry.to_prometheus().splitlines()
+    assert 'recruitx_llm_tokens_total{model="m"} 1234567' in lines
+    assert "recruitx_session_bytes 0.30000000000000004" in lines
+    assert 'recruitx_stage_seconds_sum{stage="scoring"} 1234.5678901' in lines
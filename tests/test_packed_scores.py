@@ -0,0 +1,35 @@
+import json
+
+from json_repair import get_json_repair_stats
+from utils import parse_packed_scores
+
+WEIGHTS = {"Python": {"importance": "Critical", "knockout": False}, "SQL": {"importance": "Important", "knockout": False}}
+
+def _entry(resume_id, name):
+    return {"resume_id": resume_id, "name": name, "summary": "Fits.", "requirement_analysis": [
+        {"requirement": "Python", "match_status": True, "evidence": "Python"},
+        {"requirement": "SQL", "match_status": False, "evidence": "No direct evidence"},
+    ]}
+
+def _delta(before, after):
+    return {outcome: after[outcome] - before[outcome] for outcome in after if after[outcome] != before[outcome]}
+
+def test_clean_reply_is_recorded_as_parsed():
+    before = get_json_repair_stats()
+    results = parse_packed_scores(json.dumps({"candidates": [_entry("R1", "Ada"), _entry("R2", "Bob")]}), ["R1", "R2"], WEIGHTS)
+    assert sorted(results) == ["R1", "R2"]
+    assert _delta(before, get_json_repair_stats()) == {"parsed": 1}
+
+def test_repaired_reply_is_recorded_as_a_local_repair():
+    reply = json.dumps({"candidates": [_entry("R1", "Ada"), _entry("R2", "Bob")]})
+    truncated = reply[:reply.index('"Bob"')]
+    before = get_json_repair_stats()
+    results = parse_packed_scores(truncated, ["R1", "R2"], WEIGHTS)
+    assert list(results) == ["R1"]
+    assert _delta(before, get_json_repair_stats()) == {"local_repairs": 1}
+
+def test_entries_that_skip_a_requirement_or_repeat_an_id_are_dropped():
+    partial = _entry("R2", "Bob")
+    partial["requirement_analysis"].pop()
+    reply = json.dumps([_entry("R1", "Ada"), _entry("R1", "Ada again"), partial, _entry("R9", "Unknown")])
+    assert parse_packed_scores(reply, ["R1", "R2"], WEIGHTS) == {}
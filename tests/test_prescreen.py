@@ -0,0 +1,30 @@
+import numpy as np
+
+import prescreen
+from prescreen import aggregate_similarity, prescreen_candidates
+
+WEIGHTS = {"Python": {"importance": "Critical", "knockout": False}, "SQL": {"importance": "Important", "knockout": False}}
+SIMILARITY = np.array([[0.9, 0.1], [0.2, 0.9], [0.5, 0.5]], dtype=np.float32)
+RESUMES = [{"text": f"Person {i}\nEngineer.", "filename": f"{i}.pdf"} for i in range(3)]
+
+def _fixed_similarity(monkeypatch):
+    monkeypatch.setattr(prescreen, "compute_requirement_similarity", lambda resumes, requirements, talent_pool=None: SIMILARITY)
+
+def test_similarity_is_weighted_by_importance():
+    assert np.allclose(aggregate_similarity(SIMILARITY, WEIGHTS), [60.0, 46.25, 50.0])
+
+def test_top_k_keeps_the_best_ranked_resumes(monkeypatch):
+    _fixed_similarity(monkeypatch)
+    shortlisted, screened_out = prescreen_candidates(RESUMES, WEIGHTS, top_k=2)
+    assert [(r["filename"], r["similarity_score"]) for r in shortlisted] == [("0.pdf", 60.0), ("2.pdf", 50.0)]
+    assert [(c["filename"], c["screened_out"], c["requirement_similarity"]) for c in screened_out] == [("1.pdf", True, {"Python": 20.0, "SQL": 90.0})]
+
+def test_threshold_and_top_k_must_both_pass(monkeypatch):
+    _fixed_similarity(monkeypatch)
+    shortlisted, screened_out = prescreen_candidates(RESUMES, WEIGHTS, top_k=2, threshold=55)
+    assert [r["filename"] for r in shortlisted] == ["0.pdf"]
+    assert [c["filename"] for c in screened_out] == ["2.pdf", "1.pdf"]
+
+def test_without_a_cutoff_every_resume_is_kept(monkeypatch):
+    monkeypatch.setattr(prescreen, "compute_requirement_similarity", lambda *args, **kwargs: 1 / 0)
+    assert prescreen_candidates(RESUMES, WEIGHTS) == (RESUMES, [])
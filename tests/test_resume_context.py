@@ -0,0 +1,58 @@
+import pytest
+
+import utils
+from utils import build_resume_context, estimate_tokens
+
+TOPICS = ("python", "aws", "kafka", "sql")
+
+class TopicEmbeddings:
+    """One axis per topic word, counting its mentions, plus a small constant axis so topic-free texts still have a direction."""
+
+    def embed_documents(self, texts):
+        return [[text.lower().count(topic) for topic in TOPICS] + [0.01] for text in texts]
+
+def paragraph(text):
+    """A paragraph of about 100 tokens, long enough to be a context chunk of its own."""
+    return (text + " ") * (400 // (len(text) + 1))
+
+OPENING = paragraph("Ada Lovelace, London, ada@example.com")
+# Most to least about Python: the SQL mentions pull the later ones away from it.
+PYTHON = [paragraph("Python services"), paragraph("Python and SQL reports"), paragraph("Python, SQL and SQL dashboards")]
+AWS = paragraph("Ran AWS infrastructure")
+KAFKA = paragraph("Kafka streaming pipelines")
+RESUME = "\n\n".join([OPENING, *PYTHON, AWS, KAFKA])
+
+@pytest.fixture(autouse=True)
+def embeddings(monkeypatch):
+    monkeypatch.setattr(utils, "get_embeddings", lambda: TopicEmbeddings())
+    utils._embed_requirements.cache_clear()
+    yield
+    utils._embed_requirements.cache_clear()
+
+def chunk_budget(count):
+    """Tokens for the opening chunk plus `count` more, with their separators."""
+    return estimate_tokens(OPENING) + count * (estimate_tokens(PYTHON[0]) + utils.CONTEXT_SEPARATOR_TOKENS)
+
+def test_short_resumes_are_returned_whole():
+    assert build_resume_context("Ada Lovelace. Python.", ["Python"], token_budget=100) == "Ada Lovelace. Python."
+
+def test_context_stays_within_the_token_budget_and_keeps_the_opening_chunk():
+    context = build_resume_context(RESUME, ["Kafka"], token_budget=chunk_budget(1))
+    assert estimate_tokens(context) <= chunk_budget(1)
+    assert context.split("\n...\n") == [OPENING.strip(), KAFKA.strip()]
+
+def test_each_requirement_claims_its_best_chunk_in_turn():
+    context = build_resume_context(RESUME, ["Python", "AWS", "Kafka"], token_budget=chunk_budget(3))
+    # One chunk per requirement, not the three most Python-heavy ones; chunks keep their resume order.
+    assert context.split("\n...\n") == [OPENING.strip(), PYTHON[0].strip(), AWS.strip(), KAFKA.strip()]
+
+def test_leftover_budget_goes_round_the_requirements_again():
+    context = build_resume_context(RESUME, ["Python", "AWS"], token_budget=chunk_budget(3))
+    assert context.split("\n...\n") == [OPENING.strip(), PYTHON[0].strip(), PYTHON[1].strip(), AWS.strip()]
+
+def test_embedding_failures_fall_back_to_truncation(monkeypatch):
+    def broken():
+        raise RuntimeError("embedding service down")
+
+    monkeypatch.setattr(utils, "get_embeddings", broken)
+    assert build_resume_context(RESUME, ["Python"], token_budget=50) == RESUME[:200]
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+import scheduler
+from scheduler import PackedScorer, RateLimiter, TokenBucket
+from utils import ExplainableCandidateScore
+from fake_llm import FakeChatModel
+
+WEIGHTS = {"Python": {"importance": "Critical", "knockout": False}}
+
+def test_token_bucket_waits_once_its_capacity_is_spent(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(2) == 2.0
+    now[0] += 2
+    assert bucket.reserve(1) == 1.0
+
+def test_a_rate_limit_pauses_every_worker_and_doubles_the_backoff(monkeypatch):
+    now, slept = [100.0], []
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(scheduler.time, "sleep", slept.append)
+    limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=10 ** 6, base_backoff=1.0, max_backoff=4.0)
+    limiter.record_rate_limit(retry_after=3.0)
+    limiter.acquire()
+    assert slept == [3.0]
+    limiter.record_rate_limit()
+    limiter.record_rate_limit()
+    assert limiter.backoff == 4.0
+    limiter.record_success()
+    assert limiter.backoff == 2.0
+
+def _no_waiting(monkeypatch):
+    monkeypatch.setattr(scheduler.time, "sleep", lambda seconds: None)
+
+def test_calls_are_retried_on_rate_limits_only(monkeypatch):
+    _no_waiting(monkeypatch)
+    limiter = RateLimiter(base_backoff=0.01)
+    replies = iter([RuntimeError("Error code: 429"), RuntimeError("Error code: 429"), "ok"])
+
+    def flaky():
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    assert limiter.call(flaky, stage="scoring") == "ok"
+    with pytest.raises(ValueError):
+        limiter.call(lambda: int("not a number"))
+
+def test_the_last_rate_limit_is_raised(monkeypatch):
+    _no_waiting(monkeypatch)
+    attempts = []
+
+    def always_limited():
+        attempts.append(1)
+        raise RuntimeError("rate limit exceeded")
+
+    with pytest.raises(RuntimeError):
+        RateLimiter(base_backoff=0.01).call(always_limited, max_retries=2)
+    assert len(attempts) == 3
+
+def _score(name):
+    return ExplainableCandidateScore(name=name, overall_score=0, summary="Fits.",
+                                     requirement_analysis=[{"requirement": "Python", "match_status": True, "evidence": "Python"}])
+
+def _score_concurrently(packer, resumes):
+    llm, limiter = FakeChatModel(latency=0.0), RateLimiter()
+    results = {}
+    threads = [threading.Thread(target=lambda res=res: results.__setitem__(res["filename"], packer.score(res, llm, limiter))) for res in resumes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_resumes_share_one_packed_request(monkeypatch):
+    calls = []
+
+    def fake_packed(job_description, resumes, weighted_requirements, llm):
+        calls.append([resume_id for resume_id, _ in resumes])
+        # The model dropped the last entry; that resume should be scored alone.
+        return {resume_id: _score(text.split()[0]) for resume_id, text in resumes[:-1]}
+
+    monkeypatch.setattr(scheduler, "score_candidates_packed", fake_packed)
+    resumes = [{"text": f"Person{i} writes Python.", "filename": f"{i}.pdf"} for i in range(3)]
+    results = _score_concurrently(PackedScorer("jd", WEIGHTS, max_resumes=3, linger=5.0), resumes)
+    assert calls == [["R1", "R2", "R3"]]
+    assert sum(score is None for score in results.values()) == 1
+    assert all(score.name == f"Person{filename[0]}" for filename, score in results.items() if score)
+
+def test_a_lone_resume_or_failed_pack_is_scored_alone(monkeypatch):
+    monkeypatch.setattr(scheduler, "score_candidates_packed", lambda *args: 1 / 0)
+    resumes = [{"text": f"Person{i} writes Python.", "filename": f"{i}.pdf"} for i in range(2)]
+    assert _score_concurrently(PackedScorer("jd", WEIGHTS, linger=0.0), resumes[:1]) == {"0.pdf": None}
+    assert _score_concurrently(PackedScorer("jd", WEIGHTS, max_resumes=2, linger=5.0), resumes) == {"0.pdf": None, "1.pdf": None}
+
+def test_only_short_resumes_are_packed():
+    packer = PackedScorer("jd", WEIGHTS)
+    assert packer.accepts({"text": "Short resume.", "filename": "a.pdf"})
+    assert not packer.accepts({"text": "word " * 5000, "filename": "b.pdf"})
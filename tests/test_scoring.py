@@ -0,0 +1,53 @@
+import numpy as np
+
+from utils import compute_scores, requirement_match_flags, rescore_candidates
+
+WEIGHTS = {
+    "Python": {"importance": "Critical", "knockout": False},
+    "SQL": {"importance": "Important", "knockout": False},
+    "Docker": {"importance": "Normal", "knockout": False},
+}
+
+def _analysis(*met):
+    return [{"requirement": req, "match_status": req in met, "evidence": "..."} for req in WEIGHTS]
+
+def test_each_gap_deducts_its_importance_penalty():
+    scores, knockouts = compute_scores(np.array([[1, 1, 1], [0, 1, 1], [1, 0, 0], [0, 0, 0]], dtype=bool), WEIGHTS)
+    assert scores.tolist() == [100, 75, 80, 55]
+    assert knockouts.tolist() == [-1, -1, -1, -1]
+
+def test_scores_are_clipped_at_zero():
+    weights = {f"R{i}": {"importance": "Critical", "knockout": False} for i in range(5)}
+    scores, _ = compute_scores(np.zeros((1, 5), dtype=bool), weights)
+    assert scores.tolist() == [0]
+
+def test_a_failed_knockout_zeroes_the_score_and_names_the_first_one():
+    weights = {**WEIGHTS, "SQL": {"importance": "Important", "knockout": True}, "Docker": {"importance": "Normal", "knockout": True}}
+    scores, knockouts = compute_scores(np.array([[1, 0, 0], [1, 1, 0], [1, 1, 1]], dtype=bool), weights)
+    assert scores.tolist() == [0, 0, 100]
+    assert knockouts.tolist() == [1, 2, -1]
+
+def test_match_flags_follow_requirement_order_whatever_the_reply_order():
+    analysis = list(reversed(_analysis("Python", "Docker")))
+    assert requirement_match_flags(analysis, list(WEIGHTS)) == [True, False, True]
+
+def test_match_flags_ignore_case_and_spacing_of_requirement_names():
+    analysis = [{"requirement": "  python ", "match_status": True, "evidence": "..."}]
+    assert requirement_match_flags(analysis, ["Python", "SQL"]) == [True, False]
+
+def test_match_flags_fall_back_to_position_when_names_were_reworded():
+    analysis = [{"requirement": f"Reworded {i}", "match_status": i != 1, "evidence": "..."} for i in range(3)]
+    assert requirement_match_flags(analysis, list(WEIGHTS)) == [True, False, True]
+
+def test_rescoring_applies_new_weights_and_reranks_without_touching_unscored_entries():
+    candidates = [
+        {"name": "Ada", "overall_score": 0, "requirement_analysis": _analysis("Python")},
+        {"name": "Bob", "overall_score": 0, "requirement_analysis": _analysis("SQL", "Docker")},
+        {"name": "Error: broken.pdf", "overall_score": 0, "requirement_analysis": []},
+        {"name": "Cy", "overall_score": 12, "screened_out": True, "similarity_score": 40.0, "requirement_analysis": []},
+    ]
+    ranked = rescore_candidates(candidates, WEIGHTS)
+    assert [(c["name"], c["overall_score"]) for c in ranked] == [("Ada", 80), ("Bob", 75), ("Error: broken.pdf", 0), ("Cy", 12)]
+    python_required = {**WEIGHTS, "Python": {"importance": "Critical", "knockout": True}}
+    ranked = rescore_candidates(candidates, python_required)
+    assert [(c["name"], c["overall_score"], c["knockout_requirement"]) for c in ranked[:2]] == [("Ada", 80, None), ("Bob", 0, "Python")]
@@ -0,0 +1,68 @@
+import gc
+import os
+
+import pytest
+
+from session_store import CompactCandidate, SessionStore, compact_candidates, spill_uploaded_files
+
+RESULT = {
+    "name": "Ada Lovelace", "overall_score": 80, "filename": "ada.pdf", "sha256": "a" * 64, "knockout_requirement": None,
+    "knocked_out_early": False, "scored_by": "small-model", "summary": "Strong Python background.",
+    "requirement_analysis": [
+        {"requirement": "Python", "match_status": True, "evidence": "Python for 5 years"},
+        {"requirement": "AWS", "match_status": False, "evidence": "No direct evidence found in the resume."},
+    ],
+}
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(directory=str(tmp_path))
+
+def test_slots_and_flags_round_trip(store):
+    candidate = CompactCandidate(RESULT, store)
+    assert candidate.to_dict() == RESULT
+    assert candidate["knocked_out_early"] is False and candidate.get("duplicate_of") is None
+    assert "duplicate_of" not in candidate and "similarity_score" not in candidate
+    assert candidate.match_flags == b"\x01\x00"
+
+def test_requirement_names_are_shared_between_candidates(store):
+    first, second = compact_candidates([RESULT, {**RESULT, "filename": "copy.pdf"}], store)
+    assert first.requirements is second.requirements
+
+def test_summary_and_evidence_are_loaded_from_the_store_on_access(store, monkeypatch):
+    candidate = CompactCandidate(RESULT, store)
+    reads = []
+    original_get = store.get
+    monkeypatch.setattr(store, "get", lambda kind, key: reads.append(kind) or original_get(kind, key))
+    assert (candidate["name"], candidate["overall_score"], candidate.get("knockout_requirement")) == ("Ada Lovelace", 80, None)
+    assert reads == []
+    assert candidate["summary"] == RESULT["summary"]
+    assert candidate["requirement_analysis"] == RESULT["requirement_analysis"]
+    assert reads == ["candidate", "candidate"]
+
+def test_writes_persist_and_spilled_fields_are_read_only(store):
+    candidate = CompactCandidate(RESULT, store)
+    candidate["overall_score"] = 0
+    candidate["knockout_requirement"] = "AWS"
+    assert (candidate["overall_score"], candidate["knockout_requirement"]) == (0, "AWS")
+    with pytest.raises(KeyError):
+        candidate["summary"] = "Edited."
+
+def test_uploads_are_spilled_and_read_back(store):
+    class Upload:
+        name, size = "ada.pdf", 3
+
+        def getvalue(self):
+            return b"pdf"
+
+    [stored] = spill_uploaded_files([Upload()], store)
+    assert (stored.name, stored.size, stored.getvalue()) == ("ada.pdf", 3, b"pdf")
+
+def test_the_temp_directory_is_removed_with_the_store(tmp_path):
+    store = SessionStore(directory=str(tmp_path))
+    store.put("chat", "ada.pdf", b"[]")
+    directory = store.directory
+    assert os.path.isdir(directory)
+    del store
+    gc.collect()
+    assert not os.path.exists(directory)
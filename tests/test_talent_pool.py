@@ -0,0 +1,50 @@
+import threading
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import talent_pool
+from talent_pool import TalentPool
+
+RESUME = {"sha256": "a" * 64, "filename": "CV.pdf", "text": "Jane Doe\nPython developer with 5 years of Django and PostgreSQL."}
+OTHER = {"sha256": "b" * 64, "filename": "CV.pdf", "text": "John Roe\nData engineer building Kafka pipelines in Scala."}
+
+def _fake_embeddings(monkeypatch):
+    monkeypatch.setattr(talent_pool, "get_embeddings", lambda: DeterministicFakeEmbedding(size=16))
+
+def test_instances_sharing_a_directory_keep_each_others_resumes(tmp_path, monkeypatch):
+    _fake_embeddings(monkeypatch)
+    first, second = TalentPool(str(tmp_path)), TalentPool(str(tmp_path))
+    assert first.add_resumes([RESUME]) == 1
+    assert second.add_resumes([OTHER]) == 1
+    chunks, vectors = TalentPool(str(tmp_path)).get_chunks([RESUME["sha256"], OTHER["sha256"]])
+    assert {sha256 for sha256, _ in chunks} == {RESUME["sha256"], OTHER["sha256"]}
+    assert vectors.shape == (len(chunks), 16)
+
+def test_concurrent_adds_of_the_same_resume_store_it_once(tmp_path, monkeypatch):
+    _fake_embeddings(monkeypatch)
+    pools = [TalentPool(str(tmp_path)) for _ in range(4)]
+    added = []
+    threads = [threading.Thread(target=lambda pool=pool: added.append(pool.add_resumes([RESUME]))) for pool in pools]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(added) == 1
+    chunks, _ = pools[0].get_chunks([RESUME["sha256"]])
+    assert len(chunks) == len(talent_pool.split_resume(RESUME["text"], RESUME["filename"]))
+
+def test_unknown_resumes_have_no_chunks(tmp_path, monkeypatch):
+    _fake_embeddings(monkeypatch)
+    pool = TalentPool(str(tmp_path))
+    pool.add_resumes([RESUME])
+    chunks, vectors = pool.get_chunks([RESUME["sha256"], "c" * 64])
+    assert chunks and all(sha256 == RESUME["sha256"] for sha256, _ in chunks)
+    assert pool.get_chunks(["c" * 64]) == ([], None)
+
+def test_listing_resumes_does_not_load_their_texts(tmp_path, monkeypatch):
+    _fake_embeddings(monkeypatch)
+    pool = TalentPool(str(tmp_path))
+    pool.add_resumes([RESUME, OTHER])
+    assert sorted(pool.list_resumes(), key=lambda res: res["sha256"]) == [
+        {"sha256": RESUME["sha256"], "filename": "CV.pdf"}, {"sha256": OTHER["sha256"], "filename": "CV.pdf"}]
+    assert pool.get_resumes([OTHER["sha256"]]) == [OTHER]
@@ -1,8 +1,18 @@
 import json
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Optional, Iterator, Tuple
+import faiss
+import numpy as np
 import PyPDF2
 from pydantic import BaseModel, Field
+from langchain_core.documents import Document
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import FastEmbedEmbeddings
@@ -10,6 +20,28 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import create_retrieval_chain
 
+from json_repair import repair_json_locally, coerce_field_types, record_json_outcome
+from metrics import TokenUsageCallback, record_llm_call, record_duration, timed
+from llm_client import get_llm_client, get_model_name, is_rate_limit_error, get_retry_after
+
+REQUIREMENTS_PROMPT_VERSION = "1"
+SCORING_PROMPT_VERSION = "3"
+PACKED_SCORING_PROMPT_VERSION = "1"
+QUESTIONS_PROMPT_VERSION = "1"
+
+IMPORTANCE_PENALTIES = {"Critical": 25, "Important": 15, "Normal": 5}
+DEFAULT_IMPORTANCE = "Important"
+
+EMBEDDING_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+
+DEFAULT_RESUME_TOKEN_BUDGET = 1200
+CONTEXT_CHUNK_SIZE = 500
+CONTEXT_SEPARATOR_TOKENS = 2
+
+DEFAULT_RETRIEVER_PREFETCH = 3
+SEARCH_CACHE_SIZE = 256
+RAG_PROMPT_TEMPLATE = "Answer the question based ONLY on the provided context.\n\nContext:\n{context}\n\nQuestion: {input}"
+
 def clean_llm_output(text: str) -> str:
     """Cleans the raw text output from the LLM, removing markdown fences."""
     text = text.strip()
@@ -21,40 +53,75 @@ def clean_llm_output(text: str) -> str:
         text = text[:-3]
     return text.strip()
 
-def call_llm(llm: BaseChatModel, prompt_template: str, input_data: Dict[str, Any], response_model: Optional[BaseModel] = None) -> Any:
-    """Invokes the LLM with structured output enforcement if a model is provided."""
-    try:
-        chain = ChatPromptTemplate.from_template(prompt_template)
-        if response_model:
-            structured_llm = llm.with_structured_output(response_model)
-            chain = chain | structured_llm
-        else:
-            chain = chain | llm
-        
-        response = chain.invoke(input_data)
-        return response
-    except Exception as e:
-        raise Exception(f"LLM invocation failed: {e}")
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+def call_llm(llm: BaseChatModel, prompt_template: str, input_data: Dict[str, Any], response_model: Optional[BaseModel] = None, stage: str = "other") -> Any:
+    """Invokes the LLM with structured output enforcement if a model is provided, recording latency and tokens under `stage`.
+
+    Goes through the client registered for `llm` (see `llm_client`), which retries transient errors,
+    fails over to backup keys or models and coalesces identical in-flight requests.
+    """
+    return get_llm_client(llm).invoke(prompt_template, input_data, response_model=response_model, stage=stage)
 
 def repair_and_parse_json(llm: BaseChatModel, broken_json_string: str) -> Optional[Dict]:
     """Attempts to repair a broken JSON string using an LLM."""
-    repair_prompt = f"""
+    repair_prompt = """
     The following string is a broken JSON object. It likely contains unescaped newlines or other syntax errors.
     Your task is to fix it and return ONLY the perfectly valid JSON object. Do not add any explanation, commentary, or markdown formatting.
 
     Broken JSON:
     ```
-    {broken_json_string}
+    {broken_json}
     ```
     """
     try:
-        repaired_response = call_llm(llm, repair_prompt, {}, response_model=None)
+        repaired_response = call_llm(llm, repair_prompt, {"broken_json": broken_json_string}, response_model=None, stage="json_repair")
         repaired_json_string = clean_llm_output(repaired_response.content if hasattr(repaired_response, 'content') else str(repaired_response))
         return json.loads(repaired_json_string)
     except Exception as e:
         print(f"JSON repair failed: {e}")
         return None
 
+def parse_llm_json(raw_text: str, response_model: Any, llm: Optional[BaseChatModel] = None, validate_repair: Optional[Callable[[Any], None]] = None) -> Any:
+    """Parses LLM output into `response_model`: strict JSON first, then local repair, then (if `llm` is given) an LLM repair round trip.
+
+    A repaired result is only accepted if `validate_repair` (when given) does not raise on it, e.g. to reject a
+    truncated reply that was cut back to fewer items than the caller needs.
+    """
+    def build(data: Dict) -> Any:
+        result = response_model(**data)
+        if validate_repair:
+            validate_repair(result)
+        return result
+
+    cleaned_json_string = clean_llm_output(raw_text)
+    try:
+        result = response_model(**coerce_field_types(json.loads(cleaned_json_string)))
+        record_json_outcome("parsed")
+        return result
+    except (json.JSONDecodeError, ValueError, TypeError):
+        pass
+
+    parsed_data = repair_json_locally(cleaned_json_string, validate=build)
+    if parsed_data is not None:
+        record_json_outcome("local_repairs")
+        return response_model(**parsed_data)
+
+    if llm is not None:
+        print("Local JSON repair failed. Attempting an LLM repair...")
+        parsed_data = repair_and_parse_json(llm, cleaned_json_string)
+        if parsed_data is not None:
+            try:
+                result = build(coerce_field_types(parsed_data))
+                record_json_outcome("llm_repairs")
+                return result
+            except (ValueError, TypeError):
+                pass
+    record_json_outcome("failures")
+    raise ValueError("JSON repair failed.")
+
 class RequirementMatch(BaseModel):
     requirement: str
     match_status: bool
@@ -62,9 +129,10 @@ class RequirementMatch(BaseModel):
 
 class ExplainableCandidateScore(BaseModel):
     name: str
-    overall_score: int
+    overall_score: int = 0
     summary: str
     requirement_analysis: List[RequirementMatch]
+    knockout_requirement: Optional[str] = None
 
 class KeyRequirements(BaseModel):
     key_requirements: List[str]
@@ -82,31 +150,152 @@ def extract_key_requirements(job_description: str, llm: BaseChatModel) -> List[s
     Job Description:
     {jd}
     """
-    response = call_llm(llm, prompt, {"jd": job_description}, response_model=KeyRequirements)
+    response = call_llm(llm, prompt, {"jd": job_description}, response_model=KeyRequirements, stage="requirements")
     return response.key_requirements
 
-def score_candidate_explainable(job_description: str, resume_text: str, weighted_requirements: Dict, llm: BaseChatModel) -> ExplainableCandidateScore:
-    """Scores a candidate with detailed, explainable AI using a reliable two-step approach."""
+def _normalize_requirement(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+def align_requirement_analysis(requirement_analysis: List[Dict], requirements: List[str]) -> List[Optional[Dict]]:
+    """Maps the LLM's per-requirement verdicts onto `requirements` order, with None for requirements it skipped."""
+    by_name = {_normalize_requirement(m["requirement"]): m for m in requirement_analysis}
+    same_length = len(requirement_analysis) == len(requirements)
+    aligned = []
+    for i, req in enumerate(requirements):
+        key = _normalize_requirement(req)
+        if key in by_name:
+            aligned.append(by_name[key])
+        elif same_length:
+            aligned.append(requirement_analysis[i])
+        else:
+            aligned.append(None)
+    return aligned
+
+def check_requirement_coverage(score: "ExplainableCandidateScore", requirements: List[str]) -> None:
+    """Raises ValueError if the verdict skips one of `requirements`, e.g. because a truncated reply was cut back."""
+    aligned = align_requirement_analysis([m.model_dump() for m in score.requirement_analysis], requirements)
+    missing = [req for req, match in zip(requirements, aligned) if match is None]
+    if missing:
+        raise ValueError(f"No verdict for: {', '.join(missing)}")
+
+def requirement_match_flags(requirement_analysis: List[Dict], requirements: List[str]) -> List[bool]:
+    """Maps the LLM's per-requirement verdicts onto `requirements` order. Requirements it skipped count as gaps."""
+    return [bool(m["match_status"]) if m is not None else False for m in align_requirement_analysis(requirement_analysis, requirements)]
+
+def compute_scores(match_matrix: np.ndarray, weighted_requirements: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Applies the rubric to a (candidates x requirements) boolean matrix of met requirements.
+
+    Starts every candidate at 100 and deducts the importance penalty for each gap. A gap on a
+    knock-out requirement sets the score to 0. Returns the scores and, per candidate, the column
+    of the first failed knock-out requirement (-1 if none).
+    """
+    weights = list(weighted_requirements.values())
+    penalties = np.array([IMPORTANCE_PENALTIES.get(w.get("importance", DEFAULT_IMPORTANCE), IMPORTANCE_PENALTIES[DEFAULT_IMPORTANCE]) for w in weights], dtype=np.int64)
+    knockouts = np.array([bool(w.get("knockout", False)) for w in weights], dtype=bool)
+    match_matrix = np.asarray(match_matrix, dtype=bool).reshape(-1, len(weights))
+    gaps = ~match_matrix
+    scores = np.clip(100 - gaps.astype(np.int64) @ penalties, 0, 100)
+    failed_knockouts = gaps & knockouts
+    knocked_out = failed_knockouts.any(axis=1)
+    scores[knocked_out] = 0
+    return scores, np.where(knocked_out, failed_knockouts.argmax(axis=1), -1)
+
+def is_fully_scored(candidate: Dict) -> bool:
+    """True for candidates the scoring model analysed in full: not errors, pre-screened out or knocked out early."""
+    return "Error:" not in candidate["name"] and not candidate.get("screened_out") and not candidate.get("knocked_out_early")
+
+def leaderboard_sort_key(candidate: Dict) -> Tuple[bool, int, float]:
+    """Ranks LLM-scored candidates by score, followed by pre-screened-out candidates by similarity."""
+    return (not candidate.get("screened_out", False), candidate["overall_score"], candidate.get("similarity_score", 0.0))
+
+def rescore_candidates(candidates: List[Dict], weighted_requirements: Dict) -> List[Dict]:
+    """Recomputes `overall_score` for every candidate from its stored requirement verdicts and re-ranks, without calling the LLM."""
+    requirements = list(weighted_requirements)
+    scored = [c for c in candidates if is_fully_scored(c)]
+    if scored and requirements:
+        match_matrix = np.array([requirement_match_flags(c["requirement_analysis"], requirements) for c in scored], dtype=bool)
+        scores, knockout_columns = compute_scores(match_matrix, weighted_requirements)
+        for candidate, score, column in zip(scored, scores.tolist(), knockout_columns.tolist()):
+            candidate["overall_score"] = score
+            candidate["knockout_requirement"] = requirements[column] if column >= 0 else None
+    return sorted(candidates, key=leaderboard_sort_key, reverse=True)
+
+def apply_local_score(score: ExplainableCandidateScore, weighted_requirements: Dict) -> ExplainableCandidateScore:
+    """Fills in `overall_score` and `knockout_requirement` for a single candidate from the rubric."""
+    requirements = list(weighted_requirements)
+    if not requirements:
+        return score.model_copy(update={"overall_score": 100, "knockout_requirement": None})
+    flags = requirement_match_flags([m.model_dump() for m in score.requirement_analysis], requirements)
+    scores, knockout_columns = compute_scores(np.array([flags], dtype=bool), weighted_requirements)
+    column = int(knockout_columns[0])
+    return score.model_copy(update={"overall_score": int(scores[0]), "knockout_requirement": requirements[column] if column >= 0 else None})
+
+@lru_cache(maxsize=32)
+def _embed_requirements(requirements: Tuple[str, ...]) -> np.ndarray:
+    return np.array(get_embeddings().embed_documents(list(requirements)), dtype=np.float32)
+
+def _truncate_to_budget(text: str, token_budget: int) -> str:
+    return text[:token_budget * 4]
+
+def build_resume_context(resume_text: str, requirements: List[str], token_budget: int = DEFAULT_RESUME_TOKEN_BUDGET) -> str:
+    """Selects the resume chunks most relevant to the requirements, within `token_budget` tokens.
+
+    Resumes that already fit are returned whole. Otherwise the first chunk (name and contact details)
+    is always kept, then each requirement in turn claims its most similar remaining chunk until the
+    budget is spent. Chunks are returned in their original order.
+    """
+    if estimate_tokens(resume_text) <= token_budget or not requirements:
+        return _truncate_to_budget(resume_text, token_budget)
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CONTEXT_CHUNK_SIZE, chunk_overlap=0)
+    chunks = text_splitter.split_text(resume_text)
+    try:
+        with timed("resume_context_embedding"):
+            chunk_vectors = np.array(get_embeddings().embed_documents(chunks), dtype=np.float32)
+            requirement_vectors = _embed_requirements(tuple(requirements))
+    except Exception as e:
+        print(f"Could not embed resume for context selection, truncating instead. Error: {e}")
+        return _truncate_to_budget(resume_text, token_budget)
+
+    similarity = normalize_rows(requirement_vectors) @ normalize_rows(chunk_vectors).T
+    rankings = np.argsort(-similarity, axis=1)
+
+    selected, used = {0}, estimate_tokens(chunks[0])
+    cursors = [0] * len(requirements)
+    progressed = True
+    while progressed:
+        progressed = False
+        for r in range(len(requirements)):
+            while cursors[r] < len(chunks) and rankings[r, cursors[r]] in selected:
+                cursors[r] += 1
+            if cursors[r] == len(chunks):
+                continue
+            candidate = int(rankings[r, cursors[r]])
+            cursors[r] += 1
+            cost = estimate_tokens(chunks[candidate]) + CONTEXT_SEPARATOR_TOKENS
+            if used + cost <= token_budget:
+                selected.add(candidate)
+                used += cost
+            progressed = True
+    return "\n...\n".join(chunks[i] for i in sorted(selected))
+
+def score_candidate_explainable(job_description: str, resume_text: str, weighted_requirements: Dict, llm: BaseChatModel,
+                                resume_token_budget: int = DEFAULT_RESUME_TOKEN_BUDGET) -> ExplainableCandidateScore:
+    """Scores a candidate with detailed, explainable AI: the LLM judges each requirement, the rubric is applied locally."""
     prompt = """
-    **TASK:** Evaluate a candidate's resume against a job description and weighted requirements.
+    **TASK:** Evaluate a candidate's resume against a job description and a list of requirements.
     Your output MUST be a single, valid JSON object. Do not include any other text or markdown.
     
     **CANDIDATE NAME:** The name of the candidate is present in the resume text. You must extract it for the 'name' field.
 
-    **SCORING RULES:**
-    1. Start at 100 points.
-    2. For each requirement, if no direct evidence is found in the resume, deduct points:
-        - Critical: -25 points
-        - Important: -15 points
-        - Normal: -5 points
-    3. The `overall_score` is the final calculated score.
+    **EVALUATION RULES:**
+    1. Assess every requirement in the list below, in the same order, using its exact wording.
+    2. A requirement is met only if there is direct evidence for it in the resume.
 
     **JSON OUTPUT SCHEMA:**
     You must fill out this exact JSON structure:
     ```json
     {{
       "name": "string, extracted from resume",
-      "overall_score": "integer, calculated from rubric",
       "summary": "string, 2-3 sentence critical analysis of candidate's fit, highlighting gaps",
       "requirement_analysis": [
         {{
@@ -119,27 +308,124 @@ def score_candidate_explainable(job_description: str, resume_text: str, weighted
     ```
 
     **USER-PROVIDED DATA:**
-    1. WEIGHTED REQUIREMENTS: {weights}
+    1. REQUIREMENTS: {requirements}
     2. JOB DESCRIPTION: {jd}
     3. RESUME TEXT: {resume}
     """
     input_data = {
-        "weights": json.dumps(weighted_requirements, indent=2),
+        "requirements": json.dumps(list(weighted_requirements), indent=2),
         "jd": job_description,
-        "resume": resume_text[:6000]
+        "resume": build_resume_context(resume_text, list(weighted_requirements), resume_token_budget)
     }
     try:
-        raw_response = call_llm(llm, prompt, input_data, response_model=None)
+        raw_response = call_llm(llm, prompt, input_data, response_model=None, stage="scoring")
         raw_json_string = raw_response.content if hasattr(raw_response, 'content') else str(raw_response)
-        cleaned_json_string = clean_llm_output(raw_json_string)
-        parsed_data = json.loads(cleaned_json_string)
-        return ExplainableCandidateScore(**parsed_data)
+        score = parse_llm_json(raw_json_string, ExplainableCandidateScore, llm, validate_repair=lambda s: check_requirement_coverage(s, list(weighted_requirements)))
+        return apply_local_score(score, weighted_requirements)
     except Exception as e:
         print(f"Error scoring candidate, re-raising exception. Error: {e}")
         raise e
 
-def generate_interview_questions(candidate_name: str, candidate_summary: str, job_description: str, llm: BaseChatModel) -> InterviewQuestions:
-    """Generates tailored interview questions using a reliable two-step approach with a repair mechanism."""
+PACKED_SCORING_PROMPT = """
+    **TASK:** Evaluate each of the resumes below against the same job description and list of requirements.
+    Your output MUST be a single, valid JSON object. Do not include any other text or markdown.
+
+    **EVALUATION RULES:**
+    1. Evaluate every resume on its own; never use evidence from one resume for another candidate.
+    2. For each resume, assess every requirement in the list below, in the same order, using its exact wording.
+    3. A requirement is met only if there is direct evidence for it in that candidate's resume.
+    4. The name of each candidate is present in their resume text.
+
+    **JSON OUTPUT SCHEMA:**
+    You must fill out this exact JSON structure, with exactly one entry in "candidates" per resume:
+    ```json
+    {{
+      "candidates": [
+        {{
+          "resume_id": "string, the id shown in the resume's header",
+          "name": "string, extracted from the resume",
+          "summary": "string, 2-3 sentence critical analysis of candidate's fit, highlighting gaps",
+          "requirement_analysis": [
+            {{
+              "requirement": "string, from the list below",
+              "match_status": "boolean, must be true or false",
+              "evidence": "string, direct quote from the resume or 'No direct evidence found in the resume.'"
+            }}
+          ]
+        }}
+      ]
+    }}
+    ```
+
+    **USER-PROVIDED DATA:**
+    1. REQUIREMENTS: {requirements}
+    2. JOB DESCRIPTION: {jd}
+    3. RESUMES:
+    {resumes}
+    """
+
+def format_packed_resumes(resumes: List[Tuple[str, str]]) -> str:
+    return "\n".join(f"=== RESUME {resume_id} ===\n{text}\n=== END OF RESUME {resume_id} ===" for resume_id, text in resumes)
+
+def parse_packed_scores(raw_text: str, resume_ids: List[str], weighted_requirements: Dict) -> Dict[str, ExplainableCandidateScore]:
+    """The valid entries of a packed scoring reply, by resume id.
+
+    Each entry is validated on its own; an entry that is malformed, duplicated or skips a requirement is
+    left out, so the caller can score that resume alone.
+    """
+    cleaned_json_string = clean_llm_output(raw_text)
+    repaired = False
+    try:
+        data = json.loads(cleaned_json_string)
+    except json.JSONDecodeError:
+        data, repaired = repair_json_locally(cleaned_json_string), True
+    entries = data.get("candidates") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        record_json_outcome("failures")
+        return {}
+    requirements, wanted, results = list(weighted_requirements), set(resume_ids), {}
+    for entry in entries:
+        if not isinstance(entry, dict) or str(entry.get("resume_id", "")).strip() not in wanted:
+            continue
+        resume_id = str(entry["resume_id"]).strip()
+        try:
+            score = ExplainableCandidateScore(**coerce_field_types(entry))
+        except (ValueError, TypeError):
+            continue
+        if resume_id in results or None in align_requirement_analysis([m.model_dump() for m in score.requirement_analysis], requirements):
+            results.pop(resume_id, None)
+            wanted.discard(resume_id)
+            continue
+        results[resume_id] = apply_local_score(score, weighted_requirements)
+    record_json_outcome(("local_repairs" if repaired else "parsed") if results else "failures")
+    return results
+
+def score_candidates_packed(job_description: str, resumes: List[Tuple[str, str]], weighted_requirements: Dict,
+                            llm: BaseChatModel) -> Dict[str, ExplainableCandidateScore]:
+    """Scores several short (resume_id, text) resumes in one request, so the JD and rubric are sent once.
+
+    Returns the verdicts that parsed, by resume id; resumes missing from the result should be scored alone.
+    """
+    input_data = {
+        "requirements": json.dumps(list(weighted_requirements), indent=2),
+        "jd": job_description,
+        "resumes": format_packed_resumes(resumes),
+    }
+    raw_response = call_llm(llm, PACKED_SCORING_PROMPT, input_data, response_model=None, stage="scoring_packed")
+    raw_json_string = raw_response.content if hasattr(raw_response, 'content') else str(raw_response)
+    return parse_packed_scores(raw_json_string, [resume_id for resume_id, _ in resumes], weighted_requirements)
+
+def fallback_interview_questions() -> InterviewQuestions:
+    return InterviewQuestions(
+        behavioral=["Could not generate behavioral questions due to a persistent AI formatting error."],
+        technical=["Please try again or rephrase the analysis."]
+    )
+
+def generate_interview_questions(candidate_name: str, candidate_summary: str, job_description: str, llm: BaseChatModel, fallback_on_error: bool = True) -> InterviewQuestions:
+    """Generates tailored interview questions using a reliable two-step approach with a repair mechanism.
+
+    With `fallback_on_error=False` failures are raised instead of returning placeholder questions.
+    """
     prompt = """
     **Task:** Generate interview questions for a candidate.
 
@@ -155,79 +441,334 @@ def generate_interview_questions(candidate_name: str, candidate_summary: str, jo
     """
     input_data = {"name": candidate_name, "summary": candidate_summary, "jd": job_description}
     try:
-        raw_response = call_llm(llm, prompt, input_data, response_model=None)
+        raw_response = call_llm(llm, prompt, input_data, response_model=None, stage="questions")
         raw_json_string = raw_response.content if hasattr(raw_response, 'content') else str(raw_response)
-        cleaned_json_string = clean_llm_output(raw_json_string)
-        
-        try:
-            parsed_data = json.loads(cleaned_json_string)
-        except json.JSONDecodeError:
-            print(f"Initial JSON parsing failed for {candidate_name}. Attempting to repair...")
-            parsed_data = repair_and_parse_json(llm, cleaned_json_string)
-            if not parsed_data:
-                raise ValueError("JSON repair failed.")
-        
-        return InterviewQuestions(**parsed_data)
+        return parse_llm_json(raw_json_string, InterviewQuestions, llm)
     except Exception as e:
+        if not fallback_on_error:
+            raise
         print(f"Could not generate interview questions for {candidate_name}. Error: {e}")
-        return InterviewQuestions(
-            behavioral=["Could not generate behavioral questions due to a persistent AI formatting error."],
-            technical=["Please try again or rephrase the analysis."]
-        )
-
-def generate_email_templates(ranked_candidates: list, job_description: dict, num_to_invite: int, min_score: int, interview_datetime: str, llm: BaseChatModel) -> dict:
-    """Generates personalized interview invitation and rejection emails with scheduling details."""
-    invitations, rejections = [], []
-    job_title = job_description.get('title', 'the position')
-    
-    candidates_to_invite = [c for c in ranked_candidates if c.get('overall_score', 0) >= min_score][:num_to_invite]
-    invited_names = {c['name'] for c in candidates_to_invite}
+        return fallback_interview_questions()
 
-    for candidate in ranked_candidates:
-        candidate_name = candidate.get("name", "Candidate")
-        if "Error:" in candidate_name: continue
+INVITATION_EMAIL_PROMPT = "As a friendly HR manager, write a concise, enthusiastic email to {name} for the {job_title} role. Invite them for a 1-hour virtual interview on {interview_datetime}. Ask them to confirm their availability."
+REJECTION_EMAIL_PROMPT = "As a polite HR manager, write a brief, respectful rejection email to {name} for the {job_title} role. Thank them for their time and wish them luck."
+EMAIL_TEMPLATES_PROMPT = """
+    **Task:** Write two reusable email templates for candidates who applied to the {job_title} role.
 
-        if candidate_name in invited_names:
-            prompt = f"As a friendly HR manager, write a concise, enthusiastic email to {candidate_name} for the {job_title} role. Invite them for a 1-hour virtual interview on {interview_datetime}. Ask them to confirm their availability."
-            email_type = "invitation"
-        else:
-            prompt = f"As a polite HR manager, write a brief, respectful rejection email to {candidate_name} for the {job_title} role. Thank them for their time and wish them luck."
-            email_type = "rejection"
-        
+    1.  `"invitation"`: A concise, enthusiastic email from a friendly HR manager inviting the candidate to a 1-hour virtual interview on [INTERVIEW_DATETIME]. Ask them to confirm their availability.
+    2.  `"rejection"`: A brief, respectful rejection email from a polite HR manager. Thank them for their time and wish them luck.
+
+    Address the candidate as [CANDIDATE_NAME] and refer to the role as [JOB_TITLE]; these placeholders are filled in later.
+    **Your Output MUST be a single, valid JSON object with the keys "invitation" and "rejection".** Do not add any text before or after the JSON object.
+    """
+EMAIL_PLACEHOLDERS = ("[CANDIDATE_NAME]", "[JOB_TITLE]", "[INTERVIEW_DATETIME]")
+DEFAULT_EMAIL_CONCURRENCY = 8
+DEFAULT_EMAIL_COMPLETION_TOKENS = 400
+
+class EmailTemplates(BaseModel):
+    invitation: str
+    rejection: str
+
+def split_email_recipients(ranked_candidates: list, num_to_invite: int, min_score: int) -> Tuple[list, list]:
+    """(invitees, rejections) among the candidates that were scored or screened out; error entries and near-duplicates get no email."""
+    recipients = [c for c in ranked_candidates if "Error:" not in c.get("name", "Candidate") and not c.get("duplicate_of")]
+    invitees = [c for c in recipients if c.get('overall_score', 0) >= min_score and is_fully_scored(c)][:num_to_invite]
+    invited_ids = {id(c) for c in invitees}
+    return invitees, [c for c in recipients if id(c) not in invited_ids]
+
+def fill_email_template(template: str, candidate_name: str, job_title: str, interview_datetime: str) -> str:
+    for placeholder, value in zip(EMAIL_PLACEHOLDERS, (candidate_name, job_title, interview_datetime)):
+        template = template.replace(placeholder, value)
+    return template
+
+def generate_email_templates(ranked_candidates: list, job_description: dict, num_to_invite: int, min_score: int, interview_datetime: str, llm: BaseChatModel,
+                             personalized: bool = False, progress_callback: Optional[Callable[[int, int], None]] = None,
+                             max_concurrency: int = DEFAULT_EMAIL_CONCURRENCY, limiter=None) -> dict:
+    """Generates interview invitation and rejection emails with scheduling details.
+
+    By default one LLM call writes an invitation and a rejection template, and names and scheduling
+    details are filled in locally. With `personalized=True` every candidate gets their own email from
+    concurrent batched calls; `progress_callback(done, total)` is called as they complete, and
+    candidates whose email failed are listed under "failed" while the rest are still returned. Pass the
+    shared `limiter` so email calls wait their turn with scoring and back off together on 429s.
+    """
+    job_title = job_description.get('title', 'the position')
+    invitees, rejected = split_email_recipients(ranked_candidates, num_to_invite, min_score)
+    result = {"invitations": [], "rejections": [], "failed": []}
+    recipients = [(c, "invitations") for c in invitees] + [(c, "rejections") for c in rejected]
+    total = len(recipients)
+    if not total:
+        return result
+
+    if not personalized:
         try:
-            email_response = call_llm(llm, prompt, {}, response_model=None)
-            email_body = email_response.content if hasattr(email_response, 'content') else str(email_response)
-            email_template = {"name": candidate_name, "email_body": email_body}
-            if email_type == "invitation": invitations.append(email_template)
-            else: rejections.append(email_template)
+            raw_response = call_llm(llm, EMAIL_TEMPLATES_PROMPT, {"job_title": job_title}, response_model=None, stage="emails")
+            templates = parse_llm_json(raw_response.content if hasattr(raw_response, 'content') else str(raw_response), EmailTemplates, llm)
         except Exception as e:
-            print(f"Error generating email for {candidate.get('name')}: {e}")
+            print(f"Error generating email templates: {e}")
+            result["failed"] = [c.get("name", "Candidate") for c, _ in recipients]
+            return result
+        for candidate, kind in recipients:
+            template = templates.invitation if kind == "invitations" else templates.rejection
+            result[kind].append({"name": candidate["name"], "email_body": fill_email_template(template, candidate["name"], job_title, interview_datetime)})
+        if progress_callback:
+            progress_callback(total, total)
+        return result
 
-    return {"invitations": invitations, "rejections": rejections}
+    def write_email(item: Tuple[Dict, str]) -> str:
+        candidate, kind = item
+        prompt = INVITATION_EMAIL_PROMPT if kind == "invitations" else REJECTION_EMAIL_PROMPT
+        input_data = {"name": candidate["name"], "job_title": job_title, "interview_datetime": interview_datetime}
+        write = lambda: call_llm(llm, prompt, input_data, response_model=None, stage="emails")
+        response = limiter.call(write, estimate_tokens(prompt) + DEFAULT_EMAIL_COMPLETION_TOKENS, "emails") if limiter else write()
+        return response.content if hasattr(response, 'content') else str(response)
+
+    bodies: Dict[int, str] = {}
+    done = 0
+    for index, output in RunnableLambda(write_email).batch_as_completed(recipients, config={"max_concurrency": max_concurrency}, return_exceptions=True):
+        done += 1
+        if isinstance(output, Exception):
+            print(f"Error generating email for {recipients[index][0].get('name')}: {output}")
+            result["failed"].append(recipients[index][0].get("name", "Candidate"))
+        else:
+            bodies[index] = output
+        if progress_callback:
+            progress_callback(done, total)
+    for index, (candidate, kind) in enumerate(recipients):
+        if index in bodies:
+            result[kind].append({"name": candidate["name"], "email_body": bodies[index]})
+    return result
 
-def extract_pdf_text(file_object: Any) -> str:
-    """Extracts text from an in-memory PDF file object."""
+def extract_pdf_text(file_object: Any, max_pages: Optional[int] = None) -> str:
+    """Extracts text from an in-memory PDF file object, reading at most `max_pages` pages."""
     try:
         pdf_reader = PyPDF2.PdfReader(file_object)
-        return "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
+        return "\n".join(page.extract_text() or "" for page in pdf_reader.pages[:max_pages])
     except Exception as e:
         print(f"Error reading PDF: {e}")
         return ""
 
-def create_candidate_rag_retriever(resume_text: str, filename: str):
-    """Creates an in-memory RAG pipeline for a SINGLE candidate's resume."""
+@lru_cache(maxsize=1)
+def get_embeddings() -> FastEmbedEmbeddings:
+    """The process-wide embedding model, loaded once and shared by every index."""
+    return FastEmbedEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scales each row to unit length, so dot products between rows are cosine similarities."""
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+def split_resume(resume_text: str, filename: str) -> List[Document]:
+    """Splits a resume into overlapping chunks tagged with their source filename."""
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splits = text_splitter.create_documents([resume_text], metadatas=[{"source": filename}])
-    embeddings = FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-    vectorstore = FAISS.from_documents(documents=splits, embedding=embeddings)
-    return vectorstore.as_retriever()
-
-def ask_rag_question(retriever, question: str, llm: BaseChatModel) -> str:
-    """Asks a question to the RAG pipeline."""
-    template = "Answer the question based ONLY on the provided context.\n\nContext:\n{context}\n\nQuestion: {input}"
-    prompt = ChatPromptTemplate.from_template(template)
-    document_chain = create_stuff_documents_chain(llm, prompt)
-    retrieval_chain = create_retrieval_chain(retriever, document_chain)
-    
-    response = retrieval_chain.invoke({"input": question})
-    return response["answer"]
\ No newline at end of file
+    return text_splitter.create_documents([resume_text], metadatas=[{"source": filename}])
+
+class CandidateIndex:
+    """A single FAISS index over every candidate's resume chunks, searchable per candidate."""
+
+    def __init__(self, vectorstore: FAISS):
+        self.vectorstore = vectorstore
+        positions = defaultdict(list)
+        for position, docstore_id in vectorstore.index_to_docstore_id.items():
+            positions[vectorstore.docstore.search(docstore_id).metadata["source"]].append(position)
+        self.positions = {source: np.array(ids, dtype=np.int64) for source, ids in positions.items()}
+        # Vectors plus chunk text; used to keep a session's resident indexes within its memory budget.
+        self.nbytes = vectorstore.index.ntotal * vectorstore.index.d * 4 + sum(
+            len(vectorstore.docstore.search(docstore_id).page_content) for docstore_id in vectorstore.index_to_docstore_id.values())
+        self.search_cache: "OrderedDict[Tuple[str, str, int], List[Document]]" = OrderedDict()
+        self.search_lock = threading.Lock()
+
+    def search(self, filename: str, query: str, k: int = 4) -> List[Document]:
+        """Returns the `k` chunks of `filename` nearest to `query`, searching only that candidate's vectors.
+
+        Results are cached per (candidate, question), so a repeated question skips the query embedding.
+        """
+        positions = self.positions.get(filename)
+        if positions is None or len(positions) == 0:
+            return []
+        key = (filename, " ".join(query.lower().split()), k)
+        with self.search_lock:
+            if key in self.search_cache:
+                self.search_cache.move_to_end(key)
+                return list(self.search_cache[key])
+        query_vector = np.array([get_embeddings().embed_query(query)], dtype=np.float32)
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(positions))
+        _, indices = self.vectorstore.index.search(query_vector, min(k, len(positions)), params=params)
+        docs = [self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[i]) for i in indices[0] if i >= 0]
+        with self.search_lock:
+            self.search_cache[key] = docs
+            if len(self.search_cache) > SEARCH_CACHE_SIZE:
+                self.search_cache.popitem(last=False)
+        return list(docs)
+
+    def as_retriever(self, filename: str, k: int = 4) -> "CandidateRetriever":
+        return CandidateRetriever(index=self, filename=filename, k=k)
+
+class CandidateRetriever(BaseRetriever):
+    """A cheap filtered view of the shared CandidateIndex for one candidate."""
+    index: CandidateIndex
+    filename: str
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.index.search(self.filename, query, self.k)
+
+def build_candidate_index(resumes: List[Dict[str, str]], talent_pool=None) -> Optional[CandidateIndex]:
+    """Embeds the chunks of all resumes in one batched pass into a single shared index.
+
+    Resumes already in the talent pool reuse their stored chunk embeddings instead of being re-embedded.
+    """
+    stored = [res for res in resumes if talent_pool is not None and res.get("sha256") and talent_pool.contains(res["sha256"])]
+    stored_hashes = {res["sha256"] for res in stored}
+    splits = [doc for res in resumes if res.get("sha256") not in stored_hashes for doc in split_resume(res["text"], res["filename"])]
+    with timed("build_candidate_index"):
+        documents, vectors = talent_pool.get_documents(stored) if stored else ([], None)
+        if stored and vectors is None:
+            documents = []
+            splits = [doc for res in resumes for doc in split_resume(res["text"], res["filename"])]
+        if splits:
+            fresh = np.array(get_embeddings().embed_documents([doc.page_content for doc in splits]), dtype=np.float32)
+            documents = documents + splits
+            vectors = fresh if vectors is None else np.vstack([vectors, fresh])
+        if not documents:
+            return None
+        vectorstore = FAISS.from_embeddings(list(zip([doc.page_content for doc in documents], vectors.tolist())), get_embeddings(),
+                                            metadatas=[doc.metadata for doc in documents])
+        return CandidateIndex(vectorstore)
+
+class LazyRetrieverPool:
+    """Chat retrievers that are only built for candidates someone asks about.
+
+    `prefetch` indexes a few candidates (e.g. the top of the leaderboard) on a background thread in one
+    batched pass; any other candidate is indexed the first time `get` is called for it.
+
+    With a session `store`, resume texts are kept on disk until a candidate is indexed. With
+    `max_resident_bytes`, the least recently used indexes are dropped (and rebuilt on demand) to stay
+    under it.
+    """
+
+    def __init__(self, resumes: List[Dict[str, str]], talent_pool=None, store=None, max_resident_bytes: Optional[int] = None):
+        self.store = store
+        if store is not None:
+            store.clear("resume")
+            for res in resumes:
+                if "text" in res:
+                    store.put("resume", res["filename"], res["text"].encode("utf-8"))
+            resumes = [{k: v for k, v in res.items() if k != "text"} for res in resumes]
+        self.resumes = {res["filename"]: res for res in resumes}
+        self.talent_pool = talent_pool
+        self.max_resident_bytes = max_resident_bytes
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retriever-index")
+        self.lock = threading.Lock()
+        self.indexes: Dict[str, Future] = {}
+        self.recent: "OrderedDict[Future, None]" = OrderedDict()
+        self.chains: Dict[str, Any] = {}
+
+    def _resume(self, filename: str) -> Dict[str, str]:
+        """The resume with its text, from the session store or, for talent pool resumes passed without one, the pool."""
+        res = self.resumes[filename]
+        if "text" in res:
+            return res
+        text = self.store.get("resume", filename) if self.store is not None else None
+        if text is None and self.talent_pool is not None and res.get("sha256"):
+            stored = self.talent_pool.get_resumes([res["sha256"]])
+            return {**res, "text": stored[0]["text"] if stored else ""}
+        return {**res, "text": (text or b"").decode("utf-8")}
+
+    def _submit(self, filenames: List[str]) -> None:
+        with self.lock:
+            pending = [f for f in filenames if f in self.resumes and f not in self.indexes]
+            if not pending:
+                return
+            future = self.executor.submit(build_candidate_index, [self._resume(f) for f in pending], self.talent_pool)
+            for filename in pending:
+                self.indexes[filename] = future
+            self.recent[future] = None
+
+    def _use(self, future: Future) -> None:
+        """Marks an index as just used and evicts the least recently used ones beyond the memory budget."""
+        with self.lock:
+            if future in self.recent:
+                self.recent.move_to_end(future)
+            if self.max_resident_bytes is None:
+                return
+            for old in list(self.recent):
+                if self._resident_bytes() <= self.max_resident_bytes or old is future:
+                    break
+                if not old.done():
+                    continue
+                del self.recent[old]
+                for filename in [f for f, index in self.indexes.items() if index is old]:
+                    del self.indexes[filename]
+                    self.chains.pop(filename, None)
+
+    def _resident_bytes(self) -> int:
+        return sum(f.result().nbytes for f in self.recent if f.done() and not f.exception() and f.result() is not None)
+
+    def resident_bytes(self) -> int:
+        """Approximate memory held by the chat indexes built so far."""
+        with self.lock:
+            return self._resident_bytes()
+
+    def prefetch(self, filenames: List[str]) -> None:
+        """Starts indexing `filenames` in the background without waiting for it."""
+        self._submit(filenames)
+
+    def is_ready(self, filename: str) -> bool:
+        future = self.indexes.get(filename)
+        return future is not None and future.done()
+
+    def get(self, filename: str, k: int = 4) -> Optional["CandidateRetriever"]:
+        """The retriever for one candidate, waiting for (or starting) its indexing if needed."""
+        self._submit([filename])
+        future = self.indexes.get(filename)
+        if future is None:
+            return None
+        try:
+            index = future.result()
+        except Exception as e:
+            print(f"Error building the chat index for {filename}: {e}")
+            with self.lock:
+                if self.indexes.get(filename) is future:
+                    del self.indexes[filename]  # Let the next question retry.
+                self.recent.pop(future, None)
+            return None
+        self._use(future)
+        return index.as_retriever(filename, k) if index else None
+
+    def get_chain(self, filename: str, llm: BaseChatModel):
+        """The candidate's retrieval chain, built on their first question and reused for every later one."""
+        with self.lock:
+            chain = self.chains.get(filename)
+            future = self.indexes.get(filename)
+        if chain is not None:
+            self._use(future)
+            return chain
+        retriever = self.get(filename)
+        if retriever is None:
+            return None
+        with self.lock:
+            return self.chains.setdefault(filename, build_rag_chain(retriever, llm))
+
+def build_rag_chain(retriever, llm: BaseChatModel):
+    """A retrieval chain answering questions from one candidate's resume chunks."""
+    prompt = ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
+    return create_retrieval_chain(retriever, create_stuff_documents_chain(llm, prompt))
+
+def stream_rag_answer(chain, question: str, llm: BaseChatModel) -> Iterator[str]:
+    """Yields the answer to `question` token by token as the model produces it."""
+    usage = TokenUsageCallback()
+    started = time.perf_counter()
+    first_token = False
+    try:
+        for chunk in chain.stream({"input": question}, config={"callbacks": [usage]}):
+            token = chunk.get("answer")
+            if not token:
+                continue
+            if not first_token:
+                first_token = True
+                record_duration("rag_first_token", time.perf_counter() - started)
+            yield token
+    except Exception as e:
+        record_llm_call("rag", get_model_name(llm), time.perf_counter() - started, "rate_limited" if is_rate_limit_error(e) else "error", usage, error_type=type(e).__name__)
+        raise
+    record_llm_call("rag", get_model_name(llm), time.perf_counter() - started, "ok", usage)